@@ -0,0 +1,249 @@
+import argparse
+import json
+import os
+from typing import List, Optional, Tuple
+
+import numpy as np
+
+INDEX_META_FILE = "index.json"
+INDEX_ARRAYS_FILE = "index.npz"
+
+
+def normalize_rows(matrix) -> np.ndarray:
+    """Chuẩn hóa L2 từng dòng để cosine = tích vô hướng"""
+    matrix = np.asarray(matrix, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix.reshape(1, -1)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k(scores: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+    """argpartition top-k theo từng dòng, trả về (scores, vị trí) đã xếp giảm dần"""
+    k = min(k, scores.shape[1])
+    if k <= 0:
+        empty = np.zeros((scores.shape[0], 0))
+        return empty.astype(np.float32), empty.astype(np.int64)
+    idx = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    part = np.take_along_axis(scores, idx, axis=1)
+    order = np.argsort(-part, axis=1)
+    return (
+        np.take_along_axis(part, order, axis=1),
+        np.take_along_axis(idx, order, axis=1),
+    )
+
+
+class FlatIndex:
+    """Quét toàn bộ (exact) - dùng làm chuẩn để so recall"""
+
+    kind = "flat"
+
+    def __init__(self):
+        self.vectors: Optional[np.ndarray] = None
+        # Nguồn của index build offline (hash từng dòng + khóa model của embedding store)
+        self.row_hashes: Optional[List[str]] = None
+        self.model_key: Optional[str] = None
+
+    def __len__(self):
+        return 0 if self.vectors is None else self.vectors.shape[0]
+
+    def build(self, vectors) -> "FlatIndex":
+        self.vectors = normalize_rows(vectors)
+        return self
+
+    def search(self, queries, k: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+        """Trả về (scores, ids) kích thước (n_query, k), ids = -1 (score -inf) nếu thiếu"""
+        q = normalize_rows(queries)
+        scores = np.full((q.shape[0], k), -np.inf, dtype=np.float32)
+        ids = np.full((q.shape[0], k), -1, dtype=np.int64)
+        if len(self):
+            s, pos = top_k(q @ self.vectors.T, k)
+            scores[:, : s.shape[1]] = s
+            ids[:, : pos.shape[1]] = pos
+        return scores, ids
+
+    def _arrays(self):
+        return {"vectors": self.vectors}
+
+    def _params(self):
+        return {}
+
+    def save(self, directory: str):
+        os.makedirs(directory, exist_ok=True)
+        np.savez(os.path.join(directory, INDEX_ARRAYS_FILE), **self._arrays())
+        with open(os.path.join(directory, INDEX_META_FILE), "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "kind": self.kind,
+                    "size": len(self),
+                    "model_key": self.model_key,
+                    "rows": self.row_hashes,
+                    **self._params(),
+                },
+                f,
+            )
+
+    def matches(self, row_hashes: List[str], model_key: str) -> bool:
+        """Index được build từ đúng các dòng này bằng đúng model này"""
+        return self.model_key == model_key and self.row_hashes == row_hashes
+
+    @classmethod
+    def _from_saved(cls, meta, arrays) -> "FlatIndex":
+        index = cls()
+        index.vectors = arrays["vectors"]
+        return index
+
+
+class IVFIndex(FlatIndex):
+    """
+    Inverted file index (IVF) thuần NumPy:
+      - k-means cầu (spherical) chia vectors thành n_lists cụm
+      - mỗi query chỉ quét nprobe cụm gần nhất
+    nprobe là núm chỉnh recall/latency: nprobe = n_lists tương đương quét toàn bộ.
+    """
+
+    kind = "ivf"
+
+    def __init__(
+        self,
+        n_lists: Optional[int] = None,
+        nprobe: int = 8,
+        n_iter: int = 20,
+        seed: int = 0,
+    ):
+        super().__init__()
+        self.n_lists = n_lists
+        self.nprobe = nprobe
+        self.n_iter = n_iter
+        self.seed = seed
+        self.centroids: Optional[np.ndarray] = None
+        self.list_ids: Optional[np.ndarray] = None  # ids sắp xếp theo cụm
+        self.list_offsets: Optional[np.ndarray] = None  # CSR offsets, dài n_lists + 1
+
+    def build(self, vectors) -> "IVFIndex":
+        self.vectors = normalize_rows(vectors)
+        n = self.vectors.shape[0]
+        if n == 0:
+            # Dataset rỗng: không có cụm nào, search trả về -1 / -inf
+            self.n_lists = 0
+            self.centroids = np.zeros((0, self.vectors.shape[1]), dtype=np.float32)
+            self.list_ids = np.zeros(0, dtype=np.int64)
+            self.list_offsets = np.zeros(1, dtype=np.int64)
+            return self
+        n_lists = self.n_lists or max(1, int(np.sqrt(n)))
+        n_lists = min(n_lists, max(n, 1))
+        self.n_lists = n_lists
+
+        rng = np.random.default_rng(self.seed)
+        centroids = self.vectors[rng.choice(n, n_lists, replace=False)].copy()
+        for _ in range(self.n_iter):
+            assign = np.argmax(self.vectors @ centroids.T, axis=1)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assign, self.vectors)
+            counts = np.bincount(assign, minlength=n_lists)
+            empty = counts == 0
+            # Cụm rỗng: khởi tạo lại bằng một điểm ngẫu nhiên
+            sums[empty] = self.vectors[rng.choice(n, int(empty.sum()))]
+            centroids = normalize_rows(sums)
+
+        assign = np.argmax(self.vectors @ centroids.T, axis=1)
+        self.centroids = centroids
+        self.list_ids = np.argsort(assign, kind="stable")
+        counts = np.bincount(assign, minlength=n_lists)
+        self.list_offsets = np.concatenate([[0], np.cumsum(counts)])
+        return self
+
+    def search(
+        self, queries, k: int = 1, nprobe: Optional[int] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        q = normalize_rows(queries)
+        nprobe = min(nprobe or self.nprobe, self.n_lists)
+        _, probes = top_k(q @ self.centroids.T, nprobe)
+
+        scores = np.full((q.shape[0], k), -np.inf, dtype=np.float32)
+        ids = np.full((q.shape[0], k), -1, dtype=np.int64)
+        for row, lists in enumerate(probes):
+            candidates = np.concatenate(
+                [self.list_ids[:0]]
+                + [
+                    self.list_ids[self.list_offsets[c] : self.list_offsets[c + 1]]
+                    for c in lists
+                ]
+            )
+            if len(candidates) == 0:
+                continue
+            sims = (self.vectors[candidates] @ q[row]).reshape(1, -1)
+            s, pos = top_k(sims, k)
+            scores[row, : s.shape[1]] = s[0]
+            ids[row, : s.shape[1]] = candidates[pos[0]]
+        return scores, ids
+
+    def _arrays(self):
+        return {
+            "vectors": self.vectors,
+            "centroids": self.centroids,
+            "list_ids": self.list_ids,
+            "list_offsets": self.list_offsets,
+        }
+
+    def _params(self):
+        return {"n_lists": self.n_lists, "nprobe": self.nprobe}
+
+    @classmethod
+    def _from_saved(cls, meta, arrays) -> "IVFIndex":
+        index = cls(n_lists=meta["n_lists"], nprobe=meta["nprobe"])
+        index.vectors = arrays["vectors"]
+        index.centroids = arrays["centroids"]
+        index.list_ids = arrays["list_ids"]
+        index.list_offsets = arrays["list_offsets"]
+        return index
+
+
+BACKENDS = {FlatIndex.kind: FlatIndex, IVFIndex.kind: IVFIndex}
+
+
+def build_index(backend: str, vectors, **params) -> FlatIndex:
+    """Tạo index theo tên backend ("flat" hoặc "ivf")"""
+    if backend not in BACKENDS:
+        raise ValueError(f"Backend không hỗ trợ: {backend}")
+    return BACKENDS[backend](**params).build(vectors)
+
+
+def load_index(directory: str) -> FlatIndex:
+    """Load index đã build offline bằng save()"""
+    with open(os.path.join(directory, INDEX_META_FILE), "r", encoding="utf-8") as f:
+        meta = json.load(f)
+    with np.load(os.path.join(directory, INDEX_ARRAYS_FILE)) as arrays:
+        index = BACKENDS[meta["kind"]]._from_saved(meta, dict(arrays))
+    index.row_hashes = meta.get("rows")
+    index.model_key = meta.get("model_key")
+    return index
+
+
+if __name__ == "__main__":
+    from embedding_store import EmbeddingStore
+
+    parser = argparse.ArgumentParser(
+        description="Build index offline từ embedding store"
+    )
+    parser.add_argument("--store", default="embedding_store")
+    parser.add_argument("--store-dtype", default="float32")
+    parser.add_argument("--backend", default="ivf", choices=sorted(BACKENDS))
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, default=8)
+    parser.add_argument("--out", default="ann_index")
+    args = parser.parse_args()
+
+    store = EmbeddingStore(args.store, dtype=args.store_dtype)
+    if not store.open():
+        raise SystemExit(f"❌ Không mở được embedding store: {args.store}")
+
+    params = {}
+    if args.backend == "ivf":
+        params = {"n_lists": args.n_lists, "nprobe": args.nprobe}
+    index = build_index(args.backend, store.matrix, **params)
+    index.row_hashes = store.row_hashes
+    index.model_key = store.model_key
+    index.save(args.out)
+    print(f"✔️ Đã build index {args.backend} ({len(index)} vectors) vào {args.out}")
@@ -0,0 +1,60 @@
+import argparse
+import time
+
+import numpy as np
+
+from ann_index import build_index
+
+
+def make_vectors(n, dim, n_topics, rng):
+    """Vectors giả lập có cấu trúc cụm (nhiều câu hỏi về cùng chủ đề)"""
+    topics = rng.standard_normal((n_topics, dim)).astype(np.float32)
+    labels = rng.integers(0, n_topics, n)
+    noise = rng.standard_normal((n, dim)).astype(np.float32)
+    return topics[labels] + 1.5 * noise
+
+
+def recall_at_k(exact_ids, approx_ids):
+    hits = [len(set(a) & set(e)) for a, e in zip(approx_ids, exact_ids)]
+    return sum(hits) / exact_ids.size
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k và latency: IVF vs flat")
+    parser.add_argument("--n", type=int, default=100_000)
+    parser.add_argument("--dim", type=int, default=300)
+    parser.add_argument("--queries", type=int, default=500)
+    parser.add_argument("--k", type=int, default=10)
+    parser.add_argument("--n-lists", type=int, default=None)
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 2, 4, 8, 16, 32])
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    vectors = make_vectors(args.n, args.dim, n_topics=max(args.n // 50, 1), rng=rng)
+    queries = vectors[rng.choice(args.n, args.queries, replace=False)]
+    queries = queries + 0.3 * rng.standard_normal(queries.shape).astype(np.float32)
+
+    flat = build_index("flat", vectors)
+    start = time.perf_counter()
+    _, exact_ids = flat.search(queries, args.k)
+    flat_ms = (time.perf_counter() - start) / args.queries * 1e3
+
+    start = time.perf_counter()
+    ivf = build_index("ivf", vectors, n_lists=args.n_lists)
+    build_time = time.perf_counter() - start
+
+    print(f"📊 N={args.n}, dim={args.dim}, {args.queries} queries, k={args.k}")
+    print(f"  - flat: {flat_ms:.3f} ms/query (recall 100%)")
+    print(f"  - ivf build: {build_time:.1f}s, n_lists={ivf.n_lists}")
+    for nprobe in args.nprobe:
+        start = time.perf_counter()
+        _, approx_ids = ivf.search(queries, args.k, nprobe=nprobe)
+        ivf_ms = (time.perf_counter() - start) / args.queries * 1e3
+        print(
+            f"  - ivf nprobe={nprobe:>3}: {ivf_ms:.3f} ms/query, "
+            f"recall@{args.k}={recall_at_k(exact_ids, approx_ids):.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+import argparse
+import csv
+import json
+import time
+
+from hybrid_retriever import CHUNKS_PATH, HybridRetriever
+
+EVAL_PATH = "retrieval_eval.json"
+
+
+def load_eval(path: str):
+    """Câu hỏi (lấy từ clean_data.csv theo id) + nhãn Điều / chunk liên quan"""
+    with open(path, "r", encoding="utf-8") as f:
+        spec = json.load(f)
+    with open(spec["questions_csv"], "r", encoding="utf-8-sig") as f:
+        questions = {row["id"]: row["question"] for row in csv.DictReader(f)}
+    return [dict(label, question=questions[label["id"]]) for label in spec["labels"]]
+
+
+def is_relevant(hit, label) -> bool:
+    return hit["id"] in label["relevant_ids"] or str(
+        hit["metadata"].get("dieu")
+    ) in label["relevant_dieu"]
+
+
+def evaluate(retriever, labels, k, alpha, repeat):
+    hits, rr = 0, 0.0
+    start = time.perf_counter()
+    for _ in range(repeat):
+        results = [retriever.search(l["question"], k=k, alpha=alpha) for l in labels]
+    ms = (time.perf_counter() - start) / (repeat * len(labels)) * 1e3
+    for label, result in zip(labels, results):
+        ranks = [i for i, hit in enumerate(result, 1) if is_relevant(hit, label)]
+        hits += bool(ranks)
+        rr += 1 / ranks[0] if ranks else 0.0
+    return hits / len(labels), rr / len(labels), ms
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall@k và latency của hybrid retriever")
+    parser.add_argument("--chunks", default=CHUNKS_PATH)
+    parser.add_argument("--eval", default=EVAL_PATH)
+    parser.add_argument("--k", type=int, nargs="+", default=[1, 3, 5, 10])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument(
+        "--dense", action="store_true", help="Thêm embedding fastText (cần model)"
+    )
+    parser.add_argument("--alpha", type=float, nargs="+", default=[0.3, 0.5, 0.7])
+    args = parser.parse_args()
+
+    labels = load_eval(args.eval)
+    configs = [("bm25 (âm tiết)", {"bigrams": False}, [1.0])]
+    configs.append(("bm25 (âm tiết + bigram)", {}, [1.0]))
+    if args.dense:
+        from fastext import get_vector
+
+        configs.append(("hybrid", {"embed_fn": get_vector}, args.alpha))
+
+    print(f"📊 {len(labels)} câu hỏi có nhãn")
+    for name, params, alphas in configs:
+        start = time.perf_counter()
+        retriever = HybridRetriever.from_json(args.chunks, **params)
+        build = time.perf_counter() - start
+        print(f"  - {name}: build {build * 1e3:.0f} ms, {len(retriever.vocab)} terms")
+        for alpha in alphas:
+            for k in args.k:
+                recall, mrr, ms = evaluate(retriever, labels, k, alpha, args.repeat)
+                label = f"alpha={alpha} " if len(alphas) > 1 else ""
+                print(
+                    f"      {label}recall@{k}={recall:.2f} MRR@{k}={mrr:.2f} "
+                    f"{ms:.3f} ms/query"
+                )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import time
+
+import numpy as np
+
+import fastext
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="So sánh semantic_qa (từng câu) với semantic_qa_batch"
+    )
+    parser.add_argument("--n", type=int, default=2000, help="Số câu hỏi (phân biệt) lấy từ dataset")
+    parser.add_argument("--k", type=int, default=1)
+    parser.add_argument("--threshold", type=float, default=0.7)
+    args = parser.parse_args()
+
+    engine = fastext.get_engine()
+    # Câu hỏi phân biệt (khác khóa cache) để không phase nào đo cache hit
+    base = engine.df["questions"].astype(str).tolist()
+    distinct = {}
+    for q in base:
+        distinct.setdefault(engine.cache_key(q), q)
+    questions = list(distinct.values())[: args.n]
+    if len(questions) < args.n:
+        print(f"⚠️ Dataset chỉ có {len(questions)} câu hỏi phân biệt, đo trên {len(questions)} câu")
+
+    # Load model / index trước, không tính vào phase nào
+    engine.index
+    engine.model
+
+    def clear_caches():
+        engine.vector_cache.clear()
+        engine.answer_cache.clear()
+
+    clear_caches()
+    start = time.perf_counter()
+    loop_answers = [fastext.semantic_qa(q, args.threshold) for q in questions]
+    loop_time = time.perf_counter() - start
+
+    clear_caches()
+    start = time.perf_counter()
+    batch_results = fastext.semantic_qa_batch(questions, args.k, args.threshold)
+    batch_time = time.perf_counter() - start
+
+    batch_answers = [r[0]["answer"] if r else "không biết" for r in batch_results]
+    agree = np.mean([a == b for a, b in zip(loop_answers, batch_answers)])
+
+    n = len(questions)
+    print(f"📊 {n} câu hỏi, {len(base)} dòng dataset")
+    print(f"  - semantic_qa (vòng lặp): {loop_time:.3f}s ({loop_time / n * 1e3:.3f} ms/câu)")
+    print(f"  - semantic_qa_batch:      {batch_time:.3f}s ({batch_time / n * 1e3:.3f} ms/câu)")
+    print(f"  - Tăng tốc: {loop_time / batch_time:.1f}x")
+    print(f"  - Top-1 trùng khớp: {agree:.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,19 +1,190 @@
-import pandas as pd 
+import pandas as pd
+import fcntl
+import hashlib
+import json
 import os
+import re
+import sys
+import unicodedata
+from contextlib import contextmanager
+
+# instrument.py nằm ở src/ (dùng chung cho mọi pipeline)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import instrument
 
 # Đường dẫn file CSV
 CSV_PATH = os.path.join(os.path.dirname(__file__), "../../clean_data.csv")
 
-def append_records(new_records: list):
+INDEX_VERSION = 1
+
+
+def index_path(csv_path):
+    return csv_path + ".index.json"
+
+
+def question_hash(question) -> str:
+    """Hash câu hỏi đã chuẩn hóa (NFC, lowercase, bỏ dấu câu / khoảng trắng thừa)"""
+    if not isinstance(question, str):
+        question = ""
+    words = re.findall(r"\w+", unicodedata.normalize("NFC", question).lower())
+    return hashlib.sha1(" ".join(words).encode("utf-8")).hexdigest()
+
+
+@contextmanager
+def locked(csv_path):
+    """Khóa độc quyền (fcntl) cho cả chu trình đọc index - kiểm tra - ghi"""
+    with open(csv_path + ".lock", "w") as lock:
+        fcntl.flock(lock, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock, fcntl.LOCK_UN)
+
+
+def _csv_signature(csv_path):
+    st = os.stat(csv_path)
+    return [st.st_size, st.st_mtime_ns]
+
+
+@instrument.timed()
+def build_index(csv_path):
+    """Dựng index (id -> hash câu hỏi) từ file CSV"""
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", usecols=["id", "question"], dtype={"id": str})
+    return {str(i): question_hash(q) for i, q in zip(df["id"], df["question"])}
+
+
+def load_index(csv_path):
+    """
+    Index lưu cạnh file CSV: {id: hash câu hỏi}. Nếu CSV bị sửa ngoài
+    append_records (kích thước / mtime khác lúc ghi index) thì dựng lại.
+    """
+    if not os.path.exists(csv_path):
+        return {}
+    path = index_path(csv_path)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") == INDEX_VERSION and data.get("csv") == _csv_signature(csv_path):
+            instrument.count("index_cache_hits")
+            return data["ids"]
+    return build_index(csv_path)
+
+
+def save_index(csv_path, ids):
+    path = index_path(csv_path)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump({"version": INDEX_VERSION, "csv": _csv_signature(csv_path), "ids": ids}, f)
+    os.replace(tmp, path)
+
+
+def _record_id(record):
+    """id của record dạng str, None nếu thiếu (không có key, None, rỗng, NaN)"""
+    rid = record.get("id")
+    if rid is None or (isinstance(rid, float) and pd.isna(rid)) or str(rid).strip() == "":
+        return None
+    return str(rid)
+
+
+def _next_id(ids) -> int:
+    """id số kế tiếp cho record không có id"""
+    return max((int(i) for i in ids if i.isdigit()), default=0) + 1
+
+
+def append_records(new_records: list, on_duplicate: str = "reject", csv_path: str = CSV_PATH):
     """
     Thêm nhiều record mới vào file clean_data.csv
     new_records: list chứa dict dữ liệu mới, phải khớp cột với file csv
+    on_duplicate: record trùng id hoặc trùng câu hỏi (đã chuẩn hóa) với dòng
+      đã có -> "reject" (bỏ qua) hoặc "upsert" (ghi đè dòng cũ, giữ id cũ)
+    Record không có id chỉ được so theo câu hỏi, nếu là record mới thì được
+    cấp id số kế tiếp.
+    Cả batch được ghi trong một lần, dưới khóa file nên an toàn khi nhiều
+    process cùng ghi. Trả về số record added / updated / rejected.
     """
-    df_new = pd.DataFrame(new_records)
-    df_new.to_csv(CSV_PATH, mode="a", header=False, index=False, encoding="utf-8-sig")
-    print(f"✔️ Đã thêm {len(new_records)} record vào clean_data.csv")
+    if on_duplicate not in ("reject", "upsert"):
+        raise ValueError(f"on_duplicate phải là 'reject' hoặc 'upsert', nhận {on_duplicate!r}")
+
+    stats = {"added": 0, "updated": 0, "rejected": 0}
+    with instrument.stage("append_records"), locked(csv_path):
+        ids = load_index(csv_path)
+        id_by_hash = {h: i for i, h in ids.items()}
+
+        appended = {}  # id -> record mới thêm trong batch này
+        updates = {}  # id dòng cũ -> record mới
+        next_id = _next_id(ids)
+        for record in new_records:
+            rid = _record_id(record)
+            qhash = question_hash(record.get("question"))
+            existing = rid if rid in ids else id_by_hash.get(qhash)
+            if existing is None:
+                if rid is None:
+                    rid = str(next_id)
+                    record = {"id": next_id, **record}  # id là cột đầu nếu tạo file mới
+                if rid.isdigit():
+                    next_id = max(next_id, int(rid) + 1)
+                appended[rid] = record
+                ids[rid] = qhash
+                id_by_hash[qhash] = rid
+                stats["added"] += 1
+            elif on_duplicate == "upsert":
+                if existing in appended:
+                    appended[existing] = dict(record, id=appended[existing]["id"])
+                else:
+                    updates[existing] = dict(record, id=existing)
+                id_by_hash.pop(ids[existing], None)
+                ids[existing] = qhash
+                id_by_hash[qhash] = existing
+                stats["updated"] += 1
+            else:
+                stats["rejected"] += 1
+
+        if updates:
+            _rewrite_with_updates(csv_path, updates, list(appended.values()))
+        elif appended:
+            exists = os.path.exists(csv_path) and os.path.getsize(csv_path) > 0
+            df_new = pd.DataFrame(list(appended.values()))
+            if exists:
+                columns = pd.read_csv(csv_path, encoding="utf-8-sig", nrows=0).columns
+                df_new = df_new.reindex(columns=columns, fill_value="")
+            # BOM chỉ ghi ở đầu file mới, không lặp lại giữa file khi append
+            df_new.to_csv(
+                csv_path, mode="a", header=not exists, index=False,
+                encoding="utf-8" if exists else "utf-8-sig",
+            )
+        if appended or updates or not os.path.exists(index_path(csv_path)):
+            if os.path.exists(csv_path):
+                save_index(csv_path, ids)
+        for key, n in stats.items():
+            instrument.count(f"records_{key}", n)
+
+    print(
+        f"✔️ Đã thêm {stats['added']} record vào clean_data.csv"
+        f" (cập nhật {stats['updated']}, bỏ qua {stats['rejected']} trùng lặp)"
+    )
+    return stats
+
+
+@instrument.timed()
+def _rewrite_with_updates(csv_path, updates, appended):
+    """Ghi lại cả file (qua file tạm) khi có record upsert"""
+    df = pd.read_csv(csv_path, encoding="utf-8-sig", dtype=str, keep_default_na=False)
+    columns = df.columns
+    for pos, rid in enumerate(df["id"]):
+        if rid in updates:
+            record = updates[rid]
+            df.iloc[pos] = [record.get(col, "") for col in columns]
+    if appended:
+        df = pd.concat([df, pd.DataFrame(appended).reindex(columns=columns, fill_value="")])
+    tmp = csv_path + ".tmp"
+    df.to_csv(tmp, index=False, encoding="utf-8-sig")
+    os.replace(tmp, csv_path)
+
 
 if __name__ == "__main__":
+    # --profile[=PATH], --cprofile=PATH
+    instrument.enable_from_argv("append_data")
+
     # Danh sách record thật
     new_records = [
         {
@@ -32,4 +203,5 @@ if __name__ == "__main__":
         }
     ]
 
-    append_records(new_records)
\ No newline at end of file
+    append_records(new_records)
+    instrument.disable()
@@ -0,0 +1,105 @@
+import argparse
+
+import numpy as np
+import pandas as pd
+
+from append_data import CSV_PATH, append_records
+
+SORTED_PATH = "data2.csv"
+# Cột của clean_data.csv (ngoài id, question, answer) để trống, gán nhãn sau
+DATASET_COLUMNS = [
+    'id', 'question', 'answer', 'category_main', 'category_sub', 'tags', 'program',
+    'course_codes', 'year', 'complexity', 'requires_admin', 'solution_type',
+]
+TURN_SEPARATOR = "\n\n"
+
+
+def to_turns(df):
+    """
+    Chuyển các dòng đã sắp xếp thành chuỗi lượt hỏi / đáp: mỗi dòng có
+    questions (sinh viên) và / hoặc answers (giảng viên), câu hỏi đứng trước.
+    """
+    n = len(df)
+    order = np.arange(n)
+    turns = pd.DataFrame({
+        'thread_id': np.concatenate([df['thread_id'].to_numpy(), df['thread_id'].to_numpy()]),
+        'order': np.concatenate([order * 2, order * 2 + 1]),
+        'is_student': np.repeat([True, False], n),
+        'text': pd.concat([df['questions'], df['answers']], ignore_index=True).to_numpy(),
+    })
+    text = turns['text'].astype(object).where(turns['text'].notna(), '')
+    turns['text'] = text.astype(str).str.strip()
+    return turns[turns['text'] != ''].sort_values('order', kind='stable')
+
+
+def assemble_pairs(df):
+    """
+    Ghép từng thread thành các cặp question/answer trong một lượt vectorized:
+    các lượt sinh viên liên tiếp gộp thành một câu hỏi, các lượt giảng viên
+    liên tiếp sau đó gộp thành câu trả lời. Câu hỏi chưa có trả lời bị bỏ.
+    """
+    turns = to_turns(df)
+    if turns.empty:
+        return pd.DataFrame(columns=['thread_id', 'question', 'answer'])
+
+    thread = turns['thread_id'].to_numpy()
+    student = turns['is_student'].to_numpy()
+    new_thread = np.r_[True, thread[1:] != thread[:-1]]
+    # Một cặp mới bắt đầu ở lượt sinh viên đầu thread hoặc ngay sau lượt giảng viên
+    prev_student = np.r_[False, student[:-1]]
+    starts = new_thread | (student & ~prev_student)
+    turns['pair'] = np.cumsum(starts)
+
+    grouped = turns.groupby(['pair', 'is_student'], sort=False)['text'].agg(TURN_SEPARATOR.join)
+    pairs = grouped.unstack('is_student').rename(columns={True: 'question', False: 'answer'})
+    pairs = pairs.reindex(columns=['question', 'answer'])
+    pairs.columns.name = None
+    pairs['thread_id'] = turns.groupby('pair', sort=False)['thread_id'].first()
+    pairs = pairs.dropna(subset=['question', 'answer'])
+    return pairs.reset_index(drop=True)[['thread_id', 'question', 'answer']]
+
+
+def iter_thread_frames(sorted_path, chunksize):
+    """
+    Đọc file đã sắp xếp theo chunk, chỉ trả ra các thread đã đủ dòng
+    (thread cuối chunk được giữ lại ghép với chunk sau).
+    """
+    carry = None
+    for chunk in pd.read_csv(sorted_path, encoding='utf-8-sig', chunksize=chunksize):
+        chunk['thread_id'] = chunk['thread_id'].astype(str)
+        if carry is not None:
+            chunk = pd.concat([carry, chunk], ignore_index=True)
+        last = chunk['thread_id'].iloc[-1]
+        tail = chunk['thread_id'] == last
+        carry = chunk[tail]
+        if (~tail).any():
+            yield chunk[~tail]
+    if carry is not None and len(carry):
+        yield carry
+
+
+def assemble_into_dataset(sorted_path=SORTED_PATH, chunksize=50_000, csv_path=CSV_PATH):
+    """
+    Ghép Q&A từ file đã sắp xếp và ghi dần vào clean_data.csv theo từng chunk.
+    Không tự gán id: append_records cấp id dưới khóa file, an toàn khi có
+    process khác cùng ghi.
+    """
+    stats = {'threads': 0, 'pairs': 0, 'added': 0}
+    for frame in iter_thread_frames(sorted_path, chunksize):
+        pairs = assemble_pairs(frame)
+        stats['threads'] += frame['thread_id'].nunique()
+        if pairs.empty:
+            continue
+        records = pairs[['question', 'answer']].reindex(columns=DATASET_COLUMNS[1:], fill_value='')
+        stats['added'] += append_records(records.to_dict('records'), csv_path=csv_path)['added']
+        stats['pairs'] += len(records)
+    print(f"✔️ Ghép {stats['pairs']} cặp Q&A từ {stats['threads']} thread ({stats['added']} cặp mới)")
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Ghép thread thành cặp Q&A trong clean_data.csv")
+    parser.add_argument("--input", default=SORTED_PATH, help="File đã sắp xếp bởi sort_by_thread.py")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    args = parser.parse_args()
+    assemble_into_dataset(args.input, args.chunksize)
@@ -1,28 +1,30 @@
-import pandas as pd
+import argparse
+import heapq
 import os
+import sys
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-# Đường dẫn file CSV
-CSV_PATH = os.path.join(os.path.dirname(__file__), "../../data.csv")
-
-# Bước 1: Đọc file CSV
-print("Đang đọc file data.csv...")
-df = pd.read_csv(CSV_PATH, encoding='utf-8')
-print(f"✓ Đã đọc {len(df)} dòng")
+import pandas as pd
 
-# Bước 2: Làm sạch thread_id (loại bỏ khoảng trắng thừa)
-print("\nĐang làm sạch thread_id...")
-df['thread_id'] = df['thread_id'].astype(str).str.strip()
+# instrument.py nằm ở src/ (dùng chung cho mọi pipeline)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import instrument
+from instrument import rss_peak_mb
 
-# Bước 3: Chuyển đổi created_at sang datetime
-print("Đang chuyển đổi định dạng thời gian...")
-df['created_at'] = pd.to_datetime(df['created_at'])
+# Đường dẫn file CSV
+CSV_PATH = os.path.join(os.path.dirname(__file__), "../../data.csv")
+OUTPUT_PATH = "data2.csv"
 
-# Bước 4: Sắp xếp theo thread_id và created_at
-print("Đang sắp xếp dữ liệu...")
-df_sorted = df.sort_values(by=['thread_id', 'created_at'], ascending=[True, True])
+SORT_KEYS = ['thread_id', 'created_at']
+TEXT_COLUMNS = ['student_email', 'questions', 'teacher_email', 'answers']
+# Cột phụ giữ thứ tự dòng gốc khi trùng (thread_id, created_at)
+SEQ_COLUMN = '_row'
+# UTF-8 bị đọc nhầm thành latin-1: byte đầu (0xC2-0xF4) + byte tiếp nối
+# (0x80-0xBF). Ô không chứa cặp này thì encode/decode không đổi gì
+MOJIBAKE_RE = '[\u00c2-\u00f4][\u0080-\u00bf]'
 
-# Bước 5: Sửa lỗi encoding tiếng Việt
-print("Đang sửa lỗi encoding tiếng Việt...")
 
 def fix_encoding(text):
     """Sửa lỗi encoding từ latin-1 về utf-8"""
@@ -37,23 +39,311 @@ def fix_encoding(text):
             return text
     return text
 
-# Áp dụng sửa lỗi encoding cho các cột text
-text_columns = ['student_email', 'questions', 'teacher_email', 'answers']
-for col in text_columns:
-    if col in df_sorted.columns:
-        df_sorted[col] = df_sorted[col].apply(fix_encoding)
-
-# Bước 6: Xuất ra file mới
-print("\nĐang xuất file data2.csv...")
-df_sorted.to_csv('data2.csv', index=False, encoding='utf-8-sig')
-
-# Bước 7: Hiển thị thông tin tổng kết
-print("\n" + "="*50)
-print("✅ HOÀN THÀNH!")
-print("="*50)
-print(f"Tổng số dòng: {len(df_sorted)}")
-print(f"Số thread_id unique: {df_sorted['thread_id'].nunique()}")
-print(f"\nTop 5 thread_id có nhiều câu hỏi nhất:")
-print(df_sorted['thread_id'].value_counts().head(5))
-print(f"\nMột vài dòng đầu tiên trong data2.csv:")
-print(df_sorted[['thread_id', 'created_at', 'student_email']].head(10).to_string())
\ No newline at end of file
+
+def prepare(df):
+    """Làm sạch thread_id và chuyển created_at sang datetime"""
+    df['thread_id'] = df['thread_id'].astype(str).str.strip()
+    df['created_at'] = pd.to_datetime(df['created_at'])
+    return df
+
+
+def repair_values(values):
+    """
+    Sửa encoding cho các giá trị ứng viên.
+    Trả về (giá trị đã sửa, số ô sửa được, số ô lỗi giữ nguyên).
+    """
+    repaired, n_fixed, n_failed = [], 0, 0
+    for text in values:
+        try:
+            fixed = text.encode('latin-1').decode('utf-8')
+        except (UnicodeEncodeError, UnicodeDecodeError):
+            fixed = text
+            n_failed += 1
+        else:
+            n_fixed += fixed != text
+        repaired.append(fixed)
+    return repaired, n_fixed, n_failed
+
+
+def new_repair_stats():
+    return {col: {'candidates': 0, 'repaired': 0, 'failed': 0} for col in TEXT_COLUMNS}
+
+
+def fix_text_columns(df, pool=None, stats=None):
+    """
+    Áp dụng sửa lỗi encoding cho các cột text: lọc vectorized các ô có dạng
+    mojibake (MOJIBAKE_RE) rồi chỉ gửi các ô ứng viên của mỗi cột thành một
+    task repair_values (chạy song song trên process pool nếu có, vòng lặp
+    Python không bị GIL chặn); stats cộng dồn số ô ứng viên / sửa được / lỗi
+    theo cột.
+    """
+    columns = [
+        col for col in TEXT_COLUMNS
+        if col in df.columns and not pd.api.types.is_numeric_dtype(df[col])
+    ]
+    masks = [df[col].str.contains(MOJIBAKE_RE, na=False).to_numpy(dtype=bool) for col in columns]
+    tasks = [df[col][mask].tolist() for col, mask in zip(columns, masks)]
+    results = pool.map(repair_values, tasks) if pool else map(repair_values, tasks)
+
+    for col, mask, (repaired, n_fixed, n_failed) in zip(columns, masks, results):
+        if repaired:
+            values = df[col].copy()
+            values.loc[mask] = pd.Series(repaired, index=values.index[mask], dtype=values.dtype)
+            df[col] = values
+        instrument.count("cells_repaired", n_fixed)
+        if stats is not None:
+            stats[col]['candidates'] += len(repaired)
+            stats[col]['repaired'] += n_fixed
+            stats[col]['failed'] += n_failed
+    return df
+
+
+def print_repair_stats(stats):
+    print("\nSửa encoding (ô ứng viên / sửa được / lỗi):")
+    for col, s in stats.items():
+        print(f"  - {col}: {s['candidates']} / {s['repaired']} / {s['failed']}")
+
+
+def print_summary(output_path, n_rows, thread_counts, head):
+    print("\n" + "="*50)
+    print("✅ HOÀN THÀNH!")
+    print("="*50)
+    print(f"Tổng số dòng: {n_rows}")
+    print(f"Số thread_id unique: {len(thread_counts)}")
+    print(f"\nTop 5 thread_id có nhiều câu hỏi nhất:")
+    print(thread_counts.sort_values(ascending=False, kind='stable').head(5))
+    print(f"\nMột vài dòng đầu tiên trong {output_path}:")
+    print(head[['thread_id', 'created_at', 'student_email']].head(10).to_string())
+
+
+def sort_in_memory(csv_path, output_path, pool=None, stats=None):
+    """Đọc toàn bộ file, sắp xếp và ghi ra trong một lần (cần đủ RAM)"""
+    # Bước 1: Đọc file CSV
+    print("Đang đọc file data.csv...")
+    with instrument.stage("read"):
+        df = pd.read_csv(csv_path, encoding='utf-8')
+        instrument.count("rows", len(df))
+    print(f"✓ Đã đọc {len(df)} dòng")
+
+    # Bước 2-3: Làm sạch thread_id, chuyển đổi created_at sang datetime
+    print("\nĐang làm sạch thread_id và chuyển đổi định dạng thời gian...")
+    with instrument.stage("prepare"):
+        df = prepare(df)
+
+    # Bước 4: Sắp xếp theo thread_id và created_at
+    print("Đang sắp xếp dữ liệu...")
+    with instrument.stage("sort"):
+        df_sorted = df.sort_values(by=SORT_KEYS, ascending=[True, True])
+
+    # Bước 5: Sửa lỗi encoding tiếng Việt
+    print("Đang sửa lỗi encoding tiếng Việt...")
+    with instrument.stage("fix_encoding"):
+        df_sorted = fix_text_columns(df_sorted, pool, stats)
+
+    # Bước 6: Xuất ra file mới
+    print(f"\nĐang xuất file {output_path}...")
+    with instrument.stage("write"):
+        df_sorted.to_csv(output_path, index=False, encoding='utf-8-sig')
+
+    return len(df_sorted), df_sorted['thread_id'].value_counts(), df_sorted.head(10)
+
+
+def common_dtypes(chunk_dtypes):
+    """
+    Kiểu chung của từng cột qua các chunk, giống kiểu pandas suy ra khi đọc
+    cả file một lần: cột toàn NaN trong một chunk không tính, số nguyên lẫn
+    số thực -> float64, lẫn số và chữ -> object.
+    """
+    result = {}
+    for col, dtypes in chunk_dtypes.items():
+        kinds = set(dtypes) or {'float64'}
+        if len(kinds) == 1:
+            result[col] = kinds.pop()
+        elif all(pd.api.types.is_numeric_dtype(pd.Series(dtype=d)) for d in kinds):
+            result[col] = 'float64'
+        else:
+            result[col] = 'object'
+    return result
+
+
+@instrument.timed()
+def write_sorted_runs(csv_path, tmp_dir, chunksize):
+    """Đọc từng chunk, sắp xếp, ghi thành các run Parquet đã sắp xếp"""
+    runs = []
+    chunk_dtypes = {}
+    thread_counts = None
+    offset = 0
+    for i, chunk in enumerate(pd.read_csv(csv_path, encoding='utf-8', chunksize=chunksize)):
+        for col in chunk.columns:
+            seen = chunk_dtypes.setdefault(col, [])
+            if chunk[col].notna().any():
+                seen.append(str(chunk[col].dtype))
+        chunk = prepare(chunk)
+        chunk[SEQ_COLUMN] = range(offset, offset + len(chunk))
+        offset += len(chunk)
+        chunk = chunk.sort_values(by=SORT_KEYS + [SEQ_COLUMN])
+
+        counts = chunk['thread_id'].value_counts(sort=False)
+        thread_counts = counts if thread_counts is None else thread_counts.add(counts, fill_value=0)
+
+        path = os.path.join(tmp_dir, f"run_{i:05d}.parquet")
+        chunk.to_parquet(path, index=False)
+        runs.append(path)
+        instrument.count("rows", len(chunk))
+        instrument.count("runs")
+        print(f"  run {i + 1}: {len(chunk)} dòng (RSS đỉnh {rss_peak_mb():.0f} MB)")
+
+    if thread_counts is None:
+        thread_counts = pd.Series(dtype='int64')
+    return runs, offset, common_dtypes(chunk_dtypes), thread_counts.astype('int64')
+
+
+def rows_not_after(df, key):
+    """Số dòng đầu của df (đã sắp xếp) có khoá <= key; NaT xếp cuối như sort_values"""
+    thread_id, created, seq = key
+    created_at = df['created_at']
+    if pd.isna(created):
+        before, same = created_at.notna(), created_at.isna()
+    else:
+        before, same = created_at < created, created_at == created
+    mask = (df['thread_id'] < thread_id) | (
+        (df['thread_id'] == thread_id) & (before | (same & (df[SEQ_COLUMN] <= seq)))
+    )
+    return int(mask.sum())
+
+
+@instrument.timed()
+def merge_runs(runs, output_path, dtypes, batch_rows, pool=None, stats=None):
+    """
+    K-way merge các run đã sắp xếp. Mỗi run được đọc theo batch và giữ phần
+    chưa ghi trong buffer riêng. Frontier là khoá dòng cuối nhỏ nhất trong
+    các run còn batch chưa đọc: mọi dòng có khoá <= frontier đã chắc chắn
+    đúng vị trí nên được ghi ra, mỗi dòng chỉ được sắp xếp một lần; run giữ
+    frontier đã ghi hết buffer nên đọc batch tiếp theo. Bộ nhớ chỉ cỡ số run
+    x batch_rows.
+    """
+    import pyarrow.parquet as pq
+
+    readers = [pq.ParquetFile(path).iter_batches(batch_size=batch_rows) for path in runs]
+    buffers = {}  # run -> các dòng đã đọc nhưng chưa ghi (đã sắp xếp)
+    frontier = []  # heap (khoá dòng cuối đã đọc, run) của các run còn batch
+
+    def load(run_idx):
+        batch = next(readers[run_idx], None)
+        if batch is None:
+            return
+        df = batch.to_pandas()
+        buffers[run_idx] = df
+        last = df.iloc[-1]
+        created = last['created_at']
+        # NaT xếp cuối: (True, 0) lớn hơn mọi (False, thời điểm)
+        order = (last['thread_id'], pd.isna(created), created if not pd.isna(created) else 0, last[SEQ_COLUMN])
+        heapq.heappush(frontier, (order, (last['thread_id'], created, last[SEQ_COLUMN]), run_idx))
+
+    head = None
+    with open(output_path, 'w', encoding='utf-8-sig', newline='') as f:
+
+        def write(pieces):
+            nonlocal head
+            ready = pd.concat(pieces, ignore_index=True).sort_values(by=SORT_KEYS + [SEQ_COLUMN])
+            ready = ready.drop(columns=SEQ_COLUMN)
+            for col, dtype in dtypes.items():
+                if col not in ('thread_id', 'created_at') and str(ready[col].dtype) != dtype:
+                    ready[col] = ready[col].astype(dtype)
+            ready = fix_text_columns(ready, pool, stats)
+            ready.to_csv(f, index=False, header=head is None)
+            instrument.count("merge_batches")
+            if head is None:
+                head = ready.head(10)
+
+        for run_idx in range(len(runs)):
+            load(run_idx)
+
+        while frontier:
+            _, bound, run_idx = heapq.heappop(frontier)
+            pieces = []
+            for r, buf in list(buffers.items()):
+                cut = rows_not_after(buf, bound)
+                if cut:
+                    pieces.append(buf.iloc[:cut])
+                    buffers[r] = buf.iloc[cut:]
+                if not len(buffers[r]):
+                    del buffers[r]
+            write(pieces)
+            load(run_idx)
+
+        # Mọi run đã đọc hết: phần còn lại trong buffer là đuôi của output
+        if buffers:
+            write(list(buffers.values()))
+    return head
+
+
+def sort_chunked(
+    csv_path, output_path, chunksize, batch_rows=None, tmp_dir=None, pool=None, stats=None
+):
+    """
+    Chế độ out-of-core: đọc theo chunk, ghi các run đã sắp xếp ra file Parquet
+    tạm rồi k-way merge thành output, cho kết quả giống sort_in_memory.
+    """
+    batch_rows = batch_rows or max(chunksize // 8, 1)
+    with tempfile.TemporaryDirectory(dir=tmp_dir) as tmp:
+        print(f"Đang đọc và sắp xếp theo chunk {chunksize} dòng...")
+        runs, n_rows, dtypes, thread_counts = write_sorted_runs(csv_path, tmp, chunksize)
+        print(f"✓ Đã đọc {n_rows} dòng, {len(runs)} run")
+
+        print(f"\nĐang merge {len(runs)} run và xuất file {output_path}...")
+        head = merge_runs(runs, output_path, dtypes, batch_rows, pool, stats)
+    return n_rows, thread_counts, head if head is not None else pd.DataFrame(columns=dtypes)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sắp xếp data.csv theo thread_id, created_at")
+    parser.add_argument("--input", default=CSV_PATH)
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument(
+        "--chunksize", type=int, default=None,
+        help="Số dòng mỗi chunk; bật chế độ out-of-core (cần pyarrow)",
+    )
+    parser.add_argument("--batch-rows", type=int, default=None, help="Số dòng mỗi batch khi merge")
+    parser.add_argument("--tmp-dir", default=None, help="Thư mục chứa các run tạm")
+    parser.add_argument(
+        "--workers", type=int, default=len(TEXT_COLUMNS),
+        help="Số process sửa encoding song song, mỗi cột một task (1 = tuần tự)",
+    )
+    parser.add_argument(
+        "--assemble", action="store_true",
+        help="Sau khi sắp xếp, ghép thread thành cặp Q&A vào clean_data.csv",
+    )
+    instrument.add_profile_args(parser)
+    args = parser.parse_args()
+    instrument.enable_from_args("sort_by_thread", args)
+
+    start = time.perf_counter()
+    repair_stats = new_repair_stats()
+    pool = ProcessPoolExecutor(args.workers) if args.workers > 1 else None
+    try:
+        if args.chunksize:
+            n_rows, thread_counts, head = sort_chunked(
+                args.input, args.output, args.chunksize, args.batch_rows, args.tmp_dir,
+                pool, repair_stats,
+            )
+        else:
+            n_rows, thread_counts, head = sort_in_memory(
+                args.input, args.output, pool, repair_stats
+            )
+    finally:
+        if pool:
+            pool.shutdown()
+    elapsed = time.perf_counter() - start
+
+    # Bước 7: Hiển thị thông tin tổng kết
+    print_summary(args.output, n_rows, thread_counts, head)
+    print_repair_stats(repair_stats)
+    print(f"\n⏱️  Thời gian: {elapsed:.2f}s, RSS đỉnh: {rss_peak_mb():.0f} MB")
+
+    if args.assemble:
+        from assemble_threads import assemble_into_dataset
+
+        with instrument.stage("assemble"):
+            assemble_into_dataset(args.output, args.chunksize or 50_000)
+    instrument.disable()
@@ -0,0 +1,188 @@
+import argparse
+import json
+import zlib
+from collections import Counter
+from typing import Dict, List, Sequence
+
+import numpy as np
+
+from process_data import clean_text
+
+MERSENNE_PRIME = (1 << 31) - 1
+MAX_HASH = np.uint64(MERSENNE_PRIME)
+
+
+def shingles(text: str, k: int = 3) -> List[int]:
+    """Shingle k âm tiết liên tiếp của câu hỏi đã chuẩn hóa, hash về uint32"""
+    syllables = clean_text(text).split()
+    if len(syllables) < k:
+        grams = [" ".join(syllables)] if syllables else []
+    else:
+        grams = [" ".join(syllables[i : i + k]) for i in range(len(syllables) - k + 1)]
+    return [zlib.crc32(g.encode("utf-8")) for g in grams]
+
+
+class MinHashLSH:
+    """
+    MinHash (num_perm hàm băm a*x + b mod p) + LSH chia signature thành
+    bands x rows: chỉ các câu trùng ít nhất một band mới được so sánh,
+    nên số cặp phải kiểm tra gần tuyến tính thay vì n^2.
+    """
+
+    def __init__(self, num_perm: int = 128, bands: int = 32, seed: int = 1):
+        if num_perm % bands:
+            raise ValueError("num_perm phải chia hết cho bands")
+        self.num_perm = num_perm
+        self.bands = bands
+        self.rows = num_perm // bands
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MERSENNE_PRIME, num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: Sequence[int]) -> np.ndarray:
+        if not hashes:
+            return np.full(self.num_perm, MAX_HASH, dtype=np.uint64)
+        x = np.asarray(hashes, dtype=np.uint64) % MAX_HASH
+        # (num_perm, n_shingles), a, x < 2^31 nên a*x không tràn uint64
+        values = (self.a[:, None] * x[None, :] + self.b[:, None]) % MAX_HASH
+        return values.min(axis=1)
+
+    def signatures(self, texts: Sequence[str], k: int = 3) -> np.ndarray:
+        return np.vstack([self.signature(shingles(t, k)) for t in texts]) if texts else (
+            np.empty((0, self.num_perm), dtype=np.uint64)
+        )
+
+    def candidate_pairs(self, signatures: np.ndarray):
+        """
+        Các cặp (i, j), i < j, trùng ít nhất một band. Trong mỗi bucket chỉ ghép
+        với phần tử đầu (hình sao) để bucket lớn không sinh ra m^2 cặp;
+        các cặp còn lại thường được band khác hoặc union-find bắc cầu.
+        Câu không có shingle nào (rỗng) không tham gia.
+        """
+        empty = (signatures == MAX_HASH).all(axis=1)
+        pairs = set()
+        for band in range(self.bands):
+            block = signatures[:, band * self.rows : (band + 1) * self.rows]
+            buckets: Dict[bytes, List[int]] = {}
+            for i, row in enumerate(block):
+                if not empty[i]:
+                    buckets.setdefault(row.tobytes(), []).append(i)
+            for members in buckets.values():
+                pairs.update((members[0], m) for m in members[1:])
+        return pairs
+
+    def threshold(self) -> float:
+        """Độ tương đồng Jaccard mà xác suất thành ứng viên là ~50%"""
+        return (1 / self.bands) ** (1 / self.rows)
+
+
+def cluster(signatures: np.ndarray, pairs, threshold: float) -> np.ndarray:
+    """Union-find trên các cặp có Jaccard ước lượng >= threshold, trả về nhãn cụm"""
+    parent = list(range(len(signatures)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for i, j in pairs:
+        if np.mean(signatures[i] == signatures[j]) >= threshold:
+            ri, rj = find(i), find(j)
+            if ri != rj:
+                parent[max(ri, rj)] = min(ri, rj)
+    return np.array([find(i) for i in range(len(signatures))])
+
+
+def canonical_index(members: List[int], answers: Sequence[str]) -> int:
+    """
+    Dòng đại diện cho cụm: câu trả lời xuất hiện nhiều nhất (so sánh sau
+    khi chuẩn hóa khoảng trắng), hòa thì lấy câu trả lời dài hơn, rồi dòng đầu.
+    """
+    def norm(a):
+        return " ".join(str(a).split()).lower() if isinstance(a, str) else ""
+
+    counts = Counter(norm(answers[m]) for m in members)
+    return min(members, key=lambda m: (-counts[norm(answers[m])], -len(norm(answers[m])), m))
+
+
+def compact(
+    df,
+    question_col: str,
+    answer_col: str,
+    id_col=None,
+    threshold: float = 0.6,
+    num_perm: int = 128,
+    bands: int = 32,
+    k: int = 3,
+):
+    """
+    Gom các câu hỏi gần trùng thành cụm, giữ một dòng đại diện mỗi cụm.
+    Trả về (DataFrame đã rút gọn, mapping list {row_id, canonical_id, cluster}).
+    """
+    lsh = MinHashLSH(num_perm, bands)
+    questions = df[question_col].tolist()
+    answers = df[answer_col].tolist()
+    ids = df[id_col].tolist() if id_col else list(range(len(df)))
+
+    sigs = lsh.signatures(questions, k)
+    labels = cluster(sigs, lsh.candidate_pairs(sigs), threshold)
+
+    clusters: Dict[int, List[int]] = {}
+    for i, label in enumerate(labels):
+        clusters.setdefault(int(label), []).append(i)
+
+    keep = []
+    mapping = []
+    for cluster_no, members in enumerate(clusters.values()):
+        rep = canonical_index(members, answers)
+        keep.append(rep)
+        for m in members:
+            mapping.append(
+                {"row_id": ids[m], "canonical_id": ids[rep], "cluster": cluster_no}
+            )
+    return df.iloc[sorted(keep)], mapping
+
+
+def _to_builtin(value):
+    return value.item() if isinstance(value, np.generic) else value
+
+
+if __name__ == "__main__":
+    import time
+
+    import pandas as pd
+
+    parser = argparse.ArgumentParser(description="Rút gọn dataset: gom câu hỏi gần trùng (MinHash/LSH)")
+    parser.add_argument("--input", default="../clean_data.csv")
+    parser.add_argument("--output", default="../clean_data.compact.csv")
+    parser.add_argument("--mapping", default="../clean_data.compact.mapping.json")
+    parser.add_argument("--threshold", type=float, default=0.6, help="Jaccard tối thiểu để gộp")
+    parser.add_argument("--num-perm", type=int, default=128)
+    parser.add_argument("--bands", type=int, default=32)
+    parser.add_argument("--shingle", type=int, default=3, help="Số âm tiết mỗi shingle")
+    args = parser.parse_args()
+
+    df = pd.read_csv(args.input, encoding="utf-8-sig")
+    # clean_data.csv dùng question/answer, clean_dataset.csv dùng questions/answers
+    question_col = "question" if "question" in df.columns else "questions"
+    answer_col = "answer" if "answer" in df.columns else "answers"
+    id_col = "id" if "id" in df.columns else None
+
+    start = time.perf_counter()
+    compacted, mapping = compact(
+        df, question_col, answer_col, id_col,
+        args.threshold, args.num_perm, args.bands, args.shingle,
+    )
+    elapsed = time.perf_counter() - start
+
+    compacted.to_csv(args.output, index=False, encoding="utf-8-sig")
+    with open(args.mapping, "w", encoding="utf-8") as f:
+        json.dump(
+            [{k: _to_builtin(v) for k, v in m.items()} for m in mapping],
+            f, ensure_ascii=False, indent=2,
+        )
+    print(
+        f"✅ {len(df)} câu hỏi -> {len(compacted)} cụm ({elapsed:.2f}s), "
+        f"ghi {args.output} và {args.mapping}"
+    )
@@ -0,0 +1,289 @@
+import argparse
+import glob
+import json
+import multiprocessing as mp
+import os
+import shutil
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from itertools import chain
+from typing import Callable, Dict, Iterable, Iterator, List, Optional
+
+import numpy as np
+
+from embedding_store import model_fingerprint, text_hash
+
+CHUNKS_PATH = "extract_from_pdf/quy_che_rag_data.json"
+OUTPUT_PATH = "chunk_embeddings"  # -> chunk_embeddings.npy + chunk_embeddings.json
+MODEL_PATH = "cc.vi.300.bin"
+
+# Tăng khi đổi định dạng output / checkpoint hoặc cách chuẩn hóa text
+EMBED_VERSION = 2
+
+# Model của process hiện tại: load một lần ở process cha trước khi fork,
+# các worker dùng chung trang nhớ (copy-on-write) thay vì mỗi worker load lại
+_MODEL = None
+
+
+def load_fasttext(model_path: str):
+    import fasttext
+
+    return fasttext.load_model(model_path)
+
+
+def _init_worker(model_path: str, loader: Callable):
+    """Initializer của pool: chỉ load model nếu chưa thừa hưởng từ process cha (start method khác fork)"""
+    global _MODEL
+    if _MODEL is None:
+        _MODEL = loader(model_path)
+
+
+def _embed_batch(task):
+    """Worker: embed một batch text -> ma trận float32"""
+    batch_no, texts = task
+    vectors = [np.asarray(_MODEL.get_sentence_vector(t), dtype=np.float32) for t in texts]
+    return batch_no, np.vstack(vectors)
+
+
+def iter_chunk_records(path: str) -> Iterator[Dict]:
+    """Chunk từ file JSON ({"chunks": [...]}), JSON Lines (stream_to_jsonl) hoặc "-" (JSON Lines từ stdin)"""
+    if path == "-":
+        for line in sys.stdin:
+            if line.strip():
+                yield json.loads(line)
+        return
+    with open(path, "r", encoding="utf-8") as f:
+        if path.endswith(".jsonl"):
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from json.load(f)["chunks"]
+
+
+def embed_text(chunk: Dict) -> str:
+    """
+    Text đem embed: nguyên văn chunk, chỉ gộp khoảng trắng (fastText không
+    nhận xuống dòng). Không dùng clean_text: đó là bộ lọc email sinh viên, sẽ
+    xóa mất câu chữ và tách số ("3.5" -> "3. 5") của quy chế.
+    """
+    return " ".join(chunk["text"].split())
+
+
+class ChunkEmbeddingBuilder:
+    """
+    Build ma trận embedding (N, dim) float32 cho chunks, dòng i ứng với
+    ids[i] trong file .json đi kèm.
+      - chunk chia batch, embed song song bằng process pool (mỗi worker một model)
+      - mỗi batch xong được ghi ngay thành file part trong <output>.parts/,
+        chạy lại sau khi bị ngắt sẽ bỏ qua các text đã có vector
+      - output cũ cùng model được dùng lại theo hash text
+    """
+
+    def __init__(
+        self,
+        output_path: str = OUTPUT_PATH,
+        model_path: str = MODEL_PATH,
+        batch_size: int = 64,
+        workers: Optional[int] = None,
+        loader: Callable = load_fasttext,
+    ):
+        self.output_path = output_path
+        self.model_path = model_path
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self.loader = loader
+        self.stats = {"chunks": 0, "reused": 0, "resumed": 0, "embedded": 0, "batches": 0}
+
+    @property
+    def matrix_path(self) -> str:
+        return self.output_path + ".npy"
+
+    @property
+    def sidecar_path(self) -> str:
+        return self.output_path + ".json"
+
+    @property
+    def parts_dir(self) -> str:
+        return self.output_path + ".parts"
+
+    # ---------- vector đã có ----------
+
+    def _load_output(self, model_key: str) -> Dict[str, np.ndarray]:
+        """hash text -> vector từ output lần build trước (nếu cùng version và model)"""
+        if not (os.path.exists(self.matrix_path) and os.path.exists(self.sidecar_path)):
+            return {}
+        with open(self.sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+        if sidecar.get("version") != EMBED_VERSION or sidecar.get("model_key") != model_key:
+            return {}
+        matrix = np.load(self.matrix_path, mmap_mode="r")
+        return {h: matrix[i] for i, h in enumerate(sidecar["hashes"])}
+
+    def _load_parts(self, model_key: str) -> Dict[str, np.ndarray]:
+        """hash text -> vector từ checkpoint dở dang; checkpoint của model khác bị xóa"""
+        checkpoint = os.path.join(self.parts_dir, "checkpoint.json")
+        if os.path.exists(checkpoint):
+            with open(checkpoint, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            if meta.get("version") != EMBED_VERSION or meta.get("model_key") != model_key:
+                shutil.rmtree(self.parts_dir)
+        os.makedirs(self.parts_dir, exist_ok=True)
+        with open(checkpoint, "w", encoding="utf-8") as f:
+            json.dump({"version": EMBED_VERSION, "model_key": model_key}, f)
+
+        vectors = {}
+        for path in sorted(glob.glob(os.path.join(self.parts_dir, "part_*.npz"))):
+            with np.load(path) as part:
+                vectors.update(zip(part["hashes"].tolist(), part["vectors"]))
+        return vectors
+
+    def _save_part(self, batch_no: int, hashes: List[str], matrix: np.ndarray):
+        path = os.path.join(self.parts_dir, f"part_{batch_no:06d}.npz")
+        tmp = path + ".tmp.npz"
+        np.savez(tmp, hashes=np.array(hashes), vectors=matrix)
+        os.replace(tmp, path)
+
+    # ---------- embed ----------
+
+    def _pending_batches(self, texts: Dict[str, str], known) -> Iterator[tuple]:
+        # Đánh số tiếp sau các part đã có để không ghi đè checkpoint cũ
+        existing = glob.glob(os.path.join(self.parts_dir, "part_*.npz"))
+        batch_no = max((int(os.path.basename(p)[5:11]) for p in existing), default=-1) + 1
+        batch_hashes: List[str] = []
+        for h, text in texts.items():
+            if h in known:
+                continue
+            batch_hashes.append(h)
+            if len(batch_hashes) == self.batch_size:
+                yield batch_no, batch_hashes
+                batch_no += 1
+                batch_hashes = []
+        if batch_hashes:
+            yield batch_no, batch_hashes
+
+    def _run_batches(self, texts: Dict[str, str], known: Dict[str, np.ndarray]):
+        """Embed các text chưa có vector, ghi part ngay khi từng batch xong"""
+        global _MODEL
+        batches = self._pending_batches(texts, known)
+        first = next(batches, None)
+        if first is None:
+            return
+        pending_total = sum(1 for h in texts if h not in known)
+        print(f"🧮 Embed {pending_total} text, batch {self.batch_size}, {self.workers} process")
+
+        if _MODEL is None:
+            _MODEL = self.loader(self.model_path)
+
+        def record(batch_no, hashes, matrix):
+            self._save_part(batch_no, hashes, matrix)
+            known.update(zip(hashes, matrix))
+            self.stats["embedded"] += len(hashes)
+            self.stats["batches"] += 1
+
+        def tasks():
+            for batch_no, hashes in chain([first], batches):
+                yield batch_no, hashes, (batch_no, [texts[h] for h in hashes])
+
+        if self.workers == 1:
+            for batch_no, hashes, task in tasks():
+                record(batch_no, hashes, _embed_batch(task)[1])
+            return
+
+        # fork: worker thừa hưởng _MODEL đã load; nền tảng không có fork thì initializer load lại
+        context = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+        with ProcessPoolExecutor(
+            self.workers, mp_context=context,
+            initializer=_init_worker, initargs=(self.model_path, self.loader),
+        ) as pool:
+            in_flight = {}
+            for batch_no, hashes, task in tasks():
+                # Giới hạn số batch đang chờ để bộ nhớ không tăng theo corpus
+                if len(in_flight) >= 2 * self.workers:
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        record(*in_flight.pop(future), future.result()[1])
+                in_flight[pool.submit(_embed_batch, task)] = (batch_no, hashes)
+            for future in list(in_flight):
+                record(*in_flight.pop(future), future.result()[1])
+
+    def build(self, chunks: Iterable[Dict]) -> Dict:
+        """Embed chunks (list hoặc iterator), ghi ma trận + sidecar, trả về thống kê"""
+        t0 = time.perf_counter()
+        model_key = model_fingerprint(self.model_path)
+
+        ids: List[str] = []
+        hashes: List[str] = []
+        texts: Dict[str, str] = {}  # hash -> text đem embed (text trùng chỉ embed một lần)
+        for chunk in chunks:
+            text = embed_text(chunk)
+            h = text_hash(text)
+            ids.append(chunk["id"])
+            hashes.append(h)
+            texts.setdefault(h, text)
+        self.stats["chunks"] = len(ids)
+
+        known = self._load_output(model_key)
+        self.stats["reused"] = sum(1 for h in texts if h in known)
+        resumed = {h: v for h, v in self._load_parts(model_key).items() if h in texts and h not in known}
+        self.stats["resumed"] = len(resumed)
+        known.update(resumed)
+
+        self._run_batches(texts, known)
+        self._write_output(ids, hashes, known, model_key)
+        shutil.rmtree(self.parts_dir, ignore_errors=True)
+
+        self.stats["seconds"] = time.perf_counter() - t0
+        print(
+            f"✅ {len(ids)} chunks -> {self.matrix_path} ({self.stats['embedded']} embed mới, "
+            f"{self.stats['reused']} dùng lại, {self.stats['resumed']} từ checkpoint, "
+            f"{self.stats['seconds']:.1f}s)"
+        )
+        return self.stats
+
+    def _write_output(self, ids: List[str], hashes: List[str], vectors: Dict, model_key: str):
+        dim = len(next(iter(vectors.values()))) if vectors else 0
+        tmp_matrix = self.matrix_path + ".tmp.npy"
+        tmp_sidecar = self.sidecar_path + ".tmp"
+        matrix = np.lib.format.open_memmap(tmp_matrix, mode="w+", dtype=np.float32, shape=(len(ids), dim))
+        for i, h in enumerate(hashes):
+            matrix[i] = vectors[h]
+        matrix.flush()
+        del matrix
+        with open(tmp_sidecar, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": EMBED_VERSION,
+                    "model_key": model_key,
+                    "dtype": "float32",
+                    "dim": dim,
+                    "ids": ids,
+                    "hashes": hashes,
+                },
+                f,
+                ensure_ascii=False,
+            )
+        vectors.clear()  # giải phóng mmap của output cũ trước khi thay file
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_sidecar, self.sidecar_path)
+
+
+def load_chunk_embeddings(output_path: str = OUTPUT_PATH):
+    """(ma trận float32 mmap, list chunk id cùng thứ tự dòng)"""
+    with open(output_path + ".json", "r", encoding="utf-8") as f:
+        sidecar = json.load(f)
+    return np.load(output_path + ".npy", mmap_mode="r"), sidecar["ids"]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Embed chunks quy chế (batch, process pool, checkpoint)")
+    parser.add_argument("--chunks", default=CHUNKS_PATH, help='File .json / .jsonl, hoặc "-" đọc JSON Lines từ stdin')
+    parser.add_argument("--output", default=OUTPUT_PATH)
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--batch-size", type=int, default=64)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    builder = ChunkEmbeddingBuilder(args.output, args.model, args.batch_size, args.workers)
+    builder.build(iter_chunk_records(args.chunks))
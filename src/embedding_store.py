@@ -0,0 +1,164 @@
+import hashlib
+import json
+import os
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+# Tăng số version khi thay đổi định dạng file -> store cũ sẽ bị build lại
+STORE_VERSION = 1
+
+MATRIX_FILE = "embeddings.npy"
+SIDECAR_FILE = "rows.json"
+
+
+def text_hash(text: str) -> str:
+    """Hash nội dung một câu hỏi (dùng làm khóa cho từng dòng embedding)"""
+    return hashlib.sha1(str(text).encode("utf-8")).hexdigest()
+
+
+def model_fingerprint(model_path: str, sample_bytes: int = 1 << 20) -> str:
+    """
+    Dấu vân tay của file model: kích thước + hash 1MB đầu và 1MB cuối.
+    Đọc toàn bộ file .bin vài GB chỉ để hash thì quá chậm cho mỗi lần khởi động.
+    """
+    size = os.path.getsize(model_path)
+    h = hashlib.sha1(str(size).encode())
+    with open(model_path, "rb") as f:
+        h.update(f.read(sample_bytes))
+        if size > sample_bytes:
+            f.seek(max(size - sample_bytes, sample_bytes))
+            h.update(f.read(sample_bytes))
+    return h.hexdigest()
+
+
+class EmbeddingStore:
+    """
+    Kho embedding trên đĩa:
+      - embeddings.npy: ma trận (N, dim) float32/float16, mở bằng mmap (zero-copy)
+      - rows.json: version, khóa model, dtype và hash nội dung của từng dòng
+    """
+
+    def __init__(self, directory: str, dtype: str = "float32"):
+        if dtype not in ("float32", "float16"):
+            raise ValueError(f"dtype không hỗ trợ: {dtype}")
+        self.directory = directory
+        self.dtype = dtype
+        self.matrix: Optional[np.ndarray] = None
+        self.row_hashes: List[str] = []
+        self.model_key: Optional[str] = None
+
+    @property
+    def matrix_path(self) -> str:
+        return os.path.join(self.directory, MATRIX_FILE)
+
+    @property
+    def sidecar_path(self) -> str:
+        return os.path.join(self.directory, SIDECAR_FILE)
+
+    def open(self, model_key: Optional[str] = None) -> bool:
+        """
+        Mở store có sẵn (memory-mapped). Trả về False nếu chưa có, sai version,
+        sai dtype hoặc được build bằng model khác.
+        """
+        if not (
+            os.path.exists(self.matrix_path) and os.path.exists(self.sidecar_path)
+        ):
+            return False
+
+        with open(self.sidecar_path, "r", encoding="utf-8") as f:
+            sidecar = json.load(f)
+
+        if sidecar.get("version") != STORE_VERSION:
+            return False
+        if sidecar.get("dtype") != self.dtype:
+            return False
+        if model_key is not None and sidecar.get("model_key") != model_key:
+            return False
+
+        matrix = np.load(self.matrix_path, mmap_mode="r")
+        if matrix.shape[0] != len(sidecar["rows"]):
+            return False
+
+        self.matrix = matrix
+        self.row_hashes = sidecar["rows"]
+        self.model_key = sidecar.get("model_key")
+        return True
+
+    def build(
+        self,
+        texts: List[str],
+        embed_fn: Callable[[str], np.ndarray],
+        model_key: str,
+    ) -> Dict[str, int]:
+        """
+        Build (hoặc cập nhật) store cho danh sách texts.
+        Chỉ gọi embed_fn cho những dòng có hash chưa có trong store cũ.
+        """
+        old_rows: Dict[str, int] = {}
+        if self.open(model_key):
+            old_rows = {h: i for i, h in enumerate(self.row_hashes)}
+        old_matrix = self.matrix
+
+        hashes = [text_hash(t) for t in texts]
+        vectors = []
+        reused = 0
+        for text, h in zip(texts, hashes):
+            if h in old_rows:
+                vectors.append(np.asarray(old_matrix[old_rows[h]]))
+                reused += 1
+            else:
+                vectors.append(np.asarray(embed_fn(text)))
+
+        if vectors:
+            matrix = np.vstack(vectors).astype(self.dtype)
+        else:
+            dim = old_matrix.shape[1] if old_matrix is not None else 0
+            matrix = np.zeros((0, dim), dtype=self.dtype)
+
+        # Ghi ra file tạm rồi os.replace để không làm hỏng store đang được mmap
+        os.makedirs(self.directory, exist_ok=True)
+        tmp_matrix = self.matrix_path + ".tmp.npy"
+        tmp_sidecar = self.sidecar_path + ".tmp"
+        np.save(tmp_matrix, matrix)
+        with open(tmp_sidecar, "w", encoding="utf-8") as f:
+            json.dump(
+                {
+                    "version": STORE_VERSION,
+                    "model_key": model_key,
+                    "dtype": self.dtype,
+                    "dim": int(matrix.shape[1]),
+                    "rows": hashes,
+                },
+                f,
+            )
+        self.matrix = None
+        del vectors, old_matrix
+        os.replace(tmp_matrix, self.matrix_path)
+        os.replace(tmp_sidecar, self.sidecar_path)
+
+        self.open(model_key)
+        return {"total": len(texts), "reused": reused, "embedded": len(texts) - reused}
+
+
+def load_or_build(
+    directory: str,
+    texts: List[str],
+    embed_fn: Callable[[str], np.ndarray],
+    model_key: str,
+    dtype: str = "float32",
+) -> np.ndarray:
+    """
+    Mở store nếu khớp hoàn toàn với texts hiện tại, ngược lại build lại
+    (chỉ embed các dòng thay đổi). Trả về ma trận embedding (mmap).
+    """
+    store = EmbeddingStore(directory, dtype=dtype)
+    if store.open(model_key) and store.row_hashes == [text_hash(t) for t in texts]:
+        return store.matrix
+
+    stats = store.build(texts, embed_fn, model_key)
+    print(
+        f"✔️ Embedding store: {stats['embedded']} dòng mới, "
+        f"{stats['reused']} dòng dùng lại"
+    )
+    return store.matrix
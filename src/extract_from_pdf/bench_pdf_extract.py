@@ -0,0 +1,101 @@
+import argparse
+import os
+import tempfile
+import time
+
+from quy_che import extract_pages_parallel, extract_text_from_pdf_advanced
+
+
+def write_synthetic_pdf(path: str, n_pages: int, lines_per_page: int = 45):
+    """Sinh PDF nhiều trang (font Helvetica, chữ ASCII) không cần thư viện ngoài"""
+    objects = []
+
+    def add(obj: bytes) -> int:
+        objects.append(obj)
+        return len(objects)
+
+    font_id = add(b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    pages_id = add(b"")  # điền sau khi biết các trang
+    page_ids = []
+    dieu = 1
+    for page_no in range(n_pages):
+        lines = []
+        for i in range(lines_per_page):
+            if i % 15 == 0:
+                lines.append(f"Dieu {dieu}. Quy dinh ve hoc phan so {dieu}")
+                dieu += 1
+            else:
+                lines.append(
+                    f"{i % 15}. Sinh vien phai tich luy toi thieu {i * 3} tin chi "
+                    f"theo quy dinh tai khoan {i % 7 + 1} Dieu {dieu} (trang {page_no + 1})"
+                )
+        ops = ["BT", "/F1 10 Tf", "14 TL", "40 800 Td"]
+        for line in lines:
+            ops.append(f"({line}) Tj T*")
+        ops.append("ET")
+        stream = "\n".join(ops).encode("latin-1")
+        content_id = add(
+            b"<< /Length %d >>\nstream\n" % len(stream) + stream + b"\nendstream"
+        )
+        page_ids.append(
+            add(
+                b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 595 842] "
+                b"/Resources << /Font << /F1 %d 0 R >> >> /Contents %d 0 R >>"
+                % (pages_id, font_id, content_id)
+            )
+        )
+
+    kids = b" ".join(b"%d 0 R" % pid for pid in page_ids)
+    objects[pages_id - 1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (
+        kids,
+        len(page_ids),
+    )
+    catalog_id = add(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    with open(path, "wb") as f:
+        f.write(b"%PDF-1.4\n")
+        offsets = []
+        for i, obj in enumerate(objects, 1):
+            offsets.append(f.tell())
+            f.write(b"%d 0 obj\n" % i + obj + b"\nendobj\n")
+        xref = f.tell()
+        f.write(b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1))
+        for off in offsets:
+            f.write(b"%010d 00000 n \n" % off)
+        f.write(
+            b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n"
+            % (len(objects) + 1, catalog_id, xref)
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="So sánh extract PDF tuần tự với extract song song theo trang"
+    )
+    parser.add_argument("--pages", type=int, default=300)
+    parser.add_argument("--workers", type=int, nargs="+", default=[2, 4, os.cpu_count() or 1])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        pdf_path = os.path.join(tmp, "synthetic.pdf")
+        write_synthetic_pdf(pdf_path, args.pages)
+
+        t0 = time.perf_counter()
+        serial_text = extract_text_from_pdf_advanced(pdf_path)
+        serial_time = time.perf_counter() - t0
+
+        print(f"📊 PDF giả lập {args.pages} trang")
+        print(f"  - Tuần tự: {serial_time:.2f}s")
+        for workers in sorted(set(args.workers)):
+            t0 = time.perf_counter()
+            pages = extract_pages_parallel(pdf_path, workers)
+            elapsed = time.perf_counter() - t0
+            text = "".join(p["text"] + "\n" for p in pages if p["text"])
+            print(
+                f"  - {workers} process: {elapsed:.2f}s "
+                f"(x{serial_time / elapsed:.1f}, giống tuần tự: {text == serial_text})"
+            )
+
+
+if __name__ == "__main__":
+    main()
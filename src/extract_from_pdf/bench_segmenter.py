@@ -0,0 +1,108 @@
+import json
+import os
+import re
+import sys
+import time
+from collections import OrderedDict
+
+from quy_che import QuyCheDaoTaoExtractor, iter_dieu_spans, split_khoan
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "quy_che_rag_data.json")
+
+# Pattern cũ (lazy-dot + lookahead) để so sánh
+LEGACY_DIEU_PATTERN = r"Điều\s+(\d+)\.\s+([^\n]+)\n(.*?)(?=Điều\s+\d+\.|CHƯƠNG\s+[IVX]+|$)"
+LEGACY_KHOAN_PATTERN = r"(\d+)\.\s*(.*?)(?=\s*\d+\.\s*|$)"
+CHUONG_START = {1: "I", 10: "II", 21: "III", 27: "IV", 36: "V", 46: "VI"}
+
+
+def rebuild_document(chunks) -> str:
+    """
+    Dựng lại văn bản (mục lục + các Điều, mỗi Khoản một dòng) từ
+    quy_che_rag_data.json vì file PDF gốc không đi kèm repo.
+    """
+    toc = ["MỤC LỤC\n"]
+    body = OrderedDict()
+    for chunk in chunks:
+        meta = chunk["metadata"]
+        if meta.get("type") == "table":
+            continue
+        if "khoan" not in meta and "...." in meta["title"]:
+            toc.append(f"Điều {meta['dieu']}. {meta['title']}\n")
+            continue
+        title, parts = body.setdefault(meta["dieu"], (meta["title"], []))
+        text = chunk["text"].rsplit("[Chương", 1)[0]
+        if "khoan" in meta:
+            parts.append(f"{meta['khoan']}. {text.split(chr(10), 2)[2].strip()}")
+        else:
+            parts.append(text.split("\n", 1)[1].strip())
+
+    doc = toc
+    for dieu, (title, parts) in body.items():
+        if dieu in CHUONG_START:
+            doc.append(f"CHƯƠNG {CHUONG_START[dieu]}\n")
+        doc.append(f"Điều {dieu}. {title}\n" + "\n".join(parts) + "\n")
+    return "".join(doc)
+
+
+def legacy_ids(text):
+    ids = []
+    for m in re.finditer(LEGACY_DIEU_PATTERN, text, re.DOTALL | re.IGNORECASE):
+        content = re.sub(r"\s+", " ", m.group(3).strip()).strip()
+        khoans = re.findall(LEGACY_KHOAN_PATTERN, content, re.MULTILINE | re.DOTALL)
+        if khoans:
+            ids.extend(f"d{int(m.group(1))}_k{k}" for k, _ in khoans)
+        else:
+            ids.append(f"d{int(m.group(1))}")
+    return ids
+
+
+def new_ids(text):
+    ids = []
+    for dieu, _, start, end in iter_dieu_spans(text):
+        khoans = split_khoan(text[start:end])
+        if khoans:
+            ids.extend(f"d{int(dieu)}_k{k}" for k, _ in khoans)
+        else:
+            ids.append(f"d{int(dieu)}")
+    return ids
+
+
+def timed(fn, text, repeat=3):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn(text)
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def main(scale: int = 10):
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        chunks = json.load(f)["chunks"]
+    shipped = [c["id"] for c in chunks if not c["id"].startswith("table_")]
+    text = rebuild_document(chunks)
+
+    ok = True
+    if legacy_ids(text) != shipped:
+        print("❌ Văn bản dựng lại không tái tạo được id cũ")
+        ok = False
+    # So khớp id / text với baseline (kể cả danh sách khác biệt đã biết): tests/test_segmenter.py
+    got = new_ids(text)
+    extractor = QuyCheDaoTaoExtractor(text)
+    if [c.id for c in extractor.chunk_by_dieu_khoan()] != got:
+        print("❌ chunk_by_dieu_khoan không dùng segmenter mới")
+        ok = False
+    dropped = len(shipped) - len(got)
+    print(f"{'✅' if ok else '❌'} {len(got)} chunk, {dropped} Khoản tách nhầm đã được gộp lại")
+
+    big = text * scale
+    legacy_time, _ = timed(legacy_ids, big)
+    new_time, _ = timed(new_ids, big)
+    print(f"📊 Văn bản x{scale} ({len(big):,} ký tự)")
+    print(f"  - Regex lazy + lookahead: {legacy_time * 1e3:.1f} ms")
+    print(f"  - Segmenter một lượt:     {new_time * 1e3:.1f} ms (x{legacy_time / new_time:.1f})")
+    return ok
+
+
+if __name__ == "__main__":
+    sys.exit(0 if main() else 1)
@@ -0,0 +1,101 @@
+import json
+import os
+import time
+
+from tagger import Tagger
+
+DATA_PATH = os.path.join(os.path.dirname(__file__), "quy_che_rag_data.json")
+
+
+# ---------- Cài đặt cũ (từng hàm lowercase + quét substring riêng) ----------
+
+
+def legacy_extract_keywords(text):
+    keywords_dict = {
+        "tín chỉ": ["tín chỉ", "tc", "credit"],
+        "điểm": ["điểm", "gpa", "cpa", "grade"],
+        "tốt nghiệp": ["tốt nghiệp", "graduation", "bằng"],
+        "học phí": ["học phí", "tuition", "phí"],
+        "đăng ký": ["đăng ký", "registration"],
+        "thi": ["thi", "exam", "kiểm tra"],
+        "luận văn": ["luận văn", "thesis"],
+        "luận án": ["luận án", "dissertation"],
+        "đồ án": ["đồ án", "project"],
+        "thạc sĩ": ["thạc sĩ", "master"],
+        "tiến sĩ": ["tiến sĩ", "phd", "ncs"],
+        "sinh viên": ["sinh viên", "student"],
+        "học viên": ["học viên"],
+        "cảnh báo": ["cảnh báo", "warning"],
+        "thôi học": ["thôi học", "buộc thôi học"],
+    }
+    text_lower = text.lower()
+    return [
+        category
+        for category, variants in keywords_dict.items()
+        if any(variant in text_lower for variant in variants)
+    ]
+
+
+def legacy_extract_applies_to(text):
+    applies = []
+    text_lower = text.lower()
+    if any(term in text_lower for term in ["sinh viên", "đại học", "cử nhân"]):
+        applies.append("sinh viên đại học")
+    if any(term in text_lower for term in ["học viên", "thạc sĩ"]):
+        applies.append("học viên thạc sĩ")
+    if any(term in text_lower for term in ["kỹ sư"]):
+        applies.append("học viên kỹ sư")
+    if any(term in text_lower for term in ["ncs", "nghiên cứu sinh", "tiến sĩ"]):
+        applies.append("nghiên cứu sinh")
+    if not applies:
+        applies.append("tất cả")
+    return applies
+
+
+def legacy_extract_tables(text):
+    if "điểm học phần theo" in text.lower() and "điểm chữ" in text.lower():
+        return "BẢNG QUY ĐỔI ĐIỂM"
+    if "xếp loại" in text.lower() and ("gpa" in text.lower() or "cpa" in text.lower()):
+        return "BẢNG XẾP LOẠI HỌC LỰC"
+    if "thời gian" in text.lower() and "khối lượng" in text.lower():
+        return "BẢNG THỜI GIAN VÀ KHỐI LƯỢNG HỌC TẬP"
+    return None
+
+
+def legacy_tag(text):
+    return {
+        "keywords": legacy_extract_keywords(text),
+        "applies_to": legacy_extract_applies_to(text),
+        "has_table": legacy_extract_tables(text),
+    }
+
+
+def bench(fn, texts, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        for text in texts:
+            fn(text)
+    return (time.perf_counter() - start) / (repeat * len(texts)) * 1e6
+
+
+def main(repeat: int = 50):
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        texts = [c["text"] for c in json.load(f)["chunks"]]
+
+    start = time.perf_counter()
+    tagger = Tagger.from_file()
+    build_ms = (time.perf_counter() - start) * 1e3
+
+    mismatches = sum(legacy_tag(t) != tagger.tag(t) for t in texts)
+    legacy_us = bench(legacy_tag, texts, repeat)
+    tagger_us = bench(tagger.tag, texts, repeat)
+
+    print(f"📊 {len(texts)} chunks x {repeat} lần")
+    print(f"  - Build tagger: {build_ms:.2f} ms (một lần khi khởi tạo extractor)")
+    print(f"  - Cũ (3 hàm):   {legacy_us:.1f} µs/chunk")
+    print(f"  - Tagger:       {tagger_us:.1f} µs/chunk (x{legacy_us / tagger_us:.1f})")
+    print(f"  - Kết quả khác nhau: {mismatches}")
+
+
+if __name__ == "__main__":
+    main()
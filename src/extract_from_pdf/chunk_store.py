@@ -0,0 +1,256 @@
+import json
+import mmap
+import struct
+from array import array
+from typing import Dict, Iterable, List, Optional
+
+from quy_che import Chunk
+
+MAGIC = b"QCCS"
+STORE_VERSION = 1
+ALIGN = 8
+# MAGIC | version (u16) | độ dài header JSON (u32)
+PREAMBLE = struct.Struct("<4sHI")
+
+# Code 0 trong mỗi cột = chunk không có key này trong metadata
+ABSENT = 0
+
+
+def _pad(n: int) -> int:
+    return (-n) % ALIGN
+
+
+class ChunkStore:
+    """
+    Kho chunks dạng nhị phân, mở bằng mmap, truy cập ngẫu nhiên theo id:
+      - toàn bộ text nằm trong một blob UTF-8 + mảng offsets
+      - mỗi key metadata là một cột dictionary-encoded (mỗi giá trị khác nhau
+        chỉ lưu một lần); cột dạng list (keywords, applies_to...) lưu kiểu CSR
+    Layout file: preamble | header JSON | các section (căn lề 8 byte).
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._mm = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, header_len = PREAMBLE.unpack_from(self._mm, 0)
+        if magic != MAGIC or version != STORE_VERSION:
+            raise ValueError(f"Không phải chunk store hợp lệ: {path}")
+        self.header = json.loads(self._mm[PREAMBLE.size : PREAMBLE.size + header_len])
+        self._view = memoryview(self._mm)
+
+        self.document = self.header["document"]
+        self.ids: List[str] = self.header["ids"]
+        self._rows_by_id: Dict[str, List[int]] = {}
+        for row, cid in enumerate(self.ids):
+            self._rows_by_id.setdefault(cid, []).append(row)
+
+        self._text_offsets = self._section("text_offsets")
+        self._key_orders = self.header["key_orders"]
+        self._key_order_codes = self._section("key_order_codes")
+        self.columns = self.header["columns"]
+        self._postings: Dict[str, Dict[int, List[int]]] = {}
+
+    def _section(self, name: str):
+        offset, length, typecode = self.header["sections"][name]
+        view = self._view[offset : offset + length]
+        return view.cast(typecode) if typecode != "B" else view
+
+    def close(self):
+        self._text_offsets = self._key_order_codes = None
+        self._view.release()
+        self._mm.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __len__(self):
+        return len(self.ids)
+
+    # ---------- đọc ----------
+
+    def text(self, row: int) -> str:
+        start, end = self._text_offsets[row], self._text_offsets[row + 1]
+        return bytes(self._section("texts")[start:end]).decode("utf-8")
+
+    def _column_value(self, key: str, row: int):
+        column = self.columns[key]
+        code = self._section(f"{key}.codes")[row]
+        if column["kind"] == "scalar":
+            return column["values"][code - 1]
+        offsets = self._section(f"{key}.offsets")
+        items = self._section(f"{key}.items")
+        return [column["values"][c] for c in items[offsets[row] : offsets[row + 1]]]
+
+    def row(self, row: int) -> Chunk:
+        keys = self._key_orders[self._key_order_codes[row]]
+        metadata = {key: self._column_value(key, row) for key in keys}
+        return Chunk(self.ids[row], self.text(row), metadata)
+
+    def get(self, chunk_id: str) -> Optional[Chunk]:
+        """Chunk đầu tiên có id này (None nếu không có)"""
+        rows = self._rows_by_id.get(chunk_id)
+        return self.row(rows[0]) if rows else None
+
+    def get_all(self, chunk_id: str) -> List[Chunk]:
+        """Mọi chunk có id này (văn bản cũ có thể sinh id trùng)"""
+        return [self.row(r) for r in self._rows_by_id.get(chunk_id, [])]
+
+    def __iter__(self):
+        return (self.row(r) for r in range(len(self)))
+
+    def _rows_with(self, key: str, value) -> List[int]:
+        """Các dòng có metadata[key] == value (cột list: value nằm trong list)"""
+        column = self.columns.get(key)
+        if column is None:
+            return []
+        if key not in self._postings:
+            postings: Dict[int, List[int]] = {}
+            codes = self._section(f"{key}.codes")
+            if column["kind"] == "scalar":
+                for row, code in enumerate(codes):
+                    if code != ABSENT:
+                        postings.setdefault(code - 1, []).append(row)
+            else:
+                offsets = self._section(f"{key}.offsets")
+                items = self._section(f"{key}.items")
+                for row in range(len(self)):
+                    for c in set(items[offsets[row] : offsets[row + 1]]):
+                        postings.setdefault(c, []).append(row)
+            self._postings[key] = postings
+        try:
+            code = column["values"].index(value)
+        except ValueError:
+            return []
+        return self._postings[key].get(code, [])
+
+    def filter(self, **conditions) -> List[Chunk]:
+        """
+        Lọc chunks theo metadata, ví dụ filter(dieu=12, applies_to="sinh viên đại học");
+        không có điều kiện thì trả về mọi chunk
+        """
+        if not conditions:
+            return list(self)
+        rows = None
+        for key, value in conditions.items():
+            matched = set(self._rows_with(key, value))
+            rows = matched if rows is None else rows & matched
+        return [self.row(r) for r in sorted(rows or [])]
+
+    # ---------- ghi / JSON ----------
+
+    @staticmethod
+    def write(chunks: Iterable[Chunk], path: str, document: Optional[Dict] = None):
+        """Ghi list Chunk ra file store"""
+        chunks = list(chunks)
+        texts = bytearray()
+        text_offsets = array("Q", [0])
+        key_orders: List[List[str]] = []
+        key_order_index: Dict[tuple, int] = {}
+        key_order_codes = array("I")
+        for chunk in chunks:
+            texts += chunk.text.encode("utf-8")
+            text_offsets.append(len(texts))
+            order = tuple(chunk.metadata.keys())
+            if order not in key_order_index:
+                key_order_index[order] = len(key_orders)
+                key_orders.append(list(order))
+            key_order_codes.append(key_order_index[order])
+
+        all_keys = []
+        for order in key_orders:
+            all_keys.extend(k for k in order if k not in all_keys)
+
+        columns = {}
+        sections = {
+            "texts": (bytes(texts), "B"),
+            "text_offsets": (text_offsets, "Q"),
+            "key_order_codes": (key_order_codes, "I"),
+        }
+        for key in all_keys:
+            values = [c.metadata.get(key) for c in chunks]
+            present = [key in c.metadata for c in chunks]
+            is_list = all(isinstance(v, list) for v, p in zip(values, present) if p)
+            dictionary: List = []
+            lookup: Dict[str, int] = {}
+
+            def encode(value):
+                token = json.dumps(value, ensure_ascii=False, sort_keys=True)
+                if token not in lookup:
+                    lookup[token] = len(dictionary)
+                    dictionary.append(value)
+                return lookup[token]
+
+            codes = array("I")
+            if is_list:
+                offsets = array("I", [0])
+                items = array("I")
+                for value, p in zip(values, present):
+                    codes.append(1 if p else ABSENT)
+                    items.extend(encode(v) for v in (value if p else []))
+                    offsets.append(len(items))
+                sections[f"{key}.offsets"] = (offsets, "I")
+                sections[f"{key}.items"] = (items, "I")
+            else:
+                for value, p in zip(values, present):
+                    codes.append(encode(value) + 1 if p else ABSENT)
+            sections[f"{key}.codes"] = (codes, "I")
+            columns[key] = {"kind": "list" if is_list else "scalar", "values": dictionary}
+
+        header = {
+            "document": document or {},
+            "ids": [c.id for c in chunks],
+            "key_orders": key_orders,
+            "columns": columns,
+            "sections": {},
+        }
+
+        # Tính offset các section: cần độ dài header trước, header lại chứa
+        # offset -> lặp tới khi header vừa chỗ (phần dư đệm bằng dấu cách)
+        header_len = 0
+        while True:
+            offset = PREAMBLE.size + header_len
+            offset += _pad(offset)
+            for name, (data, typecode) in sections.items():
+                size = len(data) * (1 if typecode == "B" else data.itemsize)
+                header["sections"][name] = [offset, size, typecode]
+                offset += size + _pad(size)
+            raw_header = json.dumps(header, ensure_ascii=False).encode("utf-8")
+            if len(raw_header) <= header_len:
+                raw_header = raw_header.ljust(header_len)
+                break
+            header_len = len(raw_header)
+
+        with open(path, "wb") as f:
+            f.write(PREAMBLE.pack(MAGIC, STORE_VERSION, header_len))
+            f.write(raw_header)
+            f.write(b"\0" * _pad(f.tell()))
+            for name, (data, typecode) in sections.items():
+                raw = bytes(data) if typecode == "B" else data.tobytes()
+                f.write(raw)
+                f.write(b"\0" * _pad(len(raw)))
+
+    @classmethod
+    def from_json(cls, json_path: str, path: str) -> "ChunkStore":
+        """Import file JSON dạng save_to_json sang store"""
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        cls.write(
+            (Chunk(c["id"], c["text"], c["metadata"]) for c in data["chunks"]),
+            path,
+            data.get("metadata"),
+        )
+        return cls(path)
+
+    def to_json(self, json_path: str):
+        """Export ngược lại đúng định dạng save_to_json"""
+        data = {
+            "metadata": self.document,
+            "chunks": [chunk.to_dict() for chunk in self],
+        }
+        with open(json_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, ensure_ascii=False, indent=2)
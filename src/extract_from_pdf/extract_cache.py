@@ -0,0 +1,212 @@
+import hashlib
+import json
+import os
+from typing import Dict, Iterable, List, Optional
+
+from quy_che import (
+    SPECIAL_TABLE_MARKERS,
+    Chunk,
+    QuyCheDaoTaoExtractor,
+    iter_dieu_segments,
+)
+import instrument  # quy_che đã thêm src/ vào sys.path
+
+# Tăng khi thay đổi logic chunk/metadata để bỏ cache cũ
+CACHE_VERSION = 2
+
+PAGE_CACHE_FILE = "pages.json"
+DIEU_CACHE_FILE = "dieu.json"
+
+
+def _sha1(*parts) -> str:
+    h = hashlib.sha1()
+    for part in parts:
+        h.update(part if isinstance(part, bytes) else str(part).encode("utf-8"))
+        h.update(b"\0")
+    return h.hexdigest()
+
+
+def page_content_hash(page) -> str:
+    """
+    Hash nội dung một trang pdfplumber (content stream + kích thước trang),
+    không cần extract text. Trang giống hệt ở văn bản sửa đổi cho cùng hash.
+    """
+    from pdfminer.pdftypes import resolve1
+
+    contents = resolve1(page.page_obj.contents) or []
+    if not isinstance(contents, list):
+        contents = [contents]
+    data = b"".join(resolve1(stream).get_data() for stream in contents)
+    return _sha1(data, page.width, page.height)
+
+
+def dieu_hash(dieu_num: str, dieu_title: str, content: str, vocab_key: str = "", budget=None) -> str:
+    # vocab_key: hash vocabulary của tagger (keywords / applies_to / bảng nằm trong chunk cache)
+    if budget is not None:
+        # Chunk theo ngân sách kích thước: tham số là một phần của khóa
+        return _sha1(CACHE_VERSION, dieu_num, dieu_title, content, vocab_key, budget.key())
+    return _sha1(CACHE_VERSION, dieu_num, dieu_title, content, vocab_key)
+
+
+def chunk_fingerprint(chunk: Dict) -> str:
+    metadata = dict(chunk["metadata"])
+    # references là list(set(...)) nên thứ tự không ổn định
+    if metadata.get("references"):
+        metadata["references"] = sorted(metadata["references"])
+    return _sha1(chunk["text"], json.dumps(metadata, ensure_ascii=False, sort_keys=True))
+
+
+def diff_chunks(old_chunks: Iterable[Dict], new_chunks: Iterable[Dict]) -> Dict:
+    """So sánh hai tập chunks theo id: added / removed / modified"""
+
+    def by_id(chunks):
+        groups = {}
+        for chunk in chunks:
+            groups.setdefault(chunk["id"], []).append(chunk_fingerprint(chunk))
+        # Gộp các chunk trùng id (văn bản có Khoản đánh số lặp)
+        return {cid: _sha1(*fps) for cid, fps in groups.items()}
+
+    old, new = by_id(old_chunks), by_id(new_chunks)
+    return {
+        "added": sorted(set(new) - set(old)),
+        "removed": sorted(set(old) - set(new)),
+        "modified": sorted(cid for cid in set(old) & set(new) if old[cid] != new[cid]),
+    }
+
+
+class ExtractCache:
+    """
+    Cache theo nội dung cho pipeline quy_che.py:
+      - pages.json: hash trang -> text đã extract
+      - dieu.json:  hash Điều -> chunks (dict) đã sinh
+    Chỉ những trang / Điều có hash mới mới phải xử lý lại.
+    """
+
+    def __init__(self, cache_dir: str = ".extract_cache"):
+        self.cache_dir = cache_dir
+        self.pages = self._load(PAGE_CACHE_FILE)
+        self.dieu = self._load(DIEU_CACHE_FILE)
+        self.stats = {"page_hits": 0, "page_misses": 0, "dieu_hits": 0, "dieu_misses": 0}
+        self._used_pages = set()
+        self._used_dieu = set()
+
+    def _load(self, name: str) -> Dict:
+        path = os.path.join(self.cache_dir, name)
+        if not os.path.exists(path):
+            return {}
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != CACHE_VERSION:
+            return {}
+        return data["entries"]
+
+    def _dump(self, name: str, entries: Dict):
+        path = os.path.join(self.cache_dir, name)
+        tmp = path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": CACHE_VERSION, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, path)
+
+    def save(self, prune: bool = True):
+        """Ghi cache; prune=True bỏ các entry không dùng ở lần chạy này"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if prune:
+            self.pages = {h: t for h, t in self.pages.items() if h in self._used_pages}
+            self.dieu = {h: c for h, c in self.dieu.items() if h in self._used_dieu}
+        self._dump(PAGE_CACHE_FILE, self.pages)
+        self._dump(DIEU_CACHE_FILE, self.dieu)
+
+    def iter_pages(self, pdf_path: str):
+        """Như iter_pdf_pages nhưng chỉ extract text cho trang chưa có trong cache"""
+        import pdfplumber
+
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages:
+                key = page_content_hash(page)
+                self._used_pages.add(key)
+                if key in self.pages:
+                    self.stats["page_hits"] += 1
+                else:
+                    self.stats["page_misses"] += 1
+                    self.pages[key] = page.extract_text() or ""
+                page.close()
+                if self.pages[key]:
+                    yield self.pages[key] + "\n"
+
+    def iter_chunks(
+        self,
+        extractor: QuyCheDaoTaoExtractor,
+        pages: Iterable[str],
+        pdf_path: Optional[str] = None,
+    ) -> Iterable[Chunk]:
+        """Như extractor.iter_chunks nhưng dùng lại chunks của các Điều không đổi"""
+        found_markers = set()
+
+        def track_markers(pages):
+            for page in pages:
+                found_markers.update(m for m in SPECIAL_TABLE_MARKERS if m in page)
+                yield page
+
+        for dieu_num, dieu_title, content in iter_dieu_segments(track_markers(pages)):
+            key = dieu_hash(dieu_num, dieu_title, content, extractor.tagger.vocab_key, extractor.budget)
+            self._used_dieu.add(key)
+            if key in self.dieu:
+                self.stats["dieu_hits"] += 1
+                yield from (Chunk(**c) for c in self.dieu[key])
+            else:
+                self.stats["dieu_misses"] += 1
+                chunks = extractor.chunk_dieu(dieu_num, dieu_title, content)
+                self.dieu[key] = [c.to_dict() for c in chunks]
+                yield from chunks
+
+        if pdf_path:
+            # Bảng có cache theo trang riêng (table_extract.TableCache)
+            yield from extractor.extract_pdf_tables(pdf_path, self.cache_dir)
+        else:
+            yield from extractor.extract_special_tables(found_markers)
+
+
+def incremental_extract(
+    pdf_path: str,
+    output_path: str = "quy_che_rag_data.json",
+    diff_path: Optional[str] = "quy_che_rag_diff.json",
+    cache_dir: str = ".extract_cache",
+    budget=None,
+) -> Dict:
+    """
+    Re-extract PDF, chỉ xử lý trang / Điều thay đổi, ghi output JSON như
+    save_to_json (kèm store nhị phân .qcs và graph tham chiếu) và diff (added/removed/modified chunk ids) so với output cũ.
+    """
+    old_chunks: List[Dict] = []
+    if os.path.exists(output_path):
+        with open(output_path, "r", encoding="utf-8") as f:
+            old_chunks = json.load(f).get("chunks", [])
+
+    cache = ExtractCache(cache_dir)
+    extractor = QuyCheDaoTaoExtractor(budget=budget)
+    with instrument.stage("extract"):
+        extractor.chunks = list(
+            cache.iter_chunks(extractor, cache.iter_pages(pdf_path), pdf_path)
+        )
+        for key, n in cache.stats.items():
+            instrument.count(key, n)
+    cache.save()
+
+    with instrument.stage("save"):
+        extractor.save_to_json(output_path)
+        extractor.save_to_store(os.path.splitext(output_path)[0] + ".qcs")
+        extractor.save_reference_graph(os.path.splitext(output_path)[0] + "_refs.json")
+    diff = diff_chunks(old_chunks, [c.to_dict() for c in extractor.chunks])
+    if diff_path:
+        with open(diff_path, "w", encoding="utf-8") as f:
+            json.dump(diff, f, ensure_ascii=False, indent=2)
+
+    print(
+        f"♻️  Trang: {cache.stats['page_hits']} dùng lại, {cache.stats['page_misses']} extract mới | "
+        f"Điều: {cache.stats['dieu_hits']} dùng lại, {cache.stats['dieu_misses']} chunk lại"
+    )
+    print(
+        f"🔀 Diff: +{len(diff['added'])} / -{len(diff['removed'])} / "
+        f"~{len(diff['modified'])} chunks"
+    )
+    return {"cache": cache.stats, "diff": diff}
@@ -1,9 +1,42 @@
 import re
 import json
-from typing import List, Dict, Optional
+import math
+import os
+import sys
+import time
+from bisect import bisect_left
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Iterable, Iterator, Optional, Tuple
 from dataclasses import dataclass, asdict
 from datetime import datetime
 
+from tagger import DEFAULT_VOCAB_PATH, Tagger
+
+# instrument.py nằm ở src/ (dùng chung cho mọi pipeline)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import instrument
+
+# Heading Điều và ranh giới kết thúc một Điều (Điều/Chương kế tiếp).
+# Tương đương pattern cũ
+#   Điều\s+(\d+)\.\s+([^\n]+)\n(.*?)(?=Điều\s+\d+\.|CHƯƠNG\s+[IVX]+|$)
+# nhưng các vị trí ranh giới chỉ được tìm một lần rồi cắt theo index,
+# không quét lại văn bản bằng lazy-dot + lookahead.
+DIEU_HEADING_RE = re.compile(r"Điều\s+(\d+)\.\s+([^\n]+)\n", re.IGNORECASE)
+DIEU_BOUNDARY_RE = re.compile(r"Điều\s+\d+\.|CHƯƠNG\s+[IVX]+", re.IGNORECASE)
+# Khoản / Điểm chỉ được nhận ở đầu dòng ("3.5" hay "09/06/2023." giữa câu
+# không còn bị coi là Khoản)
+KHOAN_HEADING_RE = re.compile(r"^[ \t]*(\d{1,3})\.\s", re.MULTILINE)
+DIEM_HEADING_RE = re.compile(r"^[ \t]*([a-zđ])\)\s", re.MULTILINE)
+
+# Chuỗi đánh dấu sự xuất hiện của các bảng đặc biệt trong văn bản
+SPECIAL_TABLE_MARKERS = (
+    "Điểm học phần theo",
+    "Xếp loại",
+    "GPA hoặc CPA",
+    "Số TCTL",
+    "Trình độ",
+)
+
 
 @dataclass
 class Chunk:
@@ -17,12 +50,142 @@ class Chunk:
         return asdict(self)
 
 
+def collapse_whitespace(text: str) -> str:
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def length_distribution(lengths: List[int]) -> Dict:
+    """Phân bố độ dài: min / trung bình / p50 / p90 / max và histogram bin gấp đôi (<100, 100-199, 200-399, ...)"""
+    if not lengths:
+        return {"count": 0}
+    values = sorted(lengths)
+
+    def percentile(q):
+        return values[min(len(values) - 1, int(q * len(values)))]
+
+    histogram = {}
+    for v in values:
+        low = 0 if v < 100 else 100 * 2 ** int(math.log2(v / 100))
+        label = "<100" if low == 0 else f"{low}-{2 * low - 1}"
+        histogram[label] = histogram.get(label, 0) + 1
+    return {
+        "count": len(values),
+        "min": values[0],
+        "mean": round(sum(values) / len(values), 1),
+        "p50": percentile(0.5),
+        "p90": percentile(0.9),
+        "max": values[-1],
+        "histogram": histogram,
+    }
+
+
+def iter_dieu_spans(text: str) -> Iterator[Tuple[str, str, int, int]]:
+    """
+    Tách các Điều trong một lần quét: trả về (số Điều, tiêu đề, start, end)
+    với text[start:end] là nội dung Điều.
+    """
+    starts = [m.start() for m in DIEU_BOUNDARY_RE.finditer(text)]
+    pos = 0
+    i = 0
+    while i < len(starts):
+        if starts[i] < pos:
+            i += 1
+            continue
+        heading = DIEU_HEADING_RE.match(text, starts[i])
+        if not heading:
+            i += 1
+            continue
+        # Ranh giới đầu tiên sau dòng tiêu đề
+        i = bisect_left(starts, heading.end(), i)
+        end = starts[i] if i < len(starts) else len(text)
+        yield heading.group(1), heading.group(2), heading.end(), end
+        pos = end
+
+
+def split_numbered(content: str, pattern, first: str, next_label) -> List[Tuple[str, str]]:
+    """
+    Cắt content theo các heading đầu dòng (Khoản "1.", Điểm "a)") theo đúng
+    thứ tự đánh số; heading sai thứ tự được coi là một phần nội dung.
+    Phần trước heading đầu tiên bị bỏ qua (giống cách chunk cũ).
+    """
+    cuts = []
+    expected = first
+    for m in pattern.finditer(content):
+        if m.group(1) == expected:
+            cuts.append((m.group(1), m.start(), m.end()))
+            expected = next_label(expected)
+    return [
+        (label, content[body_start : cuts[j + 1][1] if j + 1 < len(cuts) else len(content)])
+        for j, (label, _, body_start) in enumerate(cuts)
+    ]
+
+
+DIEM_LABELS = "abcdđefghiklmnopqrstuvxy"
+
+
+def split_khoan(content: str) -> List[Tuple[str, str]]:
+    return split_numbered(content, KHOAN_HEADING_RE, "1", lambda n: str(int(n) + 1))
+
+
+def split_diem(content: str) -> List[Tuple[str, str]]:
+    def next_label(c):
+        i = DIEM_LABELS.find(c) + 1
+        return DIEM_LABELS[i] if 0 < i < len(DIEM_LABELS) else ""
+
+    return split_numbered(content, DIEM_HEADING_RE, "a", next_label)
+
+
+def iter_dieu_segments(
+    pages: Iterable[str], tail_keep: int = 64
+) -> Iterator[Tuple[str, str, str]]:
+    """
+    Tách (số Điều, tiêu đề, nội dung) từ luồng text từng trang, cho kết quả
+    giống iter_dieu_spans trên toàn văn bản nhưng chỉ giữ trong bộ nhớ
+    Điều đang mở.
+    """
+    buffer = ""
+    resume = 0  # vị trí bắt đầu tìm ranh giới (phần trước đã quét rồi)
+    for page in pages:
+        buffer += page
+        while True:
+            heading = DIEU_HEADING_RE.search(buffer)
+            if not heading:
+                # Giữ lại phần đuôi phòng heading bị cắt giữa hai trang
+                buffer = buffer[-tail_keep:]
+                resume = 0
+                break
+            boundary = DIEU_BOUNDARY_RE.search(
+                buffer, max(heading.end(), resume)
+            )
+            if not boundary:
+                # Điều chưa đóng, đợi trang tiếp theo
+                buffer = buffer[heading.start() :]
+                resume = max(len(buffer) - tail_keep, 0)
+                break
+            yield heading.group(1), heading.group(2), buffer[
+                heading.end() : boundary.start()
+            ]
+            buffer = buffer[boundary.start() :]
+            resume = 0
+
+    # Điều cuối cùng kéo dài tới hết văn bản
+    heading = DIEU_HEADING_RE.search(buffer)
+    if heading:
+        yield heading.group(1), heading.group(2), buffer[heading.end() :]
+
+
 class QuyCheDaoTaoExtractor:
     """Extract và chunk dữ liệu từ Quy chế đào tạo ĐHBK"""
 
-    def __init__(self, text: str):
+    def __init__(
+        self, text: str = "", vocab_path: str = DEFAULT_VOCAB_PATH, budget=None
+    ):
         self.text = text
         self.chunks = []
+        # Tagger keywords / applies_to / bảng, vocabulary nạp từ file JSON
+        self.tagger = Tagger.from_file(vocab_path)
+        # rechunk.ChunkBudget: chunk theo ngân sách kích thước thay vì Khoản / Điểm cố định
+        self.budget = budget
 
     def extract_chuong_mapping(self) -> Dict[int, str]:
         """Mapping từ số Điều sang Chương"""
@@ -45,71 +208,15 @@ class QuyCheDaoTaoExtractor:
 
     def extract_keywords(self, text: str) -> List[str]:
         """Trích xuất keywords từ text"""
-        keywords_dict = {
-            "tín chỉ": ["tín chỉ", "tc", "credit"],
-            "điểm": ["điểm", "gpa", "cpa", "grade"],
-            "tốt nghiệp": ["tốt nghiệp", "graduation", "bằng"],
-            "học phí": ["học phí", "tuition", "phí"],
-            "đăng ký": ["đăng ký", "registration"],
-            "thi": ["thi", "exam", "kiểm tra"],
-            "luận văn": ["luận văn", "thesis"],
-            "luận án": ["luận án", "dissertation"],
-            "đồ án": ["đồ án", "project"],
-            "thạc sĩ": ["thạc sĩ", "master"],
-            "tiến sĩ": ["tiến sĩ", "phd", "ncs"],
-            "sinh viên": ["sinh viên", "student"],
-            "học viên": ["học viên"],
-            "cảnh báo": ["cảnh báo", "warning"],
-            "thôi học": ["thôi học", "buộc thôi học"],
-        }
-
-        found_keywords = []
-        text_lower = text.lower()
-        for category, variants in keywords_dict.items():
-            if any(variant in text_lower for variant in variants):
-                found_keywords.append(category)
-
-        return found_keywords
+        return self.tagger.match_keywords(self.tagger.find_terms(text))
 
     def extract_applies_to(self, text: str) -> List[str]:
         """Xác định đối tượng áp dụng"""
-        applies = []
-        text_lower = text.lower()
-
-        if any(
-            term in text_lower for term in ["sinh viên", "đại học", "cử nhân"]
-        ):
-            applies.append("sinh viên đại học")
-        if any(term in text_lower for term in ["học viên", "thạc sĩ"]):
-            applies.append("học viên thạc sĩ")
-        if any(term in text_lower for term in ["kỹ sư"]):
-            applies.append("học viên kỹ sư")
-        if any(
-            term in text_lower for term in ["ncs", "nghiên cứu sinh", "tiến sĩ"]
-        ):
-            applies.append("nghiên cứu sinh")
-        if not applies:
-            applies.append("tất cả")
-
-        return applies
+        return self.tagger.match_applies_to(self.tagger.find_terms(text))
 
     def extract_tables(self, text: str) -> Optional[str]:
-        """Trích xuất và format bảng biểu"""
-        # Pattern cho bảng điểm
-        if "điểm học phần theo" in text.lower() and "điểm chữ" in text.lower():
-            return "BẢNG QUY ĐỔI ĐIỂM"
-
-        # Pattern cho bảng xếp loại
-        if "xếp loại" in text.lower() and (
-            "gpa" in text.lower() or "cpa" in text.lower()
-        ):
-            return "BẢNG XẾP LOẠI HỌC LỰC"
-
-        # Pattern cho bảng thời gian
-        if "thời gian" in text.lower() and "khối lượng" in text.lower():
-            return "BẢNG THỜI GIAN VÀ KHỐI LƯỢNG HỌC TẬP"
-
-        return None
+        """Nhận diện bảng biểu"""
+        return self.tagger.match_table(self.tagger.find_terms(text))
 
     def extract_cross_references(self, text: str) -> List[str]:
         """Trích xuất các tham chiếu chéo"""
@@ -140,114 +247,165 @@ class QuyCheDaoTaoExtractor:
         """Chunk chính theo Điều và Khoản"""
         chunks = []
 
-        # Pattern để tách theo Điều
-        dieu_pattern = r"Điều\s+(\d+)\.\s+([^\n]+)\n(.*?)(?=Điều\s+\d+\.|CHƯƠNG\s+[IVX]+|$)"
-
-        for match in re.finditer(
-            dieu_pattern, self.text, re.DOTALL | re.IGNORECASE
-        ):
-            dieu_num = int(match.group(1))
-            dieu_title = match.group(2).strip()
-            content = match.group(3).strip()
-            content = re.sub(r"\s+", " ", content).strip()
-            # Lấy chương
-            chuong = self.get_chuong(dieu_num)
-
-            # Tách theo khoản
-            khoan_pattern = r"(\d+)\.\s*(.*?)(?=\s*\d+\.\s*|$)"
-            khoans = re.findall(
-                khoan_pattern, content, re.MULTILINE | re.DOTALL
+        for dieu_num, dieu_title, start, end in iter_dieu_spans(self.text):
+            chunks.extend(
+                self.chunk_dieu(dieu_num, dieu_title, self.text[start:end])
             )
 
-            if khoans:
-                # Có khoản - tạo chunk cho từng khoản
-                for khoan_num, khoan_content in khoans:
-                    khoan_text = khoan_content.strip()
-
-                    # Tách theo điểm (a, b, c...)
-                    diem_pattern = r"^([a-z]|đ)\)\s+(.*?)(?=\n[a-z]\)|$)"
-                    diems = re.findall(
-                        diem_pattern, khoan_text, re.MULTILINE | re.DOTALL
-                    )
-
-                    if diems and len(khoan_text) > 5000:
-                        # Nếu khoản quá dài và có nhiều điểm, tách theo điểm
-                        for diem_char, diem_content in diems:
-                            chunk_id = f"d{dieu_num}_k{khoan_num}_p{diem_char}"
-                            full_text = f"""Điều {dieu_num}: {dieu_title}
-                                            Khoản {khoan_num}, Điểm {diem_char}:
-                                            {diem_content.strip()}
+        return chunks
 
-                                            [Chương: {chuong}]"""
+    def chunk_dieu(
+        self, dieu_num: str, dieu_title: str, content: str
+    ) -> List[Chunk]:
+        """Chunk một Điều (đã tách) theo Khoản / Điểm"""
+        if self.budget is not None:
+            return self.chunk_dieu_sized(dieu_num, dieu_title, content)
 
-                            metadata = {
-                                "dieu": dieu_num,
-                                "khoan": int(khoan_num),
-                                "diem": diem_char,
-                                "chuong": chuong,
-                                "title": dieu_title,
-                                "keywords": self.extract_keywords(full_text),
-                                "applies_to": self.extract_applies_to(
-                                    full_text
-                                ),
-                                "has_table": self.extract_tables(full_text),
-                                "references": self.extract_cross_references(
-                                    full_text
-                                ),
-                            }
-
-                            chunks.append(Chunk(chunk_id, full_text, metadata))
-                    else:
-                        # Chunk theo khoản
-                        chunk_id = f"d{dieu_num}_k{khoan_num}"
+        chunks = []
+
+        dieu_num = int(dieu_num)
+        dieu_title = dieu_title.strip()
+        # Tách theo khoản (trên text gốc, còn xuống dòng)
+        khoans = split_khoan(content)
+        content = collapse_whitespace(content)
+        # Lấy chương
+        chuong = self.get_chuong(dieu_num)
+
+        if khoans:
+            # Có khoản - tạo chunk cho từng khoản
+            for khoan_num, khoan_raw in khoans:
+                khoan_text = collapse_whitespace(khoan_raw)
+
+                # Tách theo điểm (a, b, c...)
+                diems = [
+                    (diem_char, collapse_whitespace(diem_raw))
+                    for diem_char, diem_raw in split_diem(khoan_raw)
+                ]
+
+                if diems and len(khoan_text) > 5000:
+                    # Nếu khoản quá dài và có nhiều điểm, tách theo điểm
+                    for diem_char, diem_content in diems:
+                        chunk_id = f"d{dieu_num}_k{khoan_num}_p{diem_char}"
                         full_text = f"""Điều {dieu_num}: {dieu_title}
-                                        Khoản {khoan_num}:
-                                        {khoan_text}
+                                            Khoản {khoan_num}, Điểm {diem_char}:
+                                            {diem_content.strip()}
 
-                                        [Chương: {chuong}]"""
+                                            [Chương: {chuong}]"""
 
                         metadata = {
                             "dieu": dieu_num,
                             "khoan": int(khoan_num),
+                            "diem": diem_char,
                             "chuong": chuong,
                             "title": dieu_title,
-                            "keywords": self.extract_keywords(full_text),
-                            "applies_to": self.extract_applies_to(full_text),
-                            "has_table": self.extract_tables(full_text),
+                            **self.tagger.tag(full_text),
                             "references": self.extract_cross_references(
                                 full_text
                             ),
                         }
 
                         chunks.append(Chunk(chunk_id, full_text, metadata))
-            else:
-                # Không có khoản - chunk toàn bộ điều
-                chunk_id = f"d{dieu_num}"
-                full_text = f"""Điều {dieu_num}: {dieu_title}
+                else:
+                    # Chunk theo khoản
+                    chunk_id = f"d{dieu_num}_k{khoan_num}"
+                    full_text = f"""Điều {dieu_num}: {dieu_title}
+                                        Khoản {khoan_num}:
+                                        {khoan_text}
+
+                                        [Chương: {chuong}]"""
+
+                    metadata = {
+                        "dieu": dieu_num,
+                        "khoan": int(khoan_num),
+                        "chuong": chuong,
+                        "title": dieu_title,
+                        **self.tagger.tag(full_text),
+                        "references": self.extract_cross_references(
+                            full_text
+                        ),
+                    }
+
+                    chunks.append(Chunk(chunk_id, full_text, metadata))
+        else:
+            # Không có khoản - chunk toàn bộ điều
+            chunk_id = f"d{dieu_num}"
+            full_text = f"""Điều {dieu_num}: {dieu_title}
 {content}
 
 [Chương: {chuong}]"""
 
-                metadata = {
-                    "dieu": dieu_num,
+            metadata = {
+                "dieu": dieu_num,
+                "chuong": chuong,
+                "title": dieu_title,
+                **self.tagger.tag(full_text),
+                "references": self.extract_cross_references(full_text),
+            }
+
+            chunks.append(Chunk(chunk_id, full_text, metadata))
+
+        return chunks
+
+    def chunk_dieu_sized(
+        self, dieu_num: str, dieu_title: str, content: str
+    ) -> List[Chunk]:
+        """
+        Chunk một Điều theo self.budget: bỏ dòng mục lục, tách Khoản dài theo
+        Điểm / câu (có overlap), gộp Khoản quá ngắn (xem rechunk.plan_dieu)
+        """
+        from rechunk import is_toc_entry, piece_id, piece_label, plan_dieu
+
+        dieu_title = dieu_title.strip()
+        if is_toc_entry(dieu_title, content):
+            return []
+
+        dieu_num = int(dieu_num)
+        chuong = self.get_chuong(dieu_num)
+        chunks = []
+        for piece in plan_dieu(content, self.budget):
+            label = piece_label(piece)
+            full_text = f"Điều {dieu_num}: {dieu_title}\n"
+            if label:
+                full_text += f"{label}:\n"
+            full_text += f"{piece['text']}\n\n[Chương: {chuong}]"
+
+            metadata = {"dieu": dieu_num}
+            if piece["khoans"]:
+                metadata["khoan"] = piece["khoans"][0]
+                if len(piece["khoans"]) > 1:
+                    metadata["khoans"] = piece["khoans"]
+            if piece["diems"]:
+                metadata["diem"] = piece["diems"][0]
+                if len(piece["diems"]) > 1:
+                    metadata["diems"] = piece["diems"]
+            if "part" in piece:
+                metadata["part"] = piece["part"]
+                metadata["parts"] = piece["parts"]
+            metadata.update(
+                {
                     "chuong": chuong,
                     "title": dieu_title,
-                    "keywords": self.extract_keywords(full_text),
-                    "applies_to": self.extract_applies_to(full_text),
-                    "has_table": self.extract_tables(full_text),
+                    **self.tagger.tag(full_text),
                     "references": self.extract_cross_references(full_text),
                 }
-
-                chunks.append(Chunk(chunk_id, full_text, metadata))
-
+            )
+            chunks.append(Chunk(piece_id(dieu_num, piece), full_text, metadata))
         return chunks
 
-    def extract_special_tables(self) -> List[Chunk]:
-        """Trích xuất các bảng quan trọng thành chunks riêng"""
+    def extract_special_tables(
+        self, found_markers: Optional[set] = None
+    ) -> List[Chunk]:
+        """
+        Trích xuất các bảng quan trọng thành chunks riêng.
+        found_markers: các SPECIAL_TABLE_MARKERS đã gặp (pipeline streaming),
+        mặc định tìm trong self.text.
+        """
+        if found_markers is None:
+            found_markers = {m for m in SPECIAL_TABLE_MARKERS if m in self.text}
         chunks = []
 
         # Bảng quy đổi điểm
-        if "Điểm học phần theo" in self.text:
+        if "Điểm học phần theo" in found_markers:
             table_text = """BẢNG QUY ĐỔI ĐIỂM HỌC PHẦN (Điều 5, Khoản 6)
 
 Thang 10 → Điểm chữ → Thang 4:
@@ -283,7 +441,7 @@ LƯU Ý:
             )
 
         # Bảng xếp loại học lực
-        if "Xếp loại" in self.text and "GPA hoặc CPA" in self.text:
+        if "Xếp loại" in found_markers and "GPA hoặc CPA" in found_markers:
             table_text = """BẢNG XẾP LOẠI HỌC LỰC (Điều 12, Khoản 6)
 
 GPA/CPA → Xếp loại:
@@ -314,7 +472,7 @@ GPA/CPA → Xếp loại:
             )
 
         # Bảng trình độ năm học
-        if "Số TCTL" in self.text and "Trình độ" in self.text:
+        if "Số TCTL" in found_markers and "Trình độ" in found_markers:
             table_text = """BẢNG TRÌNH ĐỘ NĂM HỌC (Điều 12, Khoản 5)
 
 Số TC tích lũy → Trình độ năm học:
@@ -343,28 +501,55 @@ Số TC tích lũy → Trình độ năm học:
 
         return chunks
 
-    def extract_all(self) -> List[Chunk]:
-        """Trích xuất tất cả chunks"""
+    def extract_pdf_tables(
+        self, pdf_path: str, cache_dir: Optional[str] = ".extract_cache"
+    ) -> List[Chunk]:
+        """
+        Bảng nhận diện trực tiếp từ PDF (pdfplumber extract_tables, cache theo
+        trang); không tìm thấy bảng nào thì dùng bảng viết sẵn như cũ.
+        """
+        from table_extract import iter_table_chunks
+
+        chunks = list(iter_table_chunks(pdf_path, self.tagger, cache_dir))
+        if not chunks:
+            print("⚠️  Không nhận diện được bảng trong PDF, dùng bảng đặc biệt viết sẵn")
+            return self.extract_special_tables()
+        return chunks
+
+    def extract_all(self, pdf_path: Optional[str] = None) -> List[Chunk]:
+        """Trích xuất tất cả chunks (có pdf_path thì bảng lấy từ PDF)"""
         chunks = []
 
         # 1. Chunks chính theo điều/khoản
-        chunks.extend(self.chunk_by_dieu_khoan())
-
-        # 2. Bảng biểu đặc biệt
-        chunks.extend(self.extract_special_tables())
+        with instrument.stage("chunk_dieu_khoan"):
+            chunks.extend(self.chunk_by_dieu_khoan())
+            instrument.count("chunks", len(chunks))
+
+        # 2. Bảng biểu
+        with instrument.stage("tables"):
+            tables = (
+                self.extract_pdf_tables(pdf_path)
+                if pdf_path
+                else self.extract_special_tables()
+            )
+            chunks.extend(tables)
+            instrument.count("table_chunks", len(tables))
 
         self.chunks = chunks
         return chunks
 
+    def document_metadata(self) -> Dict:
+        return {
+            "document": "Quy chế đào tạo ĐHBK Hà Nội",
+            "version": "QĐ 4600/QĐ-ĐHBK ngày 09/06/2023",
+            "total_chunks": len(self.chunks),
+            "created_at": datetime.now().isoformat(),
+        }
+
     def save_to_json(self, filepath: str):
         """Lưu chunks ra file JSON"""
         data = {
-            "metadata": {
-                "document": "Quy chế đào tạo ĐHBK Hà Nội",
-                "version": "QĐ 4600/QĐ-ĐHBK ngày 09/06/2023",
-                "total_chunks": len(self.chunks),
-                "created_at": datetime.now().isoformat(),
-            },
+            "metadata": self.document_metadata(),
             "chunks": [chunk.to_dict() for chunk in self.chunks],
         }
 
@@ -373,63 +558,159 @@ Số TC tích lũy → Trình độ năm học:
 
         print(f"✅ Đã lưu {len(self.chunks)} chunks vào {filepath}")
 
-    def get_statistics(self) -> Dict:
-        """Thống kê về chunks"""
-        stats = {
-            "total_chunks": len(self.chunks),
+    def save_to_store(self, filepath: str):
+        """Lưu chunks ra chunk store nhị phân (mmap, truy cập theo id)"""
+        from chunk_store import ChunkStore
+
+        ChunkStore.write(self.chunks, filepath, self.document_metadata())
+        print(f"✅ Đã lưu {len(self.chunks)} chunks vào {filepath}")
+
+    def save_reference_graph(self, filepath: str):
+        """Lưu đồ thị tham chiếu chéo (đã resolve ra chunk id) cạnh file chunks"""
+        from ref_graph import ReferenceGraph
+
+        graph = ReferenceGraph.build(self.chunks)
+        graph.save(filepath)
+        print(f"✅ Đã lưu đồ thị tham chiếu ({len(graph.edges)} chunks) vào {filepath}")
+        for d in graph.dangling:
+            print(f"  ⚠️  {d['source']}: '{d['reference']}' không trỏ tới chunk nào")
+        return graph
+
+    def iter_chunks(
+        self, pages: Iterable[str], pdf_path: Optional[str] = None
+    ) -> Iterator[Chunk]:
+        """
+        Pipeline streaming: trang -> Điều -> chunks Khoản/Điểm.
+        Chunks của một Điều được phát ra ngay khi Điều đó đóng lại,
+        bảng (từ pdf_path nếu có, không thì bảng đặc biệt) được phát ra sau cùng.
+        """
+        found_markers = set()
+
+        def track_markers(pages):
+            for page in pages:
+                found_markers.update(
+                    m for m in SPECIAL_TABLE_MARKERS if m in page
+                )
+                yield page
+
+        for dieu_num, dieu_title, content in iter_dieu_segments(
+            track_markers(pages)
+        ):
+            chunks = self.chunk_dieu(dieu_num, dieu_title, content)
+            instrument.count("chunks", len(chunks))
+            yield from chunks
+
+        if pdf_path:
+            tables = self.extract_pdf_tables(pdf_path)
+        else:
+            tables = self.extract_special_tables(found_markers)
+        instrument.count("table_chunks", len(tables))
+        yield from tables
+
+    def stream_to_jsonl(
+        self, pages: Iterable[str], filepath: str, pdf_path: Optional[str] = None
+    ) -> Dict:
+        """Ghi chunks ra JSON Lines ngay khi sinh ra, trả về thống kê"""
+        stats = self.new_statistics()
+        with instrument.stage("stream_to_jsonl"), open(filepath, "w", encoding="utf-8") as f:
+            for chunk in self.iter_chunks(pages, pdf_path):
+                f.write(json.dumps(chunk.to_dict(), ensure_ascii=False) + "\n")
+                self.update_statistics(stats, chunk)
+        self.finish_statistics(stats)
+
+        print(f"✅ Đã ghi {stats['total_chunks']} chunks vào {filepath}")
+        return stats
+
+    @staticmethod
+    def new_statistics() -> Dict:
+        return {
+            "total_chunks": 0,
             "by_chuong": {},
             "by_keywords": {},
             "by_applies_to": {},
             "with_tables": 0,
             "with_references": 0,
+            "lengths": {"chars": [], "tokens": []},
         }
 
+    def get_statistics(self) -> Dict:
+        """Thống kê về chunks"""
+        stats = self.new_statistics()
         for chunk in self.chunks:
-            # By chương
-            chuong = chunk.metadata.get("chuong", "Unknown")
-            stats["by_chuong"][chuong] = stats["by_chuong"].get(chuong, 0) + 1
-
-            # By keywords
-            for kw in chunk.metadata.get("keywords", []):
-                stats["by_keywords"][kw] = stats["by_keywords"].get(kw, 0) + 1
-
-            # By applies_to
-            for applies in chunk.metadata.get("applies_to", []):
-                stats["by_applies_to"][applies] = (
-                    stats["by_applies_to"].get(applies, 0) + 1
-                )
+            self.update_statistics(stats, chunk)
+        return self.finish_statistics(stats)
+
+    @staticmethod
+    def finish_statistics(stats: Dict) -> Dict:
+        """Thay list độ dài bằng phân bố độ dài (ký tự và âm tiết)"""
+        lengths = stats.pop("lengths")
+        stats["length_distribution"] = {
+            unit: length_distribution(values) for unit, values in lengths.items()
+        }
+        return stats
 
-            # Tables
-            if chunk.metadata.get("has_table"):
-                stats["with_tables"] += 1
+    @staticmethod
+    def update_statistics(stats: Dict, chunk: Chunk):
+        """Cộng dồn thống kê của một chunk"""
+        stats["total_chunks"] += 1
 
-            # References
-            if chunk.metadata.get("references"):
-                stats["with_references"] += 1
+        # By chương
+        chuong = chunk.metadata.get("chuong", "Unknown")
+        stats["by_chuong"][chuong] = stats["by_chuong"].get(chuong, 0) + 1
 
-        return stats
+        # By keywords
+        for kw in chunk.metadata.get("keywords", []):
+            stats["by_keywords"][kw] = stats["by_keywords"].get(kw, 0) + 1
+
+        # By applies_to
+        for applies in chunk.metadata.get("applies_to", []):
+            stats["by_applies_to"][applies] = (
+                stats["by_applies_to"].get(applies, 0) + 1
+            )
+
+        # Tables
+        if chunk.metadata.get("has_table"):
+            stats["with_tables"] += 1
+
+        # References
+        if chunk.metadata.get("references"):
+            stats["with_references"] += 1
+
+        # Độ dài (ký tự / âm tiết) của text được embed
+        stats["lengths"]["chars"].append(len(chunk.text))
+        stats["lengths"]["tokens"].append(len(chunk.text.split()))
 
 
 # ====================== MAIN USAGE ======================
 
 
-def main(text_content: str):
-    """Hàm chính để chạy extraction"""
+def main(text_content: str, pdf_path: Optional[str] = None, budget=None):
+    """
+    Hàm chính để chạy extraction (pdf_path: lấy bảng trực tiếp từ PDF,
+    budget: rechunk.ChunkBudget để chunk theo kích thước)
+    """
 
     print("🚀 Bắt đầu extract dữ liệu RAG từ Quy chế đào tạo ĐHBK...")
 
     # Khởi tạo extractor
-    extractor = QuyCheDaoTaoExtractor(text_content)
+    extractor = QuyCheDaoTaoExtractor(text_content, budget=budget)
 
     # Extract tất cả chunks
-    chunks = extractor.extract_all()
+    chunks = extractor.extract_all(pdf_path)
 
     # Thống kê
-    stats = extractor.get_statistics()
+    with instrument.stage("statistics"):
+        stats = extractor.get_statistics()
     print(f"\n📊 THỐNG KÊ:")
     print(f"  - Tổng số chunks: {stats['total_chunks']}")
     print(f"  - Chunks có bảng: {stats['with_tables']}")
     print(f"  - Chunks có tham chiếu: {stats['with_references']}")
+    for unit, dist in stats["length_distribution"].items():
+        if dist["count"]:
+            print(
+                f"  - Độ dài ({unit}): min {dist['min']}, p50 {dist['p50']}, "
+                f"p90 {dist['p90']}, max {dist['max']}"
+            )
 
     print(f"\n📚 Phân bố theo chương:")
     for chuong, count in sorted(stats["by_chuong"].items()):
@@ -443,7 +724,10 @@ def main(text_content: str):
         print(f"  - {kw}: {count} chunks")
 
     # Lưu ra file
-    extractor.save_to_json("quy_che_rag_data.json")
+    with instrument.stage("save"):
+        extractor.save_to_json("quy_che_rag_data.json")
+        extractor.save_to_store("quy_che_rag_data.qcs")
+        extractor.save_reference_graph("quy_che_rag_data_refs.json")
 
     # In một vài chunks mẫu
     print(f"\n📝 MẪU CHUNKS:")
@@ -467,7 +751,7 @@ def extract_text_from_pdf(pdf_path: str) -> str:
         import PyPDF2
 
         print(f"📄 Đang đọc PDF: {pdf_path}")
-        text = ""
+        parts = []
 
         with open(pdf_path, "rb") as file:
             pdf_reader = PyPDF2.PdfReader(file)
@@ -475,11 +759,11 @@ def extract_text_from_pdf(pdf_path: str) -> str:
             print(f"   Tổng số trang: {total_pages}")
 
             for i, page in enumerate(pdf_reader.pages, 1):
-                page_text = page.extract_text()
-                text += page_text + "\n"
+                parts.append(page.extract_text() + "\n")
                 if i % 10 == 0:
                     print(f"   Đã xử lý {i}/{total_pages} trang...")
 
+        text = "".join(parts)
         print(f"✅ Hoàn thành! Tổng {len(text)} ký tự\n")
         return text
 
@@ -497,7 +781,7 @@ def extract_text_from_pdf_advanced(pdf_path: str) -> str:
         import pdfplumber
 
         print(f"📄 Đang đọc PDF với pdfplumber: {pdf_path}")
-        text = ""
+        parts = []
 
         with pdfplumber.open(pdf_path) as pdf:
             total_pages = len(pdf.pages)
@@ -506,10 +790,109 @@ def extract_text_from_pdf_advanced(pdf_path: str) -> str:
             for i, page in enumerate(pdf.pages, 1):
                 page_text = page.extract_text()
                 if page_text:
-                    text += page_text + "\n"
+                    parts.append(page_text + "\n")
                 if i % 10 == 0:
                     print(f"   Đã xử lý {i}/{total_pages} trang...")
 
+        text = "".join(parts)
+        print(f"✅ Hoàn thành! Tổng {len(text)} ký tự\n")
+        return text
+
+    except ImportError:
+        print("❌ Cần cài đặt pdfplumber: pip install pdfplumber")
+        print("   Đang fallback sang PyPDF2...")
+        return extract_text_from_pdf(pdf_path)
+    except Exception as e:
+        print(f"❌ Lỗi khi đọc PDF: {e}")
+        return None
+
+
+def iter_pdf_pages(pdf_path: str) -> Iterator[str]:
+    """Đọc lần lượt text từng trang (pdfplumber), không giữ cả văn bản"""
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages:
+            page_text = page.extract_text()
+            page.close()
+            instrument.count("pages")
+            if page_text:
+                yield page_text + "\n"
+
+
+def _extract_page_range(task) -> List[Dict]:
+    """Worker: tự mở PDF và extract một dải trang liên tiếp [start, end)"""
+    import pdfplumber
+
+    pdf_path, start, end = task
+    results = []
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_no in range(start, end):
+            t0 = time.perf_counter()
+            page = pdf.pages[page_no]
+            page_text = page.extract_text() or ""
+            page.close()  # giải phóng cache layout của trang
+            results.append(
+                {
+                    "page": page_no + 1,
+                    "text": page_text,
+                    "seconds": time.perf_counter() - t0,
+                }
+            )
+    return results
+
+
+@instrument.timed("pdf_pages")
+def extract_pages_parallel(
+    pdf_path: str, workers: Optional[int] = None, pages_per_task: Optional[int] = None
+) -> List[Dict]:
+    """
+    Extract từng trang bằng process pool, mỗi task là một dải trang liên tiếp
+    (worker tự mở file PDF). Trả về list {"page", "text", "seconds"} theo thứ tự trang.
+    """
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        total_pages = len(pdf.pages)
+
+    workers = workers or os.cpu_count() or 1
+    # Chia nhỏ hơn số worker để cân bằng tải khi có trang nặng (bảng, hình)
+    pages_per_task = pages_per_task or max(1, math.ceil(total_pages / (workers * 4)))
+    tasks = [
+        (pdf_path, start, min(start + pages_per_task, total_pages))
+        for start in range(0, total_pages, pages_per_task)
+    ]
+
+    if workers == 1:
+        shards = [_extract_page_range(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            shards = list(pool.map(_extract_page_range, tasks))
+
+    instrument.count("pages", total_pages)
+    return [page for shard in shards for page in shard]
+
+
+def extract_text_from_pdf_parallel(
+    pdf_path: str, workers: Optional[int] = None
+) -> str:
+    """Extract text từ PDF với pdfplumber, song song theo trang"""
+    try:
+        print(f"📄 Đang đọc PDF song song ({workers or os.cpu_count()} process): {pdf_path}")
+        t0 = time.perf_counter()
+        pages = extract_pages_parallel(pdf_path, workers)
+        elapsed = time.perf_counter() - t0
+
+        text = "".join(p["text"] + "\n" for p in pages if p["text"])
+
+        page_time = sum(p["seconds"] for p in pages)
+        slowest = sorted(pages, key=lambda p: p["seconds"], reverse=True)[:3]
+        print(f"   Tổng số trang: {len(pages)}")
+        print(f"   Thời gian: {elapsed:.2f}s (tổng thời gian các trang: {page_time:.2f}s)")
+        print(
+            "   Trang chậm nhất: "
+            + ", ".join(f"{p['page']} ({p['seconds']:.2f}s)" for p in slowest)
+        )
         print(f"✅ Hoàn thành! Tổng {len(text)} ký tự\n")
         return text
 
@@ -534,8 +917,35 @@ if __name__ == "__main__":
     print("🚀 RAG DATA EXTRACTION - ĐHBK QUY CHẾ ĐÀO TẠO")
     print("=" * 60 + "\n")
 
+    # Đo thời gian / bộ nhớ từng stage: --profile[=PATH], --cprofile=PATH
+    instrument.enable_from_argv("quy_che")
+
+    # Chunk theo kích thước: --sized [--chunk-unit=tokens --chunk-target=N
+    # --chunk-max=N --chunk-min=N --chunk-overlap=N]
+    budget = None
+    if "--sized" in sys.argv:
+        from rechunk import budget_from_argv
+
+        budget = budget_from_argv(sys.argv)
+        print(f"📏 Chunk theo ngân sách {budget.key()}\n")
+
+    # Chế độ incremental: chỉ xử lý lại trang / Điều thay đổi, ghi kèm diff
+    if "--incremental" in sys.argv:
+        from extract_cache import incremental_extract
+
+        incremental_extract(pdf_file, budget=budget)
+        sys.exit(0)
+
+    # Chế độ streaming: ghi JSON Lines ngay khi từng Điều được chunk xong
+    if "--stream" in sys.argv:
+        stats = QuyCheDaoTaoExtractor(budget=budget).stream_to_jsonl(
+            iter_pdf_pages(pdf_file), "quy_che_rag_data.jsonl", pdf_file
+        )
+        print(f"📊 Tổng chunks: {stats['total_chunks']}")
+        sys.exit(0)
+
     # Extract text từ PDF
-    text_content = extract_text_from_pdf_advanced(pdf_file)
+    text_content = extract_text_from_pdf_parallel(pdf_file)
 
     if not text_content:
         print("\n❌ Không thể đọc file PDF. Vui lòng kiểm tra:")
@@ -544,7 +954,7 @@ if __name__ == "__main__":
         sys.exit(1)
 
     # Chạy extraction
-    extractor, chunks = main(text_content)
+    extractor, chunks = main(text_content, pdf_file, budget)
 
     print("\n" + "=" * 60)
     print("✅ HOÀN THÀNH!")
@@ -555,3 +965,4 @@ if __name__ == "__main__":
     print("   - Load JSON vào vector database")
     print("   - Tạo embeddings cho từng chunk")
     print("   - Build RAG pipeline với LangChain/LlamaIndex")
+    instrument.disable()
@@ -0,0 +1,257 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Optional
+
+from quy_che import DIEM_HEADING_RE, collapse_whitespace, split_diem, split_khoan
+
+# Dòng mục lục bị nhận nhầm là Điều: "Phạm vi điều chỉnh ..........  1"
+TOC_TITLE_RE = re.compile(r"(?:\.{4,}|…{2,})\s*\d+\s*$")
+# Ranh giới câu: sau . ; ! ? và khoảng trắng ("3.5", "09/06/2023" không bị cắt)
+SENTENCE_END_RE = re.compile(r"(?<=[.;!?])\s+")
+
+UNITS = ("chars", "tokens")
+
+
+@dataclass(frozen=True)
+class ChunkBudget:
+    """
+    Ngân sách kích thước chunk, đo trên phần nội dung (không tính dòng
+    tiêu đề Điều / Chương). unit="chars": số ký tự, unit="tokens": số âm
+    tiết (tách theo khoảng trắng).
+      - max_len: chunk dài hơn bị tách theo Điểm rồi theo câu
+      - target: độ dài nhắm tới khi gom Điểm / cửa sổ câu
+      - min_len: Khoản ngắn hơn được gộp với Khoản liền kề
+      - overlap: phần lặp lại giữa hai cửa sổ câu liên tiếp
+    """
+
+    target: int = 800
+    max_len: int = 1500
+    min_len: int = 200
+    overlap: int = 150
+    unit: str = "chars"
+
+    def __post_init__(self):
+        if self.unit not in UNITS:
+            raise ValueError(f"unit phải là một trong {UNITS}, nhận {self.unit!r}")
+        if not 0 <= self.min_len <= self.target <= self.max_len:
+            raise ValueError("Cần 0 <= min_len <= target <= max_len")
+        if not 0 <= self.overlap < self.target:
+            raise ValueError("Cần 0 <= overlap < target")
+
+    def measure(self, text: str) -> int:
+        return len(text) if self.unit == "chars" else len(text.split())
+
+    def key(self) -> str:
+        """Chuỗi đại diện tham số (đưa vào khóa cache)"""
+        return f"{self.unit}:{self.min_len}/{self.target}/{self.max_len}/{self.overlap}"
+
+
+def budget_from_argv(argv: List[str]) -> ChunkBudget:
+    """ChunkBudget từ các cờ dạng --chunk-target=800, --chunk-unit=tokens (thiếu thì dùng mặc định)"""
+    fields = {"target": "target", "max": "max_len", "min": "min_len", "overlap": "overlap", "unit": "unit"}
+    params = {}
+    for arg in argv:
+        m = re.match(r"--chunk-(\w+)=(\S+)$", arg)
+        if m and m.group(1) in fields:
+            name = fields[m.group(1)]
+            params[name] = m.group(2) if name == "unit" else int(m.group(2))
+    return ChunkBudget(**params)
+
+
+def is_toc_entry(title: str, content: str) -> bool:
+    """Điều thực chất là dòng mục lục: tiêu đề có dấu chấm dẫn + số trang"""
+    return bool(TOC_TITLE_RE.search(title.strip())) or not collapse_whitespace(content)
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in SENTENCE_END_RE.split(text) if s]
+
+
+def split_words(text: str, size: int, budget: ChunkBudget) -> List[str]:
+    """Cắt câu quá dài theo từ, mỗi phần tối đa size"""
+    parts, current = [], []
+    for word in text.split():
+        if current and budget.measure(" ".join(current + [word])) > size:
+            parts.append(" ".join(current))
+            current = []
+        current.append(word)
+    if current:
+        parts.append(" ".join(current))
+    return parts
+
+
+def overlap_tail(sentences: List[str], budget: ChunkBudget) -> List[str]:
+    """Các câu cuối (tổng <= overlap) lặp lại ở đầu cửa sổ sau; câu cuối quá dài thì lấy đuôi theo từ"""
+    if not budget.overlap or not sentences:
+        return []
+    tail = []
+    for s in reversed(sentences):
+        if budget.measure(" ".join([s] + tail)) > budget.overlap:
+            break
+        tail.insert(0, s)
+    if tail:
+        return tail
+    words = sentences[-1].split()
+    for n in range(len(words), 0, -1):
+        if budget.measure(" ".join(words[-n:])) <= budget.overlap:
+            return [" ".join(words[-n:])]
+    return []
+
+
+def sentence_windows(text: str, budget: ChunkBudget) -> List[str]:
+    """
+    Tách text dài thành các cửa sổ câu ~target (không vượt max_len), cửa sổ
+    sau bắt đầu bằng overlap cuối cửa sổ trước. Cửa sổ cuối quá ngắn được
+    gộp vào cửa sổ trước nếu vừa max_len.
+    """
+    units = []
+    for s in split_sentences(text):
+        if budget.measure(s) > budget.max_len:
+            units.extend(split_words(s, budget.target, budget))
+        else:
+            units.append(s)
+
+    windows = []
+    current: List[str] = []
+    carried = 0  # số câu đầu current là overlap từ cửa sổ trước
+    for s in units:
+        if len(current) > carried and budget.measure(" ".join(current + [s])) > budget.target:
+            windows.append(current)
+            current = overlap_tail(current, budget)
+            if budget.measure(" ".join(current + [s])) > budget.max_len:
+                current = []
+            carried = len(current)
+        current.append(s)
+    if len(current) > carried or not windows:
+        windows.append(current)
+
+    texts = [" ".join(w) for w in windows]
+    if len(texts) > 1 and budget.measure(" ".join(windows[-1][carried:])) < budget.min_len:
+        merged = " ".join(windows[-2] + windows[-1][carried:])
+        if budget.measure(merged) <= budget.max_len:
+            texts[-2:] = [merged]
+    return texts
+
+
+def _split_long(piece: Dict, budget: ChunkBudget) -> List[Dict]:
+    if budget.measure(piece["text"]) <= budget.max_len:
+        return [piece]
+    windows = sentence_windows(piece["text"], budget)
+    return [dict(piece, text=w, part=i, parts=len(windows)) for i, w in enumerate(windows, 1)]
+
+
+def plan_khoan(khoan_num: str, khoan_raw: str, budget: ChunkBudget) -> List[Dict]:
+    """
+    Khoản vừa max_len giữ nguyên; dài hơn thì gom các Điểm liên tiếp
+    thành nhóm ~target (câu dẫn trước Điểm a được lặp lại đầu mỗi nhóm nếu
+    ngắn hơn overlap), Điểm / Khoản vẫn quá dài thì tách theo câu.
+    """
+    khoan = int(khoan_num)
+    text = collapse_whitespace(khoan_raw)
+    piece = {"khoans": [khoan], "diems": [], "text": text}
+    diems = split_diem(khoan_raw)
+    if budget.measure(text) <= budget.max_len or not diems:
+        return _split_long(piece, budget)
+
+    first = next(m for m in DIEM_HEADING_RE.finditer(khoan_raw) if m.group(1) == "a")
+    intro = collapse_whitespace(khoan_raw[: first.start()])
+    pieces = []
+    if intro and budget.measure(intro) > budget.overlap:
+        pieces.extend(
+            _split_long({"khoans": [khoan], "diems": [], "text": intro, "intro": True}, budget)
+        )
+        intro = ""
+
+    groups: List[List] = []
+    for diem_char, diem_raw in diems:
+        item = (diem_char, f"{diem_char}) {collapse_whitespace(diem_raw)}")
+        last = groups[-1] if groups else None
+        if last and budget.measure(" ".join([intro] + [t for _, t in last + [item]])) <= budget.target:
+            last.append(item)
+        else:
+            groups.append([item])
+    for group in groups:
+        body = "\n".join(([intro] if intro else []) + [t for _, t in group])
+        pieces.extend(
+            _split_long({"khoans": [khoan], "diems": [c for c, _ in group], "text": body}, budget)
+        )
+    return pieces
+
+
+def merge_small(pieces: List[Dict], budget: ChunkBudget) -> List[Dict]:
+    """
+    Gộp Khoản nguyên vẹn ngắn hơn min_len với Khoản liền sau (hoặc liền
+    trước nếu là Khoản cuối) khi tổng không vượt max_len. Nội dung gộp giữ
+    số Khoản ở đầu mỗi đoạn.
+    """
+
+    def whole(p):
+        return not p["diems"] and "part" not in p and not p.get("intro")
+
+    def body(p):
+        if p.get("numbered"):
+            return p["text"]
+        return f"{p['khoans'][0]}. {p['text']}"
+
+    def join(a, b):
+        return {"khoans": a["khoans"] + b["khoans"], "diems": [], "text": body(a) + "\n" + body(b), "numbered": True}
+
+    merged = list(pieces)
+    i = 0
+    while i < len(merged):
+        p = merged[i]
+        if whole(p) and budget.measure(p["text"]) < budget.min_len:
+            for j in (i + 1, i - 1):
+                if 0 <= j < len(merged) and whole(merged[j]):
+                    a, b = (p, merged[j]) if j > i else (merged[j], p)
+                    candidate = join(a, b)
+                    if budget.measure(candidate["text"]) <= budget.max_len:
+                        lo = min(i, j)
+                        merged[lo : lo + 2] = [candidate]
+                        i = lo
+                        break
+            else:
+                i += 1
+            continue
+        i += 1
+    return merged
+
+
+def plan_dieu(content: str, budget: ChunkBudget) -> List[Dict]:
+    """Kế hoạch chunk một Điều: list {"khoans", "diems", "text", "part"?, "parts"?}"""
+    khoans = split_khoan(content)
+    if not khoans:
+        return _split_long({"khoans": [], "diems": [], "text": collapse_whitespace(content)}, budget)
+    pieces = []
+    for khoan_num, khoan_raw in khoans:
+        pieces.extend(plan_khoan(khoan_num, khoan_raw, budget))
+    return merge_small(pieces, budget)
+
+
+def _span(labels: List) -> str:
+    return str(labels[0]) if len(labels) == 1 else f"{labels[0]}-{labels[-1]}"
+
+
+def piece_id(dieu_num: int, piece: Dict) -> str:
+    """d5_k3, d5_k1-2 (Khoản gộp), d5_k3_pa-c (nhóm Điểm), ..._s2 (cửa sổ câu thứ 2)"""
+    chunk_id = f"d{dieu_num}"
+    if piece["khoans"]:
+        chunk_id += f"_k{_span(piece['khoans'])}"
+    if piece["diems"]:
+        chunk_id += f"_p{_span(piece['diems'])}"
+    if "part" in piece:
+        chunk_id += f"_s{piece['part']}"
+    return chunk_id
+
+
+def piece_label(piece: Dict) -> Optional[str]:
+    """Nhãn vị trí trong chunk text: "Khoản 1-2", "Khoản 3, Điểm a-c (phần 1/2)" """
+    label = []
+    if piece["khoans"]:
+        label.append(f"Khoản {_span(piece['khoans'])}")
+    if piece["diems"]:
+        label.append(f"Điểm {_span(piece['diems'])}")
+    text = ", ".join(label)
+    if "part" in piece:
+        text += f" (phần {piece['part']}/{piece['parts']})"
+    return text.strip() or None
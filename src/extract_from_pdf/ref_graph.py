@@ -0,0 +1,154 @@
+import json
+import re
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from quy_che import Chunk
+
+GRAPH_VERSION = 1
+
+# "Điều 12", "Điều 12, Khoản 6", "Điều 3, Khoản 3, Điểm b"
+# (định dạng do extract_cross_references sinh ra)
+REFERENCE_RE = re.compile(
+    r"Điều (\d+)(?:, Khoản (\d+))?(?:, Điểm ([a-zđ]))?$"
+)
+
+
+def parse_reference(ref: str) -> Optional[Tuple[int, Optional[int], Optional[str]]]:
+    m = REFERENCE_RE.match(ref)
+    if not m:
+        return None
+    return int(m.group(1)), int(m.group(2)) if m.group(2) else None, m.group(3)
+
+
+class ReferenceGraph:
+    """
+    Đồ thị tham chiếu chéo giữa các chunks: chunk id -> các chunk id được
+    tham chiếu (edges) và chiều ngược lại (reverse), dựng một lần từ
+    metadata["references"] nên mở rộng một hit chỉ là tra dict, O(bậc).
+    Tham chiếu không trỏ tới chunk nào được ghi vào dangling.
+    """
+
+    def __init__(
+        self,
+        edges: Dict[str, List[str]],
+        reverse: Dict[str, List[str]],
+        dangling: List[Dict],
+    ):
+        self.edges = edges
+        self.reverse = reverse
+        self.dangling = dangling
+
+    @classmethod
+    def build(cls, chunks: Iterable[Chunk]) -> "ReferenceGraph":
+        chunks = list(chunks)
+        by_khoan: Dict[Tuple[int, int], List[str]] = {}
+        by_diem: Dict[Tuple[int, int, str], List[str]] = {}
+        khoan_of_dieu: Dict[int, List[str]] = {}
+        whole_dieu: Dict[int, List[str]] = {}
+        for chunk in chunks:
+            meta = chunk.metadata
+            if meta.get("type") == "table" or "dieu" not in meta:
+                continue
+            dieu = meta["dieu"]
+            if "khoan" not in meta:
+                whole_dieu.setdefault(dieu, []).append(chunk.id)
+                continue
+            khoan_of_dieu.setdefault(dieu, []).append(chunk.id)
+            # Chunk theo kích thước có thể gộp nhiều Khoản / Điểm (metadata khoans, diems)
+            for k in meta.get("khoans") or [meta["khoan"]]:
+                khoan = (dieu, k)
+                by_khoan.setdefault(khoan, []).append(chunk.id)
+                for diem in meta.get("diems") or ([meta["diem"]] if "diem" in meta else []):
+                    by_diem.setdefault(khoan + (diem,), []).append(chunk.id)
+
+        def resolve(ref: str) -> List[str]:
+            """Chunk cụ thể nhất khớp với tham chiếu (Điểm -> Khoản -> Điều)"""
+            parsed = parse_reference(ref)
+            if parsed is None:
+                return []
+            dieu, khoan, diem = parsed
+            if khoan is None:
+                # Chunk cả Điều thường là dòng mục lục, ưu tiên các Khoản
+                return khoan_of_dieu.get(dieu) or whole_dieu.get(dieu, [])
+            if diem is not None and (dieu, khoan, diem) in by_diem:
+                return by_diem[(dieu, khoan, diem)]
+            return by_khoan.get((dieu, khoan), [])
+
+        edges: Dict[str, List[str]] = {}
+        reverse: Dict[str, List[str]] = {}
+        dangling: List[Dict] = []
+        for chunk in chunks:
+            # Thứ tự references không ổn định (list(set())), sort cho output cố định
+            for ref in sorted(chunk.metadata.get("references") or []):
+                targets = [t for t in resolve(ref) if t != chunk.id]
+                if not targets:
+                    dangling.append({"source": chunk.id, "reference": ref})
+                out = edges.setdefault(chunk.id, [])
+                for target in targets:
+                    if target not in out:
+                        out.append(target)
+                        reverse.setdefault(target, []).append(chunk.id)
+        edges = {k: v for k, v in edges.items() if v}
+        return cls(edges, reverse, dangling)
+
+    def referenced(self, chunk_id: str) -> List[str]:
+        return self.edges.get(chunk_id, [])
+
+    def referenced_by(self, chunk_id: str) -> List[str]:
+        return self.reverse.get(chunk_id, [])
+
+    def expand(self, chunk_ids: Iterable[str], depth: int = 1) -> List[str]:
+        """Các chunk được tham chiếu (tới độ sâu depth) từ chunk_ids, không lặp lại input"""
+        seen = set(chunk_ids)
+        frontier = list(seen)
+        expanded = []
+        for _ in range(depth):
+            next_frontier = []
+            for cid in frontier:
+                for target in self.edges.get(cid, []):
+                    if target not in seen:
+                        seen.add(target)
+                        expanded.append(target)
+                        next_frontier.append(target)
+            frontier = next_frontier
+        return expanded
+
+    def to_dict(self) -> Dict:
+        return {
+            "version": GRAPH_VERSION,
+            "edges": self.edges,
+            "reverse": self.reverse,
+            "dangling": self.dangling,
+        }
+
+    def save(self, filepath: str):
+        with open(filepath, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, ensure_ascii=False, indent=2)
+
+    @classmethod
+    def load(cls, filepath: str) -> "ReferenceGraph":
+        with open(filepath, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        if data.get("version") != GRAPH_VERSION:
+            raise ValueError(f"Phiên bản đồ thị tham chiếu không khớp: {filepath}")
+        return cls(data["edges"], data["reverse"], data["dangling"])
+
+    @classmethod
+    def from_json(cls, json_path: str) -> "ReferenceGraph":
+        """Dựng đồ thị từ file chunks dạng save_to_json"""
+        with open(json_path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls.build(Chunk(c["id"], c["text"], c["metadata"]) for c in data["chunks"])
+
+
+if __name__ == "__main__":
+    import sys
+
+    json_path = sys.argv[1] if len(sys.argv) > 1 else "quy_che_rag_data.json"
+    graph = ReferenceGraph.from_json(json_path)
+    out_path = json_path.rsplit(".", 1)[0] + "_refs.json"
+    graph.save(out_path)
+    n_edges = sum(len(v) for v in graph.edges.values())
+    print(f"✅ {len(graph.edges)} chunks có tham chiếu, {n_edges} cạnh -> {out_path}")
+    for d in graph.dangling:
+        print(f"  ⚠️  {d['source']}: '{d['reference']}' không trỏ tới chunk nào")
@@ -0,0 +1,152 @@
+import json
+import os
+from typing import Dict, Iterator, List, Optional
+
+from extract_cache import page_content_hash
+from quy_che import DIEU_HEADING_RE, KHOAN_HEADING_RE, Chunk, collapse_whitespace
+
+# Tăng khi đổi cách nhận diện / lưu bảng để bỏ cache cũ
+TABLE_CACHE_VERSION = 1
+TABLE_CACHE_FILE = "tables.json"
+
+
+def clean_cell(cell) -> str:
+    return collapse_whitespace(cell) if cell else ""
+
+
+def extract_page_tables(page) -> Dict:
+    """
+    Bảng trên một trang pdfplumber: các dòng (đã làm sạch ô) và text phía
+    trên mỗi bảng (để xác định Điều/Khoản), cùng text cả trang.
+    """
+    tables = []
+    for table in page.find_tables():
+        rows = [[clean_cell(c) for c in row] for row in table.extract()]
+        rows = [row for row in rows if any(row)]
+        if len(rows) < 2:
+            continue
+        top = max(table.bbox[1], 0)
+        above = page.crop((0, 0, page.width, top)).extract_text() if top > 0 else ""
+        tables.append({"rows": rows, "bbox": list(table.bbox), "text_above": above or ""})
+    return {"text": page.extract_text() or "", "tables": tables}
+
+
+class ProvenanceTracker:
+    """Theo dõi Điều / Khoản đang mở khi đọc lần lượt text các trang"""
+
+    def __init__(self):
+        self.dieu: Optional[int] = None
+        self.title: Optional[str] = None
+        self.khoan: Optional[int] = None
+
+    def feed(self, text: str):
+        last_dieu = None
+        for last_dieu in DIEU_HEADING_RE.finditer(text):
+            pass
+        if last_dieu:
+            self.dieu = int(last_dieu.group(1))
+            self.title = last_dieu.group(2).strip()
+            self.khoan = None
+            text = text[last_dieu.end() :]
+        for m in KHOAN_HEADING_RE.finditer(text):
+            self.khoan = int(m.group(1))
+
+    def snapshot(self, text_above: str) -> Dict:
+        """Điều/Khoản tại vị trí bảng = trạng thái trước trang + text phía trên bảng"""
+        probe = ProvenanceTracker()
+        probe.dieu, probe.title, probe.khoan = self.dieu, self.title, self.khoan
+        probe.feed(text_above)
+        return {"dieu": probe.dieu, "title": probe.title, "khoan": probe.khoan}
+
+
+def render_table(rows: List[List[str]], provenance: Dict) -> str:
+    """Bảng -> text chunk: tiêu đề có Điều/Khoản, mỗi dòng dữ liệu nối bằng →"""
+    where = []
+    if provenance.get("dieu"):
+        where.append(f"Điều {provenance['dieu']}")
+    if provenance.get("khoan"):
+        where.append(f"Khoản {provenance['khoan']}")
+    heading = "BẢNG" + (f" ({', '.join(where)})" if where else "")
+    if provenance.get("title"):
+        heading += f" - {provenance['title']}"
+
+    header, body = rows[0], rows[1:]
+    lines = [heading, "", " → ".join(c for c in header if c) + ":"]
+    lines += ["- " + " → ".join(c for c in row if c) for row in body]
+    return "\n".join(lines)
+
+
+class TableCache:
+    """Cache theo hash nội dung trang -> kết quả extract_page_tables"""
+
+    def __init__(self, cache_dir: str = ".extract_cache"):
+        self.path = os.path.join(cache_dir, TABLE_CACHE_FILE)
+        self.entries: Dict = {}
+        self.used = set()
+        self.stats = {"hits": 0, "misses": 0}
+        if os.path.exists(self.path):
+            with open(self.path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            if data.get("version") == TABLE_CACHE_VERSION:
+                self.entries = data["entries"]
+
+    def get(self, page) -> Dict:
+        key = page_content_hash(page)
+        self.used.add(key)
+        if key in self.entries:
+            self.stats["hits"] += 1
+        else:
+            self.stats["misses"] += 1
+            self.entries[key] = extract_page_tables(page)
+        return self.entries[key]
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        entries = {k: v for k, v in self.entries.items() if k in self.used}
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump({"version": TABLE_CACHE_VERSION, "entries": entries}, f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+
+def iter_table_chunks(
+    pdf_path: str, tagger=None, cache_dir: Optional[str] = ".extract_cache"
+) -> Iterator[Chunk]:
+    """
+    Nhận diện bảng từng trang (pdfplumber extract_tables), sinh chunk gồm
+    text đã render + metadata có các dòng có cấu trúc và Điều/Khoản chứa bảng.
+    cache_dir=None: không dùng cache.
+    """
+    import pdfplumber
+
+    cache = TableCache(cache_dir) if cache_dir else None
+    tracker = ProvenanceTracker()
+    with pdfplumber.open(pdf_path) as pdf:
+        for page_no, page in enumerate(pdf.pages, 1):
+            result = cache.get(page) if cache else extract_page_tables(page)
+            page.close()
+            for i, table in enumerate(result["tables"], 1):
+                provenance = tracker.snapshot(table["text_above"])
+                text = render_table(table["rows"], provenance)
+                chunk_id = f"table_p{page_no}_{i}"
+                if provenance["dieu"]:
+                    chunk_id = f"table_d{provenance['dieu']}" + (
+                        f"_k{provenance['khoan']}" if provenance["khoan"] else ""
+                    ) + f"_p{page_no}_{i}"
+                metadata = {
+                    "type": "table",
+                    "dieu": provenance["dieu"],
+                    "khoan": provenance["khoan"],
+                    "page": page_no,
+                    "header": table["rows"][0],
+                    "rows": table["rows"][1:],
+                }
+                if tagger is not None:
+                    tags = tagger.tag(text)
+                    metadata["keywords"] = tags["keywords"]
+                    metadata["applies_to"] = tags["applies_to"]
+                yield Chunk(chunk_id, text, metadata)
+            tracker.feed(result["text"])
+    if cache:
+        cache.save()
+        print(f"♻️  Bảng: {cache.stats['hits']} trang dùng lại cache, {cache.stats['misses']} trang extract mới")
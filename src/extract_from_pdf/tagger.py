@@ -0,0 +1,125 @@
+import hashlib
+import json
+import os
+import re
+from typing import Dict, List, Optional
+
+DEFAULT_VOCAB_PATH = os.path.join(os.path.dirname(__file__), "tagger_vocab.json")
+
+
+def _trie_regex(terms) -> str:
+    """
+    Regex alternation dạng trie (gộp tiền tố chung, nhánh dài thử trước):
+    tại mỗi vị trí chỉ cần so một ký tự đầu là loại được hầu hết thuật ngữ.
+    """
+    trie: Dict = {}
+    for term in terms:
+        node = trie
+        for ch in term:
+            node = node.setdefault(ch, {})
+        node[""] = True
+
+    def build(node) -> str:
+        branches = [re.escape(ch) + build(child) for ch, child in node.items() if ch]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        body = "(?:" + "|".join(branches) + ")"
+        # Kết thúc thuật ngữ tại đây: nhánh dài hơn là tùy chọn (tham lam)
+        return body + "?" if "" in node else body
+
+    return build(trie)
+
+
+class Tagger:
+    """
+    Gắn keywords / applies_to / has_table cho chunk trong một lần quét.
+
+    Toàn bộ thuật ngữ được gộp vào một regex dạng trie, mỗi lần khớp lại tìm
+    tiếp từ ký tự kế tiếp nên bắt được cả các lần xuất hiện chồng lấn; các
+    thuật ngữ ngắn hơn bắt đầu cùng vị trí chính là tiền tố của thuật ngữ khớp
+    nên được suy ra sẵn. Kết quả giống hệt phép `term in text.lower()` cho
+    từng thuật ngữ.
+    """
+
+    def __init__(self, vocab: Dict):
+        # Hash vocabulary: đổi vocab thì metadata chunk đã cache cũng phải sinh lại
+        self.vocab_key: str = hashlib.sha1(
+            json.dumps(vocab, ensure_ascii=False, sort_keys=True).encode("utf-8")
+        ).hexdigest()
+        self.keywords: Dict[str, List[str]] = {
+            category: [v.lower() for v in variants]
+            for category, variants in vocab.get("keywords", {}).items()
+        }
+        self.applies_to: Dict[str, List[str]] = {
+            audience: [t.lower() for t in terms]
+            for audience, terms in vocab.get("applies_to", {}).items()
+        }
+        self.applies_to_default: str = vocab.get("applies_to_default", "tất cả")
+        self.tables: List[Dict] = [
+            {
+                "name": table["name"],
+                "all_of": [[t.lower() for t in group] for group in table["all_of"]],
+            }
+            for table in vocab.get("tables", [])
+        ]
+
+        terms = set()
+        for variants in list(self.keywords.values()) + list(self.applies_to.values()):
+            terms.update(variants)
+        for table in self.tables:
+            for group in table["all_of"]:
+                terms.update(group)
+
+        self.pattern = re.compile(_trie_regex(terms))
+        # Thuật ngữ khớp -> mọi thuật ngữ là tiền tố của nó (kể cả chính nó)
+        self.implied = {
+            term: frozenset(t for t in terms if term.startswith(t)) for term in terms
+        }
+
+    @classmethod
+    def from_file(cls, path: str = DEFAULT_VOCAB_PATH) -> "Tagger":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f))
+
+    def find_terms(self, text: str) -> set:
+        """Tập thuật ngữ xuất hiện trong text (lowercase một lần)"""
+        found = set()
+        text_lower = text.lower()
+        search = self.pattern.search
+        match = search(text_lower)
+        while match:
+            found |= self.implied[match.group()]
+            # Tìm tiếp từ ký tự kế tiếp để không bỏ sót thuật ngữ chồng lấn
+            match = search(text_lower, match.start() + 1)
+        return found
+
+    def tag(self, text: str) -> Dict:
+        found = self.find_terms(text)
+        return {
+            "keywords": self.match_keywords(found),
+            "applies_to": self.match_applies_to(found),
+            "has_table": self.match_table(found),
+        }
+
+    def match_keywords(self, found: set) -> List[str]:
+        return [
+            category
+            for category, variants in self.keywords.items()
+            if any(v in found for v in variants)
+        ]
+
+    def match_applies_to(self, found: set) -> List[str]:
+        applies = [
+            audience
+            for audience, terms in self.applies_to.items()
+            if any(t in found for t in terms)
+        ]
+        return applies or [self.applies_to_default]
+
+    def match_table(self, found: set) -> Optional[str]:
+        for table in self.tables:
+            if all(any(t in found for t in group) for group in table["all_of"]):
+                return table["name"]
+        return None
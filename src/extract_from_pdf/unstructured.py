@@ -1,13 +1,195 @@
+import hashlib
+import json
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict, List, Optional
+
 from unstructured.partition.pdf import partition_pdf
+from unstructured.staging.base import elements_from_dicts
+
+PDF_FILE = "QCDT-2023.pdf"
+CACHE_DIR = ".extract_cache/unstructured"
+ELEMENTS_FILE = "qcdt_elements.jsonl"
+PARTITION_PARAMS = {
+    "strategy": "hi_res",
+    "infer_table_structure": True,
+    "include_metadata": True,
+}
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha1()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def partition_cached(filename: str, cache_dir: str = CACHE_DIR, **params):
+    """
+    partition_pdf có cache theo hash nội dung file + tham số:
+    PDF không đổi thì không chạy lại hi_res.
+    """
+    key = hashlib.sha1(
+        (file_hash(filename) + json.dumps(params, sort_keys=True)).encode()
+    ).hexdigest()
+    cache_path = os.path.join(cache_dir, f"{key}.json")
+
+    if os.path.exists(cache_path):
+        print(f"♻️  Dùng lại kết quả partition đã cache: {cache_path}")
+        with open(cache_path, "r", encoding="utf-8") as f:
+            return elements_from_dicts(json.load(f))
+
+    elements = partition_pdf(filename=filename, **params)
+    os.makedirs(cache_dir, exist_ok=True)
+    with open(cache_path, "w", encoding="utf-8") as f:
+        json.dump([el.to_dict() for el in elements], f, ensure_ascii=False)
+    return elements
+
+
+def page_needs_hi_res(page) -> bool:
+    """Trang có ảnh hoặc bảng (pdfplumber) mới cần layout model hi_res"""
+    return bool(page.images) or bool(page.find_tables())
+
+
+def plan_page_ranges(pdf_path: str, pages_per_task: int, fast_fallback: bool = True) -> List[Dict]:
+    """
+    Chia PDF thành các dải trang liên tiếp [start, end) cùng strategy,
+    mỗi dải tối đa pages_per_task trang. Với fast_fallback, trang không có
+    bảng / ảnh dùng strategy "fast".
+    """
+    import pdfplumber
+
+    with pdfplumber.open(pdf_path) as pdf:
+        strategies = []
+        for page in pdf.pages:
+            strategies.append("hi_res" if not fast_fallback or page_needs_hi_res(page) else "fast")
+            page.close()
+
+    ranges = []
+    for page_no, strategy in enumerate(strategies):
+        last = ranges[-1] if ranges else None
+        if last and last["strategy"] == strategy and page_no - last["start"] < pages_per_task:
+            last["end"] = page_no + 1
+        else:
+            ranges.append({"start": page_no, "end": page_no + 1, "strategy": strategy})
+    return ranges
+
+
+def _partition_range(task) -> Dict:
+    """Worker: tách dải trang ra PDF tạm rồi partition, đánh lại số trang gốc"""
+    from PyPDF2 import PdfReader, PdfWriter
+
+    pdf_path, page_range, params = task
+    t0 = time.perf_counter()
+    reader = PdfReader(pdf_path)
+    writer = PdfWriter()
+    for page_no in range(page_range["start"], page_range["end"]):
+        writer.add_page(reader.pages[page_no])
+
+    params = dict(params, strategy=page_range["strategy"])
+    if page_range["strategy"] != "hi_res":
+        params.pop("infer_table_structure", None)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        part_path = os.path.join(tmp, "part.pdf")
+        with open(part_path, "wb") as f:
+            writer.write(f)
+        elements = partition_pdf(filename=part_path, **params)
+
+    dicts = []
+    for el in elements:
+        d = el.to_dict()
+        metadata = d.setdefault("metadata", {})
+        metadata["page_number"] = (metadata.get("page_number") or 1) + page_range["start"]
+        metadata["filename"] = os.path.basename(pdf_path)
+        dicts.append(d)
+    return {"range": page_range, "elements": dicts, "seconds": time.perf_counter() - t0}
+
+
+def partition_parallel(
+    pdf_path: str,
+    output_path: str = ELEMENTS_FILE,
+    workers: Optional[int] = None,
+    pages_per_task: int = 4,
+    fast_fallback: bool = True,
+    **params,
+) -> Dict:
+    """
+    Partition PDF song song theo dải trang (process pool). Element được ghi
+    ra JSON Lines ngay khi từng dải xong, mỗi dòng là el.to_dict() (kèm
+    metadata.page_number, metadata.text_as_html cho bảng) và "seq" để sắp
+    lại đúng thứ tự văn bản. Trả về thống kê.
+    """
+    params = {**PARTITION_PARAMS, **params}
+    ranges = plan_page_ranges(pdf_path, pages_per_task, fast_fallback)
+    tasks = [(pdf_path, r, params) for r in ranges]
+    workers = workers or os.cpu_count() or 1
+
+    stats = {"tasks": len(tasks), "hi_res_pages": 0, "fast_pages": 0, "elements": 0}
+    for r in ranges:
+        key = "hi_res_pages" if r["strategy"] == "hi_res" else "fast_pages"
+        stats[key] += r["end"] - r["start"]
+    print(
+        f"📄 {pdf_path}: {stats['hi_res_pages']} trang hi_res, {stats['fast_pages']} trang fast, "
+        f"{len(tasks)} task, {workers} process"
+    )
+
+    t0 = time.perf_counter()
+    with open(output_path, "w", encoding="utf-8") as out, ProcessPoolExecutor(workers) as pool:
+        futures = [pool.submit(_partition_range, task) for task in tasks]
+        for done, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            r = result["range"]
+            for i, d in enumerate(result["elements"]):
+                d["seq"] = [r["start"], i]
+                out.write(json.dumps(d, ensure_ascii=False) + "\n")
+            out.flush()
+            stats["elements"] += len(result["elements"])
+            print(
+                f"   [{done}/{len(tasks)}] trang {r['start'] + 1}-{r['end']} ({r['strategy']}): "
+                f"{len(result['elements'])} element, {result['seconds']:.1f}s"
+            )
+    stats["seconds"] = time.perf_counter() - t0
+    print(f"✅ {stats['elements']} element -> {output_path} ({stats['seconds']:.1f}s)")
+    return stats
+
+
+def load_elements(path: str = ELEMENTS_FILE):
+    """Đọc lại file JSON Lines theo thứ tự văn bản, trả về Element của unstructured"""
+    with open(path, "r", encoding="utf-8") as f:
+        dicts = [json.loads(line) for line in f]
+    dicts.sort(key=lambda d: d.pop("seq"))
+    return elements_from_dicts(dicts)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Partition PDF bằng unstructured, song song theo trang")
+    parser.add_argument("--pdf", default=PDF_FILE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--pages-per-task", type=int, default=4)
+    parser.add_argument("--no-fast-fallback", action="store_true", help="Dùng hi_res cho mọi trang")
+    parser.add_argument("--serial", action="store_true", help="Chạy cả file một lần (có cache)")
+    args = parser.parse_args()
+
+    if args.serial:
+        elements = partition_cached(args.pdf, **PARTITION_PARAMS)
+    else:
+        partition_parallel(
+            args.pdf,
+            workers=args.workers,
+            pages_per_task=args.pages_per_task,
+            fast_fallback=not args.no_fast_fallback,
+        )
+        elements = load_elements()
 
-elements = partition_pdf(
-    filename="QCDT-2023.pdf",
-    strategy="hi_res",
-    infer_table_structure=True,
-    include_metadata=True,
-)
-
-# Lưu lại text đã tách
-text = "\n".join([el.text for el in elements if el.text])
-with open("qcdt_text.txt", "w", encoding="utf-8") as f:
-    f.write(text)
+    # Lưu lại text đã tách
+    with open("qcdt_text.txt", "w", encoding="utf-8") as f:
+        for i, el in enumerate(el for el in elements if el.text):
+            if i:
+                f.write("\n")
+            f.write(el.text)
@@ -1,34 +1,293 @@
-import pandas as pd
-import fasttext
-import fasttext.util
+import os
+
 import numpy as np
-from sklearn.metrics.pairwise import cosine_similarity
 
-# 1. Tải model fastText đã huấn luyện sẵn (có thể dùng model nhỏ)
-fasttext.util.download_model('vi', if_exists='ignore')  # tiếng Việt
-ft = fasttext.load_model('cc.vi.300.bin')
+import instrument
+from ann_index import INDEX_META_FILE, build_index, load_index
+from embedding_store import load_or_build, model_fingerprint, text_hash
+from numeric_lookup import CHUNKS_PATH, NumericLookup
+from process_data import clean_text
+from query_cache import LRUCache
+
+MODEL_PATH = "cc.vi.300.bin"
+DATASET_PATH = "../clean_dataset.csv"  # có cột 'questions' và 'answers'
+EMBEDDING_STORE_DIR = "embedding_store"
+INDEX_DIR = "ann_index"
+INDEX_BACKEND = "flat"
+
+
+class QAEngine:
+    """
+    Engine hỏi đáp fastText, mọi thành phần đều được khởi tạo lười (lazy):
+      - model: chỉ load khi cần embed (query mới hoặc build lại store)
+      - df: đọc CSV khi cần trả về câu trả lời
+      - embeddings / index: mở từ đĩa (mmap / index build offline) nếu có
+    Worker chỉ cần retrieval từ index dựng sẵn sẽ không phải load model
+    cho tới câu hỏi đầu tiên.
+    """
+
+    def __init__(
+        self,
+        model_path: str = MODEL_PATH,
+        dataset_path: str = DATASET_PATH,
+        store_dir: str = EMBEDDING_STORE_DIR,
+        index_dir: str = INDEX_DIR,
+        index_backend: str = INDEX_BACKEND,
+        reduced_dim: int = None,
+        cache_items: int = 10_000,
+        cache_bytes: int = 64 * 1024 * 1024,
+        chunks_path: str = CHUNKS_PATH,
+    ):
+        self.model_path = model_path
+        self.dataset_path = dataset_path
+        self.store_dir = store_dir
+        self.index_dir = index_dir
+        self.index_backend = index_backend
+        self.reduced_dim = reduced_dim
+        self.chunks_path = chunks_path  # None: tắt tra số trực tiếp
+
+        self._model = None
+        self._df = None
+        self._embeddings = None
+        self._index = None
+        self._lookup = None
+
+        # Cache theo câu hỏi đã chuẩn hóa (bỏ lời chào, tên, MSSV...)
+        self.vector_cache = LRUCache(cache_items, cache_bytes)
+        self.answer_cache = LRUCache(cache_items, cache_bytes)
+
+    # ---------- model ----------
+
+    @property
+    def active_model_path(self) -> str:
+        """Đường dẫn model thực sự dùng (model rút gọn nếu có reduced_dim)"""
+        if self.reduced_dim:
+            root, ext = os.path.splitext(self.model_path)
+            return f"{root.rsplit('.', 1)[0]}.{self.reduced_dim}{ext}"
+        return self.model_path
+
+    def _ensure_model_file(self):
+        """Tải model gốc và tạo model rút gọn (lưu ra đĩa) nếu chưa có"""
+        import fasttext
+        import fasttext.util
+
+        if os.path.exists(self.active_model_path):
+            return
+
+        if not os.path.exists(self.model_path):
+            fasttext.util.download_model("vi", if_exists="ignore")  # tiếng Việt
+
+        if self.reduced_dim:
+            print(f"🔧 Đang rút gọn model xuống {self.reduced_dim} chiều...")
+            ft = fasttext.load_model(self.model_path)
+            fasttext.util.reduce_model(ft, self.reduced_dim)
+            ft.save_model(self.active_model_path)
+
+    @property
+    def model(self):
+        if self._model is None:
+            import fasttext
+
+            self._ensure_model_file()
+            with instrument.stage("load_model"):
+                self._model = fasttext.load_model(self.active_model_path)
+        return self._model
+
+    @property
+    def model_key(self) -> str:
+        self._ensure_model_file()
+        return model_fingerprint(self.active_model_path)
+
+    def get_vector(self, text):
+        return self.model.get_sentence_vector(text)
+
+    @staticmethod
+    def cache_key(question) -> str:
+        """Khóa cache: câu hỏi đã chuẩn hóa, rỗng thì dùng nguyên văn"""
+        return clean_text(question) or str(question)
+
+    def embed_query(self, question):
+        """
+        Vector của câu hỏi, có LRU cache theo dạng chuẩn hóa. Câu hỏi được
+        embed nguyên văn như cột questions trong embedding store (clean_text
+        chỉ dùng làm khóa), fastText không nhận xuống dòng.
+        """
+        key = self.cache_key(question)
+        vector = self.vector_cache.get(key)
+        if vector is None:
+            instrument.count("queries_embedded")
+            vector = self.get_vector(" ".join(str(question).splitlines()))
+            self.vector_cache.put(key, vector)
+        else:
+            instrument.count("vector_cache_hits")
+        return vector
+
+    def cache_stats(self):
+        """Bộ đếm hit/miss của các cache (dùng cho monitoring)"""
+        return {
+            "vector_cache": self.vector_cache.stats(),
+            "answer_cache": self.answer_cache.stats(),
+        }
+
+    # ---------- dataset / index ----------
+
+    @property
+    def df(self):
+        if self._df is None:
+            import pandas as pd
+
+            with instrument.stage("load_dataset"):
+                self._df = pd.read_csv(self.dataset_path)
+                instrument.count("dataset_rows", len(self._df))
+        return self._df
+
+    @property
+    def embeddings(self):
+        # Embedding được lưu trên đĩa (mmap), chỉ embed lại những câu hỏi đã thay đổi
+        if self._embeddings is None:
+            questions = self.df["questions"].astype(str).tolist()
+            with instrument.stage("embeddings"):
+                self._embeddings = load_or_build(
+                    self.store_dir,
+                    questions,
+                    self.get_vector,
+                    model_key=self.model_key,
+                )
+        return self._embeddings
+
+    @property
+    def index(self):
+        # "flat" (quét toàn bộ, chính xác) hoặc "ivf" (xấp xỉ);
+        # index build offline bằng `python ann_index.py` được load từ index_dir
+        if self._index is None:
+            if os.path.exists(os.path.join(self.index_dir, INDEX_META_FILE)):
+                with instrument.stage("load_index"):
+                    index = load_index(self.index_dir)
+                # Index cũ (dataset hoặc model đã đổi) thì build lại thay vì trả sai dòng
+                row_hashes = [text_hash(q) for q in self.df["questions"].astype(str)]
+                if len(index) == len(row_hashes) and index.matches(row_hashes, self.model_key):
+                    self._index = index
+                    return self._index
+                print("⚠️ Index offline không khớp dataset / model, build lại trong bộ nhớ")
+            embeddings = self.embeddings
+            with instrument.stage("build_index"):
+                self._index = build_index(self.index_backend, embeddings)
+        return self._index
+
+    @property
+    def lookup(self):
+        """Bảng tra số (điểm chữ, xếp loại, năm học) dựng từ chunk bảng của quy chế"""
+        if self._lookup is None:
+            if self.chunks_path and os.path.exists(self.chunks_path):
+                with instrument.stage("load_lookup"):
+                    self._lookup = NumericLookup.from_json(self.chunks_path)
+            else:
+                self._lookup = NumericLookup({})
+        return self._lookup
+
+    def warmup(self, load_model: bool = True):
+        """Khởi tạo trước mọi thành phần (dùng cho process chạy lâu dài)"""
+        _ = self.index
+        _ = self.lookup
+        if load_model:
+            _ = self.model
+        return self
+
+    # ---------- hỏi đáp ----------
+
+    def semantic_qa(self, question, threshold=0.7):
+        # Câu tra số trả lời thẳng từ bảng, không cần embed
+        instrument.count("questions")
+        hit = self.lookup.answer(question)
+        if hit is not None:
+            instrument.count("lookup_hits")
+            return hit["answer"]
+
+        answer_key = (self.cache_key(question), threshold)
+        answer = self.answer_cache.get(answer_key)
+        if answer is not None:
+            instrument.count("answer_cache_hits")
+            return answer
+
+        scores, ids = self.index.search(self.embed_query(question), k=1)
+        best_idx = ids[0, 0]
+        best_score = scores[0, 0]
+
+        if best_idx >= 0 and best_score >= threshold:
+            answer = self.df.iloc[best_idx]["answers"]
+        else:
+            answer = "không biết"
+        self.answer_cache.put(answer_key, answer)
+        return answer
+
+    def semantic_qa_batch(self, questions, k=1, threshold=0.7):
+        """
+        Trả lời một list câu hỏi bằng 1 phép nhân ma trận + argpartition top-k.
+        Trả về list (theo thứ tự questions), mỗi phần tử là list các
+        {"index", "answer", "score"} xếp giảm dần theo score, chỉ giữ score >= threshold.
+        Câu tra số được trả lời từ bảng: một kết quả {"index": -1, "answer",
+        "score": 1.0, "source"}, không đưa vào phép nhân ma trận.
+        """
+        if len(questions) == 0:
+            return []
+
+        with instrument.stage("semantic_qa_batch", batch=len(questions)):
+            return self._semantic_qa_batch(questions, k, threshold)
+
+    def _semantic_qa_batch(self, questions, k, threshold):
+        instrument.count("questions", len(questions))
+        results = [None] * len(questions)
+        pending = []
+        for pos, q in enumerate(questions):
+            hit = self.lookup.answer(q)
+            if hit is not None:
+                instrument.count("lookup_hits")
+                results[pos] = [{"index": -1, "answer": hit["answer"], "score": 1.0, "source": hit["source"]}]
+            else:
+                pending.append(pos)
+        if not pending:
+            return results
+
+        q_matrix = np.vstack([self.embed_query(questions[pos]) for pos in pending])
+        top_scores, top = self.index.search(q_matrix, k=k)
+
+        answers = self.df["answers"].to_numpy()
+        for pos, idxs, scores in zip(pending, top, top_scores):
+            results[pos] = [
+                {"index": int(i), "answer": answers[i], "score": float(s)}
+                for i, s in zip(idxs, scores)
+                if i >= 0 and s >= threshold
+            ]
+        return results
+
+
+_default_engine = None
+
+
+def get_engine() -> QAEngine:
+    """Engine mặc định dùng chung trong process"""
+    global _default_engine
+    if _default_engine is None:
+        _default_engine = QAEngine()
+    return _default_engine
 
-# 2. Đọc dataset
-df = pd.read_csv("../clean_dataset.csv")  # có cột 'question' và 'answer'
 
-# 3. Tạo embedding cho tất cả câu hỏi trong dataset
 def get_vector(text):
-    return ft.get_sentence_vector(text)
+    return get_engine().get_vector(text)
 
-question_embeddings = np.vstack([get_vector(q) for q in df["questions"]])
 
-# 4. Hàm tìm câu trả lời
 def semantic_qa(question, threshold=0.7):
-    q_vec = get_vector(question).reshape(1, -1)
-    sims = cosine_similarity(q_vec, question_embeddings)[0]
-    best_idx = np.argmax(sims)
-    best_score = sims[best_idx]
-    
-    if best_score >= threshold:
-        return df.iloc[best_idx]["answers"]
-    else:
-        return "không biết"
-
-# 5. Test
-print(semantic_qa("thưa thầy, em tên Phan Thanh Tùng , mssv 20164554 , Thầy cho em hỏi môn An Toàn Hệ Thống, mã học phần IT4910, có học phần tương đương là môn nào ạ?Em cám ơn.?"))         # nên khớp với "Thủ đô của Việt Nam là gì?"
-print(semantic_qa("Tổng thống Mỹ hiện nay?"))  # nếu dataset chưa có thì ra "không biết"
+    return get_engine().semantic_qa(question, threshold)
+
+
+def semantic_qa_batch(questions, k=1, threshold=0.7):
+    return get_engine().semantic_qa_batch(questions, k, threshold)
+
+
+# Test
+if __name__ == "__main__":
+    # Đo thời gian / bộ nhớ: --profile[=PATH], --cprofile=PATH
+    instrument.enable_from_argv("fastext")
+    print(semantic_qa("thưa thầy, em tên Phan Thanh Tùng , mssv 20164554 , Thầy cho em hỏi môn An Toàn Hệ Thống, mã học phần IT4910, có học phần tương đương là môn nào ạ?Em cám ơn.?"))         # nên khớp với "Thủ đô của Việt Nam là gì?"
+    print(semantic_qa("Tổng thống Mỹ hiện nay?"))  # nếu dataset chưa có thì ra "không biết"
+    instrument.disable()
@@ -0,0 +1,192 @@
+import json
+import re
+import unicodedata
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from ann_index import normalize_rows
+
+CHUNKS_PATH = "extract_from_pdf/quy_che_rag_data.json"
+REFS_PATH = "extract_from_pdf/quy_che_rag_data_refs.json"
+
+TOKEN_RE = re.compile(r"\w+")
+# applies_to của chunk áp dụng cho mọi đối tượng (applies_to_default của tagger)
+APPLIES_TO_ALL = "tất cả"
+
+
+def tokenize(text: str, bigrams: bool = True) -> List[str]:
+    """Tách âm tiết tiếng Việt (lowercase, NFC); thêm bigram âm tiết để bắt từ ghép"""
+    syllables = TOKEN_RE.findall(unicodedata.normalize("NFC", text).lower())
+    if not bigrams:
+        return syllables
+    return syllables + [f"{a}_{b}" for a, b in zip(syllables, syllables[1:])]
+
+
+class HybridRetriever:
+    """
+    Retrieval trên chunks Quy chế: BM25 (inverted index, posting list dạng
+    mảng CSR) + embedding (tùy chọn), trộn điểm và lọc trước theo metadata
+    applies_to / chuong.
+    """
+
+    def __init__(
+        self,
+        chunks: List[Dict],
+        embed_fn: Optional[Callable[[str], np.ndarray]] = None,
+        k1: float = 1.5,
+        b: float = 0.75,
+        bigrams: bool = True,
+        references: Optional[Dict[str, List[str]]] = None,
+    ):
+        self.chunks = chunks
+        # chunk id -> các chunk id được tham chiếu (ref_graph.py, "edges")
+        self.references = references or {}
+        self.embed_fn = embed_fn
+        self.k1 = k1
+        self.b = b
+        self.bigrams = bigrams
+        self.n_docs = len(chunks)
+
+        self._build_inverted_index()
+        self._build_filters()
+        self.dense = None
+        if embed_fn is not None:
+            self.dense = normalize_rows(np.vstack([embed_fn(c["text"]) for c in chunks]))
+
+    @classmethod
+    def from_json(cls, path: str = CHUNKS_PATH, **kwargs) -> "HybridRetriever":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls(json.load(f)["chunks"], **kwargs)
+
+    @staticmethod
+    def load_references(path: str = REFS_PATH) -> Dict[str, List[str]]:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)["edges"]
+
+    def _build_inverted_index(self):
+        vocab: Dict[str, int] = {}
+        postings: List[Dict[int, int]] = []
+        doc_len = np.zeros(self.n_docs, dtype=np.float32)
+        for doc_id, chunk in enumerate(self.chunks):
+            tokens = tokenize(chunk["text"], self.bigrams)
+            doc_len[doc_id] = len(tokens)
+            for token in tokens:
+                term_id = vocab.setdefault(token, len(vocab))
+                if term_id == len(postings):
+                    postings.append({})
+                postings[term_id][doc_id] = postings[term_id].get(doc_id, 0) + 1
+
+        # Posting lists dạng CSR: docs/tfs của term t nằm trong [offsets[t], offsets[t+1])
+        lengths = np.array([len(p) for p in postings], dtype=np.int64)
+        self.offsets = np.concatenate([[0], np.cumsum(lengths)])
+        self.post_docs = np.fromiter(
+            (d for p in postings for d in p), dtype=np.int32, count=int(lengths.sum())
+        )
+        self.post_tfs = np.fromiter(
+            (tf for p in postings for tf in p.values()),
+            dtype=np.float32,
+            count=int(lengths.sum()),
+        )
+        self.vocab = vocab
+        df = lengths.astype(np.float32)
+        self.idf = np.log1p((self.n_docs - df + 0.5) / (df + 0.5))
+        self.doc_len = doc_len
+        self.avg_len = float(doc_len.mean()) if self.n_docs else 0.0
+
+    def _build_filters(self):
+        """Mask boolean cho từng giá trị applies_to / chuong"""
+        self.filters: Dict[str, Dict[str, np.ndarray]] = {"applies_to": {}, "chuong": {}}
+        for doc_id, chunk in enumerate(self.chunks):
+            meta = chunk["metadata"]
+            values = {
+                "applies_to": meta.get("applies_to") or [],
+                "chuong": [meta["chuong"]] if meta.get("chuong") else [],
+            }
+            for key, vals in values.items():
+                for v in vals:
+                    mask = self.filters[key].setdefault(v, np.zeros(self.n_docs, dtype=bool))
+                    mask[doc_id] = True
+
+    def bm25_scores(self, query: str) -> np.ndarray:
+        scores = np.zeros(self.n_docs, dtype=np.float32)
+        norm = self.k1 * (1 - self.b + self.b * self.doc_len / max(self.avg_len, 1e-9))
+        for token in set(tokenize(query, self.bigrams)):
+            term_id = self.vocab.get(token)
+            if term_id is None:
+                continue
+            start, end = self.offsets[term_id], self.offsets[term_id + 1]
+            docs = self.post_docs[start:end]
+            tfs = self.post_tfs[start:end]
+            # doc trong một posting list là duy nhất nên cộng trực tiếp được
+            scores[docs] += self.idf[term_id] * tfs * (self.k1 + 1) / (tfs + norm[docs])
+        return scores
+
+    def dense_scores(self, query: str) -> Optional[np.ndarray]:
+        if self.dense is None:
+            return None
+        return self.dense @ normalize_rows(self.embed_fn(query))[0]
+
+    def _mask(self, applies_to=None, chuong=None) -> np.ndarray:
+        mask = np.ones(self.n_docs, dtype=bool)
+        for key, value in (("applies_to", applies_to), ("chuong", chuong)):
+            if value is None:
+                continue
+            values = [value] if isinstance(value, str) else list(value)
+            if key == "applies_to" and APPLIES_TO_ALL not in values:
+                # Quy định chung luôn áp dụng cho đối tượng được lọc
+                values.append(APPLIES_TO_ALL)
+            allowed = np.zeros(self.n_docs, dtype=bool)
+            for v in values:
+                allowed |= self.filters[key].get(v, np.zeros(self.n_docs, dtype=bool))
+            mask &= allowed
+        return mask
+
+    @staticmethod
+    def _min_max(scores: np.ndarray, mask: np.ndarray) -> np.ndarray:
+        if not mask.any():
+            return scores
+        lo, hi = scores[mask].min(), scores[mask].max()
+        return (scores - lo) / (hi - lo) if hi > lo else np.zeros_like(scores)
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        alpha: float = 0.5,
+        applies_to=None,
+        chuong=None,
+    ) -> List[Dict]:
+        """
+        Top-k chunks cho query. alpha: trọng số BM25 khi trộn với embedding
+        (đã chuẩn hóa min-max); không có embedding thì chỉ dùng BM25.
+        applies_to / chuong: chuỗi hoặc list giá trị cho phép; lọc applies_to
+        luôn giữ cả chunk "tất cả".
+        Mỗi hit kèm "references": id các chunk mà nó tham chiếu tới.
+        """
+        mask = self._mask(applies_to, chuong)
+        bm25 = self.bm25_scores(query)
+        dense = self.dense_scores(query)
+        if dense is None:
+            fused = bm25
+        else:
+            fused = alpha * self._min_max(bm25, mask) + (1 - alpha) * self._min_max(dense, mask)
+
+        fused = np.where(mask, fused, -np.inf)
+        k = min(k, int(mask.sum()))
+        if k <= 0:
+            return []
+        top = np.argpartition(-fused, k - 1)[:k]
+        top = top[np.argsort(-fused[top])]
+        return [
+            {
+                "id": self.chunks[i]["id"],
+                "score": float(fused[i]),
+                "bm25": float(bm25[i]),
+                "dense": None if dense is None else float(dense[i]),
+                "metadata": self.chunks[i]["metadata"],
+                "text": self.chunks[i]["text"],
+                "references": self.references.get(self.chunks[i]["id"], []),
+            }
+            for i in top
+        ]
@@ -0,0 +1,262 @@
+import atexit
+import cProfile
+import functools
+import json
+import os
+import resource
+import sys
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+PROFILE_PATH = "profile.jsonl"
+
+
+def rss_peak_mb() -> float:
+    # ru_maxrss tính bằng KB trên Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+class Profiler:
+    """
+    Đo thời gian / bộ nhớ theo stage, ghi mỗi sự kiện thành một dòng JSON:
+      - stage: {"event": "stage", "stage": "extract/chunk", "seconds",
+        "cpu_seconds", "peak_mb" (tracemalloc, chỉ bộ nhớ cấp phát qua
+        Python / numpy), "rss_peak_mb", "counters", ...}
+      - summary khi close(): tổng thời gian, counters cộng dồn
+    Stage lồng nhau được nối tên bằng "/" (stack riêng cho từng thread),
+    counters được cộng vào stage trong cùng đang mở và vào tổng.
+    cprofile_path: dump cProfile (pstats) của cả lần chạy.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        output: Optional[str] = PROFILE_PATH,
+        trace_memory: bool = True,
+        cprofile_path: Optional[str] = None,
+    ):
+        self.name = name
+        self.output = output
+        self.trace_memory = trace_memory
+        self.cprofile_path = cprofile_path
+        self.counters: Dict[str, float] = {}
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._stream = None
+        self._cprofile = None
+        self._start = time.perf_counter()
+        self._closed = False
+
+        if output == "-":
+            self._stream = sys.stderr
+        elif output:
+            self._stream = open(output, "a", encoding="utf-8")
+        if trace_memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        if cprofile_path:
+            self._cprofile = cProfile.Profile()
+            self._cprofile.enable()
+
+    @property
+    def _stack(self) -> List[Dict]:
+        if not hasattr(self._local, "stack"):
+            self._local.stack = []
+        return self._local.stack
+
+    def emit(self, event: str, **fields):
+        if self._stream is None:
+            return
+        record = {"event": event, "run": self.name, "pid": os.getpid(), "time": round(time.time(), 3)}
+        record.update(fields)
+        line = json.dumps(record, ensure_ascii=False, default=str) + "\n"
+        with self._lock:
+            self._stream.write(line)
+            self._stream.flush()
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        frame = {
+            "name": "/".join([f["name"] for f in self._stack] + [name]),
+            "counters": {},
+            "child_peak": 0,
+            "start": time.perf_counter(),
+            "cpu": time.process_time(),
+        }
+        if self.trace_memory:
+            current, peak = tracemalloc.get_traced_memory()
+            if self._stack:
+                # reset_peak xóa đỉnh của stage cha, giữ lại trước khi reset
+                self._stack[-1]["child_peak"] = max(self._stack[-1]["child_peak"], peak)
+            frame["mem_start"] = current
+            tracemalloc.reset_peak()
+        self._stack.append(frame)
+        try:
+            yield frame["counters"]
+        finally:
+            self._stack.pop()
+            record = {
+                "stage": frame["name"],
+                "seconds": round(time.perf_counter() - frame["start"], 6),
+                "cpu_seconds": round(time.process_time() - frame["cpu"], 6),
+            }
+            if self.trace_memory:
+                peak = max(tracemalloc.get_traced_memory()[1], frame["child_peak"])
+                record["peak_mb"] = round((peak - frame["mem_start"]) / 2**20, 3)
+                if self._stack:
+                    self._stack[-1]["child_peak"] = max(self._stack[-1]["child_peak"], peak)
+            record["rss_peak_mb"] = round(rss_peak_mb(), 1)
+            if frame["counters"]:
+                record["counters"] = frame["counters"]
+            record.update(fields)
+            self.emit("stage", **record)
+
+    def timed(self, name: Optional[str] = None):
+        """Decorator: mỗi lần gọi hàm là một stage (mặc định tên hàm)"""
+
+        def decorator(fn):
+            stage_name = name or fn.__name__
+
+            @functools.wraps(fn)
+            def wrapper(*args, **kwargs):
+                with self.stage(stage_name):
+                    return fn(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    def count(self, name: str, n: float = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + n
+        if self._stack:
+            stage_counters = self._stack[-1]["counters"]
+            stage_counters[name] = stage_counters.get(name, 0) + n
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        if self._cprofile is not None:
+            self._cprofile.disable()
+            self._cprofile.dump_stats(self.cprofile_path)
+        self.emit(
+            "summary",
+            seconds=round(time.perf_counter() - self._start, 6),
+            rss_peak_mb=round(rss_peak_mb(), 1),
+            counters=self.counters,
+            cprofile=self.cprofile_path,
+        )
+        if self.trace_memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        if self._stream not in (None, sys.stderr):
+            self._stream.close()
+
+
+class NullProfiler(Profiler):
+    """Profiler tắt: stage / count gần như không tốn gì"""
+
+    def __init__(self):
+        self.name = None
+        self.counters = {}
+
+    @contextmanager
+    def stage(self, name: str, **fields):
+        yield {}
+
+    def timed(self, name: Optional[str] = None):
+        return lambda fn: fn
+
+    def count(self, name: str, n: float = 1):
+        pass
+
+    def emit(self, event: str, **fields):
+        pass
+
+    def close(self):
+        pass
+
+
+_profiler: Profiler = NullProfiler()
+
+
+def get_profiler() -> Profiler:
+    return _profiler
+
+
+def enable(name: str, output: Optional[str] = PROFILE_PATH, **kwargs) -> Profiler:
+    """Bật profiler dùng chung trong process (stage / count / timed ở mọi module ghi vào đây)"""
+    global _profiler
+    _profiler.close()
+    _profiler = Profiler(name, output, **kwargs)
+    # Script kết thúc bằng sys.exit() giữa chừng vẫn ghi được summary
+    atexit.register(_profiler.close)
+    return _profiler
+
+
+def disable():
+    """Đóng profiler hiện tại (ghi summary, dump cProfile)"""
+    global _profiler
+    _profiler.close()
+    _profiler = NullProfiler()
+
+
+def stage(name: str, **fields):
+    return _profiler.stage(name, **fields)
+
+
+def count(name: str, n: float = 1):
+    _profiler.count(name, n)
+
+
+def timed(name: Optional[str] = None):
+    """
+    Decorator cấp module: tra profiler lúc gọi (không phải lúc import),
+    nên hàm được trang trí vẫn đo khi profiler được bật sau đó
+    """
+
+    def decorator(fn):
+        stage_name = name or fn.__name__
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with _profiler.stage(stage_name):
+                return fn(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
+
+
+def add_profile_args(parser):
+    """Thêm --profile [PATH] và --cprofile PATH vào argparse parser"""
+    parser.add_argument(
+        "--profile", nargs="?", const=PROFILE_PATH, default=None, metavar="PATH",
+        help=f'Ghi số đo từng stage ra JSON Lines (mặc định {PROFILE_PATH}, "-" = stderr)',
+    )
+    parser.add_argument("--cprofile", default=None, metavar="PATH", help="Dump cProfile (pstats) ra PATH")
+
+
+def enable_from_args(name: str, args) -> Profiler:
+    """Bật profiler theo --profile / --cprofile đã parse (không có cờ nào thì giữ NullProfiler)"""
+    if args.profile is None and args.cprofile is None:
+        return _profiler
+    return enable(name, args.profile, cprofile_path=args.cprofile)
+
+
+def enable_from_argv(name: str, argv: Optional[List[str]] = None) -> Profiler:
+    """Như enable_from_args cho script đọc sys.argv trực tiếp: --profile, --profile=PATH, --cprofile=PATH"""
+    argv = sys.argv if argv is None else argv
+    output = cprofile_path = None
+    for arg in argv:
+        if arg == "--profile":
+            output = PROFILE_PATH
+        elif arg.startswith("--profile="):
+            output = arg.split("=", 1)[1]
+        elif arg.startswith("--cprofile="):
+            cprofile_path = arg.split("=", 1)[1]
+    if output is None and cprofile_path is None:
+        return _profiler
+    return enable(name, output, cprofile_path=cprofile_path)
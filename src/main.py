@@ -1,5 +1,242 @@
+import argparse
+import asyncio
+import json
+import math
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from fastext import QAEngine
+
+
+class LatencyMetrics:
+    """Lưu latency gần nhất theo endpoint, tính p50/p99"""
+
+    def __init__(self, window: int = 10_000):
+        self.window = window
+        self.samples = {}
+        self.counts = {}
+
+    def record(self, endpoint: str, seconds: float):
+        self.samples.setdefault(endpoint, deque(maxlen=self.window)).append(seconds)
+        self.counts[endpoint] = self.counts.get(endpoint, 0) + 1
+
+    def summary(self):
+        result = {}
+        for endpoint, samples in self.samples.items():
+            values = np.fromiter(samples, dtype=np.float64) * 1e3
+            result[endpoint] = {
+                "count": self.counts[endpoint],
+                "p50_ms": round(float(np.percentile(values, 50)), 3),
+                "p99_ms": round(float(np.percentile(values, 99)), 3),
+            }
+        return result
+
+
+def is_number(value) -> bool:
+    """Số JSON hữu hạn (bool không tính)"""
+    return isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+
+
+def is_positive_int(value) -> bool:
+    return isinstance(value, int) and not isinstance(value, bool) and value > 0
+
+
+class MicroBatcher:
+    """
+    Gom các câu hỏi /ask đến trong vài ms rồi chấm điểm một lần
+    bằng semantic_qa_batch (một phép nhân ma trận) trong thread pool.
+    """
+
+    def __init__(self, engine: QAEngine, executor, window_ms: float = 5, max_batch: int = 256):
+        self.engine = engine
+        self.executor = executor
+        self.window = window_ms / 1000
+        self.max_batch = max_batch
+        self.queue: asyncio.Queue = asyncio.Queue()
+        self.batch_sizes = deque(maxlen=1000)
+
+    async def submit(self, question: str):
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((question, future))
+        return await future
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = [await self.queue.get()]
+            deadline = loop.time() + self.window
+            while len(batch) < self.max_batch:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            questions = [q for q, _ in batch]
+            self.batch_sizes.append(len(batch))
+            try:
+                # threshold -1: lấy top-1 của mọi câu, từng request tự so ngưỡng
+                results = await loop.run_in_executor(
+                    self.executor, self.engine.semantic_qa_batch, questions, 1, -1.0
+                )
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result[0] if result else None)
+
+
+class QAServer:
+    """HTTP/JSON server tối giản trên asyncio: /ask, /ask_batch, /metrics"""
+
+    def __init__(self, engine: QAEngine, workers: int = 1, window_ms: float = 5, max_batch: int = 256):
+        self.engine = engine
+        # fastText không đảm bảo thread-safe, mặc định 1 worker embed
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.batcher = MicroBatcher(engine, self.executor, window_ms, max_batch)
+        self.metrics = LatencyMetrics()
+        self.routes = {
+            ("POST", "/ask"): self.handle_ask,
+            ("POST", "/ask_batch"): self.handle_ask_batch,
+            ("GET", "/metrics"): self.handle_metrics,
+        }
+
+    def route_name(self, method, path):
+        """Tên route dùng làm khóa metrics; path không khớp route gom chung vào "other" """
+        key = (method, path.split("?", 1)[0])
+        return f"{key[0]} {key[1]}" if key in self.routes else "other"
+
+    async def handle_ask(self, body):
+        question = body.get("question")
+        if not isinstance(question, str) or not question.strip():
+            return 400, {"error": "Thiếu trường 'question'"}
+        threshold = body.get("threshold", 0.7)
+        if not is_number(threshold):
+            return 400, {"error": "Trường 'threshold' phải là số"}
+        best = await self.batcher.submit(question)
+        if best is None or best["score"] < threshold:
+            return 200, {"answer": "không biết", "score": best["score"] if best else None}
+        response = {"answer": best["answer"], "score": best["score"], "index": best["index"]}
+        if "source" in best:  # trả lời từ bảng tra số
+            response["source"] = best["source"]
+        return 200, response
+
+    async def handle_ask_batch(self, body):
+        questions = body.get("questions")
+        if not isinstance(questions, list) or not all(isinstance(q, str) for q in questions):
+            return 400, {"error": "Trường 'questions' phải là list chuỗi"}
+        k = body.get("k", 1)
+        if not is_positive_int(k):
+            return 400, {"error": "Trường 'k' phải là số nguyên dương"}
+        threshold = body.get("threshold", 0.7)
+        if not is_number(threshold):
+            return 400, {"error": "Trường 'threshold' phải là số"}
+        results = await asyncio.get_running_loop().run_in_executor(
+            self.executor, self.engine.semantic_qa_batch, questions, k, threshold
+        )
+        return 200, {"results": results}
+
+    async def handle_metrics(self, body):
+        sizes = self.batcher.batch_sizes
+        return 200, {
+            "latency": self.metrics.summary(),
+            "avg_micro_batch": float(np.mean(sizes)) if sizes else 0.0,
+            "cache": self.engine.cache_stats(),
+        }
+
+    async def handle_connection(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, path, _ = request_line.decode("latin-1").split(" ", 2)
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                length = int(headers.get("content-length", 0))
+                raw = await reader.readexactly(length) if length else b""
+
+                start = time.perf_counter()
+                status, payload = await self.dispatch(method, path, raw)
+                self.metrics.record(self.route_name(method, path), time.perf_counter() - start)
+
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                    "Content-Type: application/json; charset=utf-8\r\n"
+                    f"Content-Length: {len(data)}\r\n\r\n".encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+                if headers.get("connection", "").lower() == "close":
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError, ValueError):
+            pass
+        finally:
+            writer.close()
+
+    async def dispatch(self, method, path, raw):
+        handler = self.routes.get((method, path.split("?", 1)[0]))
+        if handler is None:
+            return 404, {"error": f"Không có endpoint {method} {path}"}
+        try:
+            body = json.loads(raw) if raw else {}
+        except json.JSONDecodeError:
+            return 400, {"error": "Body không phải JSON hợp lệ"}
+        if not isinstance(body, dict):
+            return 400, {"error": "Body JSON phải là object"}
+        try:
+            return await handler(body)
+        except Exception as e:
+            return 500, {"error": str(e)}
+
+    async def serve(self, host: str, port: int):
+        # Load model + index một lần trước khi nhận request
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(self.executor, self.engine.warmup)
+        batcher_task = asyncio.create_task(self.batcher.run())
+
+        server = await asyncio.start_server(self.handle_connection, host, port)
+        print(f"🚀 QA server đang chạy tại http://{host}:{port} (/ask, /ask_batch, /metrics)")
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher_task.cancel()
+            self.executor.shutdown(wait=False)
+
+
 def main():
-    print("Hello from gr!")
+    parser = argparse.ArgumentParser(description="QA server (HTTP/JSON)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--batch-window-ms", type=float, default=5)
+    parser.add_argument("--max-batch", type=int, default=256)
+    parser.add_argument("--reduced-dim", type=int, default=None)
+    args = parser.parse_args()
+
+    engine = QAEngine(reduced_dim=args.reduced_dim)
+    server = QAServer(engine, args.workers, args.batch_window_ms, args.max_batch)
+    try:
+        asyncio.run(server.serve(args.host, args.port))
+    except KeyboardInterrupt:
+        print("\n👋 Đã dừng server")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,69 @@
+import argparse
+import json
+import subprocess
+import sys
+import time
+
+# Script con: đo thời gian + RSS đỉnh sau từng bước khởi động
+CHILD = """
+import json, resource, sys, time
+
+def rss_mb():
+    # ru_maxrss trên Linux tính bằng KB
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+opts = json.loads(sys.argv[1])
+report = []
+start = time.perf_counter()
+
+def mark(step):
+    report.append({"step": step, "seconds": round(time.perf_counter() - start, 4), "max_rss_mb": round(rss_mb(), 1)})
+
+import fastext
+mark("import fastext")
+
+engine = fastext.QAEngine(reduced_dim=opts["reduced_dim"])
+mark("QAEngine()")
+
+_ = engine.index
+mark("index sẵn sàng")
+
+if opts["query"]:
+    engine.semantic_qa(opts["query"])
+    mark("câu hỏi đầu tiên (load model)")
+
+print(json.dumps(report))
+"""
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Đo thời gian khởi động và RSS của QAEngine trong process mới"
+    )
+    parser.add_argument("--reduced-dim", type=int, default=None)
+    parser.add_argument(
+        "--query",
+        default="Thầy cho em hỏi môn An Toàn Hệ Thống có học phần tương đương là môn nào ạ?",
+        help="Câu hỏi đầu tiên; truyền chuỗi rỗng để chỉ đo phần retrieval",
+    )
+    args = parser.parse_args()
+
+    opts = {"reduced_dim": args.reduced_dim, "query": args.query}
+    wall_start = time.perf_counter()
+    out = subprocess.run(
+        [sys.executable, "-c", CHILD, json.dumps(opts)],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    wall = time.perf_counter() - wall_start
+    report = json.loads(out.stdout.strip().splitlines()[-1])
+
+    print(f"📊 Khởi động QAEngine (reduced_dim={args.reduced_dim})")
+    for row in report:
+        print(f"  - {row['step']:<32} {row['seconds']:>8.3f}s   RSS đỉnh {row['max_rss_mb']:>8.1f} MB")
+    print(f"  - Tổng thời gian process (gồm khởi động Python): {wall:.3f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+import json
+import re
+import unicodedata
+from bisect import bisect_right
+from typing import Dict, List, Optional
+
+from process_data import STUDENT_ID_PATTERN
+
+CHUNKS_PATH = "extract_from_pdf/quy_che_rag_data.json"
+
+# Bảng tra cứu -> table_name của chunk bảng (extract_special_tables) và từ
+# khóa nhận diện header khi bảng được tách tự động từ PDF (table_extract.py)
+TABLES = {
+    "grade": {"table_name": "quy_doi_diem", "header": ("thang 10",)},
+    "ranking": {"table_name": "xep_loai_hoc_luc", "header": ("gpa", "cpa")},
+    "year": {"table_name": "trinh_do_nam_hoc", "header": ("tc", "tín chỉ")},
+}
+
+# Cột đầu của một dòng bảng (cả ô): "9.5-10.0", "8.5–9.4", "<1.00", "≥128 TC"
+RANGE_RE = re.compile(
+    r"^\s*(<|≥|>=)?\s*(\d+(?:[.,]\d+)?)(?:\s*[-–]\s*(\d+(?:[.,]\d+)?))?\s*(?:tc|tín chỉ|điểm)?\s*$",
+    re.IGNORECASE,
+)
+HEADER_TOKEN_RE = re.compile(r"\w+")
+NUMBER = r"(?<![\w.,])(\d+(?:[.,]\d+)?)(?![\w]|[.,]\d)"
+NUMBER_RE = re.compile(NUMBER)
+# "thang 10", "hệ 4", "thang điểm 4": tên thang điểm, không phải giá trị cần tra
+SCALE_RE = re.compile(r"(?:thang|hệ)\s*(?:điểm\s*)?\d+")
+# Số âm ("-1", "âm 2"); dấu "-" giữa hai số ("8.5-9.4") là khoảng, không tính
+NEGATIVE_RE = re.compile(r"(?:(?<![\d.,])-|−|\bâm\s+)\s*\d")
+# Hỏi điều kiện / giới hạn ("cần bao nhiêu tín chỉ", "tối đa", "năm 3") chứ
+# không hỏi quy đổi một giá trị đã có: để tìm kiếm embedding trả lời
+REQUIREMENT_RE = re.compile(
+    r"cần\s+(?:bao nhiêu|đạt|có)|tối đa|tối thiểu|ít nhất|bao nhiêu\s+(?:tín chỉ|tc\b)"
+    r"|\bnăm\s+(?:thứ\s+)?\d|\bkỳ\s+\d"
+)
+# Giá trị phải đứng ngay cạnh đơn vị / từ khóa của bảng
+VALUE_RES = {
+    "year": re.compile(NUMBER + r"\s*(?:tín chỉ|tín|tc)\b"),
+    "ranking": re.compile(r"\b(?:cpa|gpa)\s*(?:là|=|:|được|đạt)?\s*" + NUMBER),
+    "grade": re.compile(
+        NUMBER + r"\s*điểm|\bđiểm\s*(?:học phần|thi|tổng kết)?\s*(?:là|=|:|được|đạt)?\s*" + NUMBER
+    ),
+}
+
+
+def _to_float(s: str) -> float:
+    return float(s.replace(",", "."))
+
+
+def header_matches(cell: Optional[str], phrases) -> bool:
+    """Ô header chứa một trong các cụm từ khóa theo nguyên token ("Số TC" có "tc", "STT" thì không)"""
+    tokens = " " + " ".join(HEADER_TOKEN_RE.findall(unicodedata.normalize("NFC", cell or "").lower())) + " "
+    return any(f" {phrase} " in tokens for phrase in phrases)
+
+
+def is_interval_table(rows: List[List[str]]) -> bool:
+    """
+    Mọi dòng có cột đầu là khoảng / ngưỡng / giá trị (RANGE_RE) kèm ít nhất
+    một cột giá trị, và có ít nhất một dòng là khoảng hoặc ngưỡng thật
+    (cột STT "1", "2", ... không phải bảng tra)
+    """
+    matches = [RANGE_RE.match(row[0] or "") if len(row) > 1 else None for row in rows]
+    return (
+        bool(matches)
+        and all(matches)
+        and any(m.group(1) or m.group(3) for m in matches)
+    )
+
+
+def parse_rows(chunk: Dict) -> List[List[str]]:
+    """Các dòng dữ liệu của chunk bảng: metadata["rows"] nếu có, không thì đọc dòng "- a → b" trong text"""
+    rows = chunk["metadata"].get("rows")
+    if rows:
+        return rows
+    return [
+        [cell.strip() for cell in line[2:].split("→")]
+        for line in chunk["text"].splitlines()
+        if line.startswith("- ") and "→" in line
+    ]
+
+
+class IntervalTable:
+    """
+    Bảng khoảng đã sắp xếp theo cận dưới: tra giá trị bằng bisect trên
+    mảng cận dưới, O(log n).
+    """
+
+    def __init__(self, name: str, rows: List[List[str]], source: Dict):
+        self.name = name
+        self.source = source
+        intervals = []
+        for row in rows:
+            m = RANGE_RE.match(row[0] or "")
+            if not m:
+                continue
+            op, low, high = m.groups()
+            # "a-b": cận trên có lấy; "<a": không lấy; "≥a": không có cận trên
+            if op == "<":
+                lower, upper, closed = float("-inf"), _to_float(low), False
+            elif op:
+                lower, upper, closed = _to_float(low), float("inf"), False
+            else:
+                lower = _to_float(low)
+                upper, closed = (_to_float(high) if high else lower), True
+            intervals.append((lower, upper, closed, row[0], row[1:]))
+        intervals.sort(key=lambda x: x[0])
+        self.lowers = [x[0] for x in intervals]
+        self.uppers = [x[1] for x in intervals]
+        self.closed = [x[2] for x in intervals]
+        self.labels = [x[3] for x in intervals]
+        self.values = [x[4] for x in intervals]
+
+    def __len__(self):
+        return len(self.lowers)
+
+    def lookup(self, value: float) -> Optional[Dict]:
+        i = bisect_right(self.lowers, value) - 1
+        if i < 0:
+            return None
+        # Ngoài khoảng (khe giữa hai dòng như 8.45, hoặc vượt dòng cuối)
+        if value > self.uppers[i] or (value == self.uppers[i] and not self.closed[i]):
+            return None
+        return {"range": self.labels[i], "values": self.values[i]}
+
+
+def classify(question: str) -> Optional[Dict]:
+    """
+    Phân loại rẻ (regex, không embed): câu hỏi có phải tra số trong bảng
+    điểm / xếp loại / trình độ năm học không. Trả về {"table", "value"} hoặc None.
+    Chỉ nhận khi chắc chắn: đúng một số, đứng ngay cạnh đơn vị / từ khóa
+    ("70 tín chỉ", "CPA 3.3", "7.2 điểm"), không âm, không phải câu hỏi điều
+    kiện / giới hạn; còn lại trả None để tìm kiếm embedding xử lý.
+    """
+    # Không dùng clean_text vì nó tách dấu "." trong số thập phân
+    text = unicodedata.normalize("NFC", str(question)).lower()
+    text = SCALE_RE.sub(" ", STUDENT_ID_PATTERN.sub(" ", text))
+    if NEGATIVE_RE.search(text) or REQUIREMENT_RE.search(text):
+        return None
+    numbers = NUMBER_RE.findall(text)
+    if len(numbers) != 1:
+        return None
+
+    def adjacent(table):
+        m = VALUE_RES[table].search(text)
+        return _to_float(next(g for g in m.groups() if g)) if m else None
+
+    value = adjacent("year")
+    if value is not None and re.search(r"năm|trình độ", text):
+        return {"table": "year", "value": value}
+    value = adjacent("ranking")
+    if value is not None and value <= 4:
+        return {"table": "ranking", "value": value}
+    value = adjacent("grade")
+    if value is not None and value <= 10 and re.search(
+        r"điểm chữ|quy đổi|điểm gì|mấy điểm|loại gì|bao nhiêu", text
+    ):
+        return {"table": "grade", "value": value}
+    return None
+
+
+class NumericLookup:
+    """Trả lời câu hỏi tra số (điểm -> điểm chữ, CPA -> xếp loại, tín chỉ -> năm học)"""
+
+    def __init__(self, tables: Dict[str, IntervalTable]):
+        self.tables = tables
+
+    @classmethod
+    def from_chunks(cls, chunks: List[Dict]) -> "NumericLookup":
+        """
+        Gắn chunk bảng vào bảng tra theo table_name, hoặc theo cột đầu của
+        header (bảng tách tự động từ PDF). Chỉ nhận bảng mà mọi dòng đều tra
+        được theo khoảng; không thì thử chunk bảng tiếp theo.
+        """
+        tables = {}
+        for chunk in chunks:
+            meta = chunk["metadata"]
+            if meta.get("type") != "table":
+                continue
+            header = meta.get("header") or []
+            rows = parse_rows(chunk)
+            if not is_interval_table(rows):
+                continue
+            for name, spec in TABLES.items():
+                if name in tables:
+                    continue
+                if meta.get("table_name") == spec["table_name"] or (
+                    header and header_matches(header[0], spec["header"])
+                ):
+                    source = {"chunk_id": chunk["id"], "dieu": meta.get("dieu"), "khoan": meta.get("khoan")}
+                    tables[name] = IntervalTable(name, rows, source)
+                    break
+        return cls(tables)
+
+    @classmethod
+    def from_json(cls, path: str = CHUNKS_PATH) -> "NumericLookup":
+        with open(path, "r", encoding="utf-8") as f:
+            return cls.from_chunks(json.load(f)["chunks"])
+
+    def lookup(self, table: str, value: float) -> Optional[Dict]:
+        if table not in self.tables:
+            return None
+        hit = self.tables[table].lookup(value)
+        if hit is None:
+            return None
+        return dict(hit, table=table, value=value, source=self.tables[table].source)
+
+    def answer(self, question: str) -> Optional[Dict]:
+        """Câu trả lời chính xác kèm nguồn, None nếu không phải câu tra số"""
+        route = classify(question)
+        if route is None:
+            return None
+        hit = self.lookup(route["table"], route["value"])
+        if hit is None:
+            return None
+        hit["answer"] = self.render(hit)
+        return hit
+
+    @staticmethod
+    def render(hit: Dict) -> str:
+        value = f"{hit['value']:g}"
+        values = hit["values"]
+        if hit["table"] == "grade":
+            text = f"Điểm {value} (thang 10) → điểm chữ {values[0]}" + (
+                f", {values[1]} (thang 4)" if len(values) > 1 else ""
+            )
+        elif hit["table"] == "ranking":
+            text = f"GPA/CPA {value} → xếp loại {values[0]}"
+        else:
+            text = f"{value} tín chỉ tích lũy → trình độ {values[0].lower()}"
+        source = hit["source"]
+        where = ", ".join(
+            f"{label} {source[key]}" for label, key in (("Điều", "dieu"), ("Khoản", "khoan")) if source.get(key)
+        )
+        return f"{text} (khoảng {hit['range']}; theo {where or source['chunk_id']})."
+
+
+if __name__ == "__main__":
+    import time
+
+    lookup = NumericLookup.from_json()
+    questions = [
+        "Em được 7.2 điểm thì quy đổi ra điểm chữ là gì ạ?",
+        "CPA 3.3 thì xếp loại học lực gì ạ?",
+        "Em tích lũy được 70 tín chỉ thì là sinh viên năm mấy?",
+        "Thầy cho em hỏi thủ tục bảo lưu?",
+    ]
+    for q in questions:
+        start = time.perf_counter()
+        hit = lookup.answer(q)
+        us = (time.perf_counter() - start) * 1e6
+        print(f"{q}\n  -> {hit['answer'] if hit else 'không phải câu tra số'} ({us:.0f} µs)")
@@ -1,13 +1,57 @@
-import pandas as pd
 import re
+import unicodedata
 
-df = pd.read_csv("../clean_dataset.csv")
+# Lời chào / mở đầu thư hay gặp, không mang nội dung câu hỏi
+GREETING_PATTERN = re.compile(
+    r"^\s*(?:(?:dạ|vâng|em|con)\s+)*"
+    r"(?:thưa|kính gửi|kính chào|chào|xin chào|gửi)\s+"
+    r"(?:thầy|cô|thầy cô|thầy/cô|các thầy cô|anh|chị|quý thầy cô)"
+    r"(?:\s+ạ)?[\s,.!:;]*"
+)
+# "em tên Phan Thanh Tùng ," / "Em là Nguyễn Văn A," (tới dấu câu kế tiếp)
+NAME_PATTERN = re.compile(
+    r"\b(?:[Ee]m|[Cc]on)\s+(tên\s+là|tên|là)\s+([^,.;:!?\n]{0,40}?)(?=[,.;:!?\n])"
+)
+# Mã số sinh viên: "mssv 20164554", "MSSV: 20164554", hoặc số 8 chữ số bắt đầu bằng 20
+STUDENT_ID_PATTERN = re.compile(r"\b(?:mssv|mã số sinh viên|msv)\s*[:.]?\s*\d+|\b20\d{6}\b")
+# Lời cảm ơn cuối thư
+THANKS_PATTERN = re.compile(r"(?:em|con)?\s*(?:xin\s+)?(?:cám|cảm)\s+ơn[^?]{0,40}\W*$")
+# Cụm "thầy cho em hỏi" đứng đầu câu hỏi
+ASK_PATTERN = re.compile(r"\b(?:thầy|cô|thầy cô)?\s*(?:cho|cho phép)\s+em\s+(?:hỏi|xin hỏi)\s*(?:là)?\b")
 
 
-def clean_text(question):
-    pattern = r"(thưa thầy)"
-    pass
+def _strip_name(match) -> str:
+    """Bỏ "em tên ..."; với "em là ..." chỉ bỏ khi phía sau là họ tên viết hoa"""
+    words = match.group(2).split()
+    if match.group(1).startswith("tên") or (words and all(w.istitle() for w in words)):
+        return " "
+    return match.group(0)
 
 
-for question in df["questions"]:
-    clean_text(question)
+def clean_text(question) -> str:
+    """
+    Chuẩn hóa câu hỏi của sinh viên: bỏ lời chào, tên, MSSV, lời cảm ơn,
+    gộp dấu câu và khoảng trắng. Dùng làm khóa cache / để embed câu hỏi.
+    """
+    if not isinstance(question, str):
+        return ""
+
+    text = unicodedata.normalize("NFC", question)
+    # Tên phải bỏ trước khi lower() vì cần dựa vào chữ hoa
+    text = NAME_PATTERN.sub(_strip_name, text).lower()
+    text = GREETING_PATTERN.sub("", text)
+    text = STUDENT_ID_PATTERN.sub(" ", text)
+    text = THANKS_PATTERN.sub(" ", text)
+    text = ASK_PATTERN.sub(" ", text)
+    text = re.sub(r"([?!.,])[?!.,\s]*", r"\1 ", text)
+    text = re.sub(r"\s+", " ", text).strip(" ,.;:")
+    return text
+
+
+if __name__ == "__main__":
+    import pandas as pd
+
+    df = pd.read_csv("../clean_dataset.csv")
+
+    for question in df["questions"]:
+        print(clean_text(question))
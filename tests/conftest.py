@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Các module trong src/ import lẫn nhau trực tiếp (chạy từ thư mục src/)
+SRC_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "src")
+sys.path.insert(0, SRC_DIR)
+# Pipeline PDF import các module cùng thư mục (quy_che, tagger, chunk_store...)
+EXTRACT_DIR = os.path.join(SRC_DIR, "extract_from_pdf")
+sys.path.insert(0, EXTRACT_DIR)
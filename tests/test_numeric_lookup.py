@@ -0,0 +1,88 @@
+import os
+
+import pytest
+
+from conftest import SRC_DIR
+from numeric_lookup import CHUNKS_PATH, IntervalTable, NumericLookup, classify
+
+
+@pytest.fixture(scope="module")
+def lookup():
+    return NumericLookup.from_json(os.path.join(SRC_DIR, CHUNKS_PATH))
+
+
+@pytest.mark.parametrize(
+    "question, table, value",
+    [
+        ("Em được 7.2 điểm thì quy đổi ra điểm chữ là gì ạ?", "grade", 7.2),
+        ("điểm 9,5 quy đổi thang 4 là bao nhiêu", "grade", 9.5),
+        ("CPA 3.3 thì xếp loại học lực gì ạ?", "ranking", 3.3),
+        ("MSSV 20164554, CPA 2.49 thì học lực loại gì ạ?", "ranking", 2.49),
+        ("Em tích lũy được 70 tín chỉ thì là sinh viên năm mấy?", "year", 70),
+    ],
+)
+def test_classify_routes_value_questions(question, table, value):
+    assert classify(question) == {"table": table, "value": value}
+
+
+@pytest.mark.parametrize(
+    "question",
+    [
+        "Em học 2 năm rồi, cần bao nhiêu tín chỉ để tốt nghiệp ạ?",
+        "Sinh viên năm 3 được đăng ký tối đa bao nhiêu tín chỉ?",
+        "Học lực khá cần CPA bao nhiêu? em học kỳ 2",
+        "Em có -1 tín chỉ thì là năm mấy?",
+        "Em có âm 2 tín chỉ thì là năm mấy?",
+        "CPA tối thiểu để tốt nghiệp loại giỏi là 3.2 phải không?",
+        "Thầy cho em hỏi thủ tục bảo lưu?",
+    ],
+)
+def test_classify_falls_through_when_in_doubt(question):
+    assert classify(question) is None
+
+
+def test_interval_bounds():
+    table = IntervalTable("t", [["<1.00", "Kém"], ["1.00-1.99", "Yếu"], ["2.50-3.19", "Khá"]], {})
+    assert table.lookup(0.5)["values"] == ["Kém"]
+    assert table.lookup(1.0)["values"] == ["Yếu"]
+    assert table.lookup(1.99)["values"] == ["Yếu"]
+    assert table.lookup(3.19)["values"] == ["Khá"]
+    # Khe giữa hai dòng và giá trị vượt dòng cuối
+    assert table.lookup(2.2) is None
+    assert table.lookup(3.5) is None
+
+
+def test_answer(lookup):
+    hit = lookup.answer("CPA 3.3 thì xếp loại học lực gì ạ?")
+    assert hit["values"] == ["Giỏi"]
+    assert hit["source"]["dieu"] == 12
+    assert lookup.answer("200 tín chỉ là năm mấy")["values"] == ["Năm thứ năm"]
+    assert lookup.answer("Điểm học phần 8.45 thì thang 4 là bao nhiêu?") is None
+
+
+def _table_chunk(chunk_id, header, rows):
+    return {"id": chunk_id, "text": "", "metadata": {"type": "table", "dieu": 12, "header": header, "rows": rows}}
+
+
+def test_from_chunks_skips_tables_that_are_not_intervals():
+    chunks = [
+        # Bảng danh sách học phần: header có "TC" nhưng không phải cột đầu, cột đầu là STT
+        _table_chunk("hp", ["STT", "Số TC", "Học phần"], [["1", "3", "Giải tích"], ["2", "2", "Vật lý"]]),
+        # Cột đầu là "Số TC" nhưng chỉ là giá trị rời, không có khoảng nào
+        _table_chunk("tc", ["Số TC", "Học phần"], [["3", "Giải tích"], ["2", "Vật lý"]]),
+        _table_chunk(
+            "nam",
+            ["Số TC tích lũy", "Trình độ năm học"],
+            [["<32 TC", "Năm thứ nhất"], ["32–63 TC", "Năm thứ hai"], ["≥64 TC", "Năm thứ ba"]],
+        ),
+    ]
+    lookup = NumericLookup.from_chunks(chunks)
+    assert list(lookup.tables) == ["year"]
+    assert lookup.tables["year"].source["chunk_id"] == "nam"
+    assert lookup.lookup("year", 40)["values"] == ["Năm thứ hai"]
+    assert lookup.lookup("year", 3)["values"] == ["Năm thứ nhất"]
+
+
+def test_header_matches_whole_tokens():
+    chunks = [_table_chunk("x", ["STT", "Điểm"], [["<1", "a"], ["1-2", "b"]])]
+    assert NumericLookup.from_chunks(chunks).tables == {}
@@ -0,0 +1,85 @@
+import json
+import os
+import re
+
+import pytest
+
+from conftest import EXTRACT_DIR
+from bench_segmenter import rebuild_document
+from quy_che import QuyCheDaoTaoExtractor
+
+DATA_PATH = os.path.join(EXTRACT_DIR, "quy_che_rag_data.json")
+
+# Chunk của baseline (quy_che_rag_data.json, segmenter cũ) mà segmenter một
+# lượt không sinh ra: (vị trí trong baseline, id). Đều là "Khoản" bị tách nhầm
+# ở số thập phân / số trang / năm giữa câu, nội dung được gộp vào Khoản trước.
+KNOWN_DROPPED = [
+    (48, "d1_k3"),  # "... ban hành 1 2 3." (số trang)
+    (52, "d2_k4"),
+    (74, "d5_k0"),  # "điểm thi là điểm 0."
+    (76, "d5_k4"),  # "theo thang 4. Điểm học phần ..."
+    (111, "d12_k0"),  # "b = 0. 00" (2,50; 0,00)
+    (112, "d12_k0"),
+    (141, "d19_k8"),  # "lớn hơn 8. b) ..."
+    (142, "d19_k24"),
+    (143, "d19_k2"),
+    (188, "d31_k5"),  # "từ 0,5 đến 1, 5."
+    (190, "d31_k10"),  # "thang điểm 10."
+    (193, "d32_k3"),
+    (216, "d38_k10"),
+    (241, "d46_k2"),
+    (244, "d47_k2022"),  # "từ năm 2022."
+    (245, "d47_k2022"),
+]
+
+# Chunk cùng id nhưng khác text so với baseline
+KNOWN_TEXT_CHANGES = {
+    # Nhận thêm nội dung của Khoản bị tách nhầm ngay sau (KNOWN_DROPPED)
+    "d1_k1", "d2_k1", "d5_k5", "d5_k6", "d12_k7", "d19_k1", "d19_k2",
+    "d31_k1", "d31_k2", "d32_k3", "d38_k2", "d46_k2", "d47_k1",
+    # Dòng mục lục: văn bản dựng lại chỉ giữ tiêu đề, không có phần rác
+    # sau số trang ("ii", tiêu ngữ) như text trích từ PDF
+    "d37", "d47",
+}
+
+
+def normalize(text):
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def body(text):
+    """Nội dung chunk, bỏ dòng tiêu đề Điều / Khoản và nhãn [Chương ...]"""
+    return normalize(text.rsplit("[Chương", 1)[0].split("\n", 2)[-1])
+
+
+@pytest.fixture(scope="module")
+def baseline():
+    with open(DATA_PATH, "r", encoding="utf-8") as f:
+        chunks = json.load(f)["chunks"]
+    shipped = [c for c in chunks if not c["id"].startswith("table_")]
+    new = QuyCheDaoTaoExtractor(rebuild_document(chunks)).chunk_by_dieu_khoan()
+    return shipped, new
+
+
+def test_chunk_ids_match_baseline(baseline):
+    shipped, new = baseline
+    dropped = dict(KNOWN_DROPPED)
+    assert [shipped[i]["id"] for i in dropped] == list(dropped.values())
+    expected = [c["id"] for i, c in enumerate(shipped) if i not in dropped]
+    assert [c.id for c in new] == expected
+
+
+def test_chunk_texts_match_baseline(baseline):
+    shipped, new = baseline
+    dropped = dict(KNOWN_DROPPED)
+    kept = [c for i, c in enumerate(shipped) if i not in dropped]
+    changed = {old["id"] for old, chunk in zip(kept, new) if old["text"] != chunk.text}
+    assert changed == KNOWN_TEXT_CHANGES
+
+
+def test_dropped_khoan_text_is_kept(baseline):
+    shipped, new = baseline
+    for i, _ in KNOWN_DROPPED:
+        dieu = shipped[i]["metadata"]["dieu"]
+        dieu_text = normalize(" ".join(c.text for c in new if c.metadata["dieu"] == dieu))
+        assert body(shipped[i]["text"]) in dieu_text